@@ -0,0 +1,252 @@
+"""Offline replay benchmark for the audio pipeline.
+
+Drives WakeWordModel, VoiceRecognizer and the TTS engines from WAV fixtures
+(16-bit mono, 16 kHz) through FileCapture instead of a microphone, and writes
+the results as JSON so runs can be compared between commits.
+
+Usage:
+    python benchmarks/replay.py fixtures/*.wav --output bench.json
+    python benchmarks/replay.py cmd.wav --tts piper --tts openai
+    python benchmarks/replay.py cmd.wav --no-wake --tts-stream pcm --tts-stream opus
+    python benchmarks/replay.py fixtures/*.wav --verbose   # one JSON line per fixture
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "voice-assistant"))
+
+from audio_capture import FileCapture  # noqa: E402
+
+logger = logging.getLogger("benchmark")
+
+TTS_PHRASES = [
+    "Son las cinco y cuarto.",
+    "Mañana habrá sol por la mañana y algo de lluvia por la tarde, con máximas de veinte grados.",
+]
+
+
+def speech_end_ms(samples: np.ndarray, sample_rate: int, frame_ms: int = 20, floor_db: float = -45.0) -> float:
+    """Ground-truth end of speech: end of the last frame above an energy floor."""
+    n = sample_rate * frame_ms // 1000
+    frames = samples[: len(samples) // n * n].reshape(-1, n).astype(np.float32) / 32768.0
+    rms_db = 20 * np.log10(np.sqrt((frames ** 2).mean(axis=1)) + 1e-9)
+    active = np.nonzero(rms_db > floor_db)[0]
+    return float((active[-1] + 1) * frame_ms) if len(active) else 0.0
+
+
+def bench_wake(path: str, wake) -> dict:
+    capture = FileCapture(path)
+    wake.capture = capture
+    detections = []
+    capture.start()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    # Sin ritmo el fichero entero ya está en el buffer: se puntúa desde el
+    # principio y cada activación sigue donde terminó la anterior
+    position = 0
+    while wake.activate(start=position):
+        position = wake.detected_at
+        detections.append(round(position * 1000 / capture.sample_rate))
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    return {
+        "detections_ms": detections,
+        "cpu_s_per_audio_s": round(cpu / capture.duration_s, 4),
+        "rtf": round(wall / capture.duration_s, 4),
+    }
+
+
+def bench_stt(path: str, recognizer, start_ms: float = 0.0) -> dict:
+    capture = FileCapture(path)
+    recognizer.capture = capture
+    capture.start()
+    start = int(start_ms * capture.sample_rate / 1000)
+    t0 = time.perf_counter()
+    text = recognizer.record_and_transcribe(start=start)
+    wall = time.perf_counter() - t0
+    stats = recognizer.last_stats
+    consumed_s = (stats.get("endpoint_ms") or 0) / 1000 or capture.duration_s
+    truth = speech_end_ms(capture.samples, capture.sample_rate)
+    # Only a real endpoint (speech detected, FinalResult called) has a latency
+    endpoint = stats.get("endpoint_ms") if stats.get("final_result_ms") is not None else None
+    return {
+        "text": text,
+        "rtf": round(wall / consumed_s, 4),
+        "speech_start_ms": stats.get("speech_start_ms"),
+        "speech_end_ms": truth,
+        "endpoint_ms": stats.get("endpoint_ms"),
+        "endpoint_reason": stats.get("endpoint_reason"),
+        "decoder": stats.get("decoder"),
+        "decode_ms": stats.get("decode_ms"),
+        "replayed_ms": stats.get("replayed_ms"),
+        "endpoint_latency_ms": None if endpoint is None else round(start_ms + endpoint - truth, 1),
+        "final_result_ms": None if stats.get("final_result_ms") is None
+        else round(stats["final_result_ms"], 2),
+    }
+
+
+def bench_tts(name: str, engine, pcm_rate: int) -> list:
+    results = []
+    for phrase in TTS_PHRASES:
+        t0 = time.perf_counter()
+        audio = engine.synthesize(phrase)
+        synth_s = time.perf_counter() - t0
+        audio_s = len(audio) / 2 / pcm_rate
+        results.append({
+            "engine": name,
+            "chars": len(phrase),
+            "synth_ms": round(synth_s * 1000, 1),
+            "audio_s": round(audio_s, 3),
+            "rtf": round(synth_s / audio_s, 4) if audio_s else None,
+        })
+    return results
+
+
+class _NullSink:
+    """PlaybackSink stand-in: accepts the decoded PCM without an audio device."""
+
+    sample_rate = 24000
+
+    def begin(self):
+        pass
+
+    def write(self, pcm, sample_rate=None):
+        pass
+
+    def end(self):
+        pass
+
+    def wait(self, timeout=None):
+        return True
+
+    def stop(self):
+        pass
+
+
+def bench_tts_stream(fmt: str) -> list:
+    """OpenAI streaming per format: time to first byte/audio and bytes on the wire."""
+    from tts.openai_tts import OpenAITTS
+
+    engine = OpenAITTS(sink=_NullSink(), stream_format=fmt)
+    results = []
+    for phrase in TTS_PHRASES:
+        engine.reproduce(phrase)
+        stats = dict(engine.last_stats)
+        if stats.get("audio_s"):
+            stats["kbps"] = round(stats["wire_bytes"] * 8 / 1000 / stats["audio_s"], 1)
+        results.append({"engine": f"openai-{stats['format']}", "chars": len(phrase), **stats})
+    engine.close()
+    return results
+
+
+def make_tts(name: str):
+    if name == "piper":
+        from tts.piper import PiperTTS
+
+        engine = PiperTTS()
+        return engine, engine.sample_rate
+    if name == "openai":
+        from tts.openai_tts import PCM_SAMPLE_RATE, OpenAITTS
+
+        return OpenAITTS(audio_format="pcm"), PCM_SAMPLE_RATE
+    raise ValueError(f"Motor TTS desconocido: {name}")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except Exception:  # noqa: BLE001 - not a git checkout
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", nargs="+", help="WAV fixtures (16-bit mono)")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--tts", action="append", default=[], choices=["piper", "openai"])
+    parser.add_argument(
+        "--tts-stream", action="append", default=[], choices=["pcm", "opus"],
+        help="OpenAI streaming format to compare (time to first audio, bytes)",
+    )
+    parser.add_argument("--no-wake", action="store_true", help="Skip wake word stage")
+    parser.add_argument(
+        "--fixed-endpoint", action="store_true",
+        help="Fixed silence timeout instead of adaptive endpointing (baseline)",
+    )
+    parser.add_argument("--commands", help="Text file with one command phrase per line")
+    parser.add_argument(
+        "--command-only", action="store_true",
+        help="Decode with the command grammar only (requires --commands)",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="Log each fixture's results as a JSON line while running",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    # Solo el benchmark habla en INFO; los módulos del asistente siguen en WARNING
+    logger.setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    from voice_recognizer import VoiceRecognizer
+    from wake_word import WakeWordModel
+
+    commands = None
+    if args.commands:
+        with open(args.commands, encoding="utf-8") as f:
+            commands = [line.strip() for line in f if line.strip()]
+    recognizer = VoiceRecognizer(
+        adaptive_endpoint=not args.fixed_endpoint,
+        commands=commands,
+        command_mode="only" if args.command_only else "parallel",
+    )
+    recognizer.warmup()
+    wake = None if args.no_wake else WakeWordModel()
+    if wake is not None:
+        wake.warmup()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "endpoint": "fixed" if args.fixed_endpoint else "adaptive",
+        "commands": len(commands) if commands else 0,
+        "fixtures": [],
+        "tts": [],
+    }
+
+    for path in args.fixtures:
+        entry = {"fixture": os.path.basename(path)}
+        start_ms = 0.0
+        if wake is not None:
+            entry["wake"] = bench_wake(path, wake)
+            if entry["wake"]["detections_ms"]:
+                start_ms = entry["wake"]["detections_ms"][0]
+        entry["stt"] = bench_stt(path, recognizer, start_ms)
+        report["fixtures"].append(entry)
+        logger.info(json.dumps(entry, ensure_ascii=False))
+
+    for name in args.tts:
+        engine, rate = make_tts(name)
+        report["tts"].extend(bench_tts(name, engine, rate))
+    for fmt in args.tts_stream:
+        report["tts"].extend(bench_tts_stream(fmt))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"Resultados guardados en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
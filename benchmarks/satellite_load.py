@@ -0,0 +1,183 @@
+"""Load test for the satellite server with local fake satellites.
+
+Starts a SatelliteServer on localhost with stand-in components (a tone
+detector instead of openWakeWord, fixed-latency STT, LLM and TTS) and
+connects N satellites that stream PCM in real time and say the "wake word"
+several times. Reports per-session latency percentiles, busy rejections and
+the CPU time of the server process, so the session limit and the scheduler
+can be sized before deploying real rooms.
+
+Usage:
+    python benchmarks/satellite_load.py --satellites 8 --max-sessions 2 --turns 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "voice-assistant"))
+
+from audio_capture import AudioCapture  # noqa: E402
+from satellite import Satellite  # noqa: E402
+from satellite_server import SatelliteServer  # noqa: E402
+
+RATE = 16000
+FRAME = 1280  # 80 ms, como openWakeWord
+TONE = 30000
+
+
+class ToneWake:
+    """Detects the wake tone; ignores its tail for 0.5 s like a refractory period."""
+
+    def __init__(self):
+        self.detected_at = None
+        self.last_at = -RATE
+
+    def poll(self, cursor):
+        frames = cursor.lag // FRAME
+        if frames <= 0:
+            return False
+        samples = cursor.read(frames * FRAME, timeout=0)
+        if samples is not None and samples.max() >= TONE:
+            if cursor.position - self.last_at < RATE // 2:
+                return False
+            self.detected_at = self.last_at = cursor.position
+            return True
+        return False
+
+    def reset(self):
+        pass
+
+    def snapshot(self):
+        return {}
+
+
+class FakeRecognizer:
+    """Reads the stream until the end of the command, like the real recorder."""
+
+    def __init__(self, command_s: float):
+        self.command_samples = int(RATE * command_s)
+
+    def for_capture(self, capture):
+        recognizer = FakeRecognizer(0)
+        recognizer.command_samples = self.command_samples
+        recognizer.capture = capture
+        return recognizer
+
+    def record_and_transcribe(self, start=None):
+        samples = self.capture.cursor(start).read(self.command_samples)
+        return "" if samples is None else "qué tiempo hace"
+
+
+class FakeAssistant:
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def chat_stream(self, text):
+        time.sleep(self.latency_s)
+        yield "Hoy hace sol."
+        yield "Máximas de veinte grados."
+
+
+class FakeTTS:
+    sample_rate = 22050
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def synthesize(self, text):
+        audio_s = 0.08 * len(text.split())
+        time.sleep(audio_s * self.rtf)
+        return np.zeros(int(self.sample_rate * audio_s), dtype=np.int16).tobytes()
+
+
+async def stream_speech(capture: AudioCapture, turns: int, gap_s: float, command_s: float) -> None:
+    """Feed silence, wake tone and command audio in real time (20 ms blocks)."""
+    block = RATE // 50
+    rng = random.Random(id(capture))
+    timeline = []
+    for _ in range(turns):
+        timeline += [np.zeros(int(RATE * rng.uniform(0.2, gap_s)), dtype=np.int16),
+                     np.full(FRAME, TONE, dtype=np.int16),
+                     np.full(int(RATE * command_s), 1000, dtype=np.int16)]
+    timeline.append(np.zeros(RATE * 3, dtype=np.int16))
+    audio = np.concatenate(timeline)
+    for i in range(0, len(audio), block):
+        capture.write(audio[i:i + block])
+        await asyncio.sleep(block / RATE)
+    capture.close()
+
+
+def percentile(values, q):
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+async def run(args) -> dict:
+    server = SatelliteServer(
+        ToneWake, FakeRecognizer(args.command_s), lambda: FakeAssistant(args.llm_s),
+        FakeTTS(args.tts_rtf), host="127.0.0.1", port=0,
+        max_sessions=args.max_sessions, max_streams=args.satellites,
+    )
+    await server.start()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    satellites = [
+        Satellite(AudioCapture(), port=server.port, name=f"sat{i}")
+        for i in range(args.satellites)
+    ]
+    clients = [asyncio.ensure_future(s.run()) for s in satellites]
+    feeders = [stream_speech(s.capture, args.turns, args.gap_s, args.command_s) for s in satellites]
+    await asyncio.gather(*feeders)
+    await asyncio.wait(clients, timeout=10)
+    await server.stop()
+    wall = time.perf_counter() - wall0
+
+    sessions = list(server.sessions)
+    return {
+        "satellites": args.satellites,
+        "max_sessions": args.max_sessions,
+        "wakes": server.sessions_total + server.busy_rejections,
+        "sessions": server.sessions_total,
+        "busy_rejections": server.busy_rejections,
+        "first_audio_ms": {
+            "p50": percentile([s["first_audio_ms"] for s in sessions], 0.5),
+            "p95": percentile([s["first_audio_ms"] for s in sessions], 0.95),
+        },
+        "total_ms_p95": percentile([s["total_ms"] for s in sessions], 0.95),
+        "received_kb": round(sum(s.received_bytes for s in satellites) / 1024, 1),
+        "cpu_s_per_s": round((time.process_time() - cpu0) / wall, 3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--satellites", type=int, default=4)
+    parser.add_argument("--max-sessions", type=int, default=2)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--gap-s", type=float, default=2.0, help="Max silence before each wake")
+    parser.add_argument("--command-s", type=float, default=1.0)
+    parser.add_argument("--llm-s", type=float, default=0.5, help="Fake LLM latency")
+    parser.add_argument("--tts-rtf", type=float, default=0.3, help="Fake TTS real-time factor")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -92,7 +92,10 @@ vosk_mod.Model = lambda path: object()
 
 
 class _KaldiRecognizer:
-    def __init__(self, model, rate):  # noqa: D401 - stub
+    def __init__(self, model, rate, *args):  # noqa: D401 - stub
+        pass
+
+    def Reset(self):  # noqa: D401 - stub
         pass
 
     def AcceptWaveform(self, frame):  # noqa: D401 - stub
@@ -101,6 +104,9 @@ class _KaldiRecognizer:
     def FinalResult(self):  # noqa: D401 - stub
         return '{"text": ""}'
 
+    def PartialResult(self):  # noqa: D401 - stub
+        return '{"partial": ""}'
+
 
 vosk_mod.KaldiRecognizer = _KaldiRecognizer
 vosk_mod.SetLogLevel = lambda level: None
@@ -120,9 +126,19 @@ class _DummyStream:
     def __exit__(self, exc_type, exc, tb):
         return False
 
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
 
 sd_mod.RawInputStream = _DummyStream
 sd_mod.InputStream = _DummyStream
+sd_mod.RawOutputStream = _DummyStream
 sd_mod.sleep = lambda ms: None
 sys.modules.setdefault("sounddevice", sd_mod)
 
@@ -153,6 +169,9 @@ class _OWWModel:
     def predict(self, frame):
         return {}
 
+    def reset(self):
+        pass
+
 
 oww_model_mod.Model = _OWWModel
 sys.modules.setdefault("openwakeword", oww_mod)
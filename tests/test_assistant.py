@@ -34,6 +34,30 @@ def test_history_trim_on_max_turns(monkeypatch):
     assert a.history[0]["role"] == "system"
 
 
+def test_history_is_sent_and_trimmed_to_token_budget(monkeypatch):
+    a = VoiceAssistant()
+    a.max_history_tokens = 40
+    sent = []
+
+    def fake_create(**kwargs):
+        sent.append(kwargs["messages"])
+        msg = types.SimpleNamespace(content="r" * 80)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=msg)])
+
+    monkeypatch.setattr(a.client.chat.completions, "create", fake_create)
+
+    a.chat("primera")
+    a.chat("segunda")
+    # the follow-up carries the previous exchange
+    assert [m["role"] for m in sent[1]] == ["system", "user", "assistant", "user"]
+    assert sent[1][1]["content"] == "primera"
+
+    a.chat("tercera")
+    # only the newest exchange fits in the budget, starting with a user message
+    assert [m["role"] for m in a.history] == ["system", "user", "assistant"]
+    assert a.history[1]["content"] == "tercera"
+
+
 def test_chat_retries_then_success(monkeypatch):
     a = VoiceAssistant()
     attempts = {"n": 0}
@@ -60,3 +84,55 @@ def test_chat_fails_after_retries(monkeypatch):
     monkeypatch.setattr(a.client.chat.completions, "create", always_fail)
     out = a.chat("hola")
     assert out.startswith("Error de conexión:")
+
+
+def _stream_chunks(*parts):
+    for p in parts:
+        delta = types.SimpleNamespace(content=p)
+        yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+def test_chat_stream_yields_clean_sentences(monkeypatch):
+    a = VoiceAssistant()
+
+    def fake_create(**kwargs):
+        assert kwargs["stream"] is True
+        return _stream_chunks(
+            "Hola. Juega el ", "domingo ([marca](http://m.es/a.b",
+            "?x=1)). Suerte", "!",
+        )
+
+    monkeypatch.setattr(a.client.chat.completions, "create", fake_create)
+    out = list(a.chat_stream("hola"))
+    assert out == ["Hola.", "Juega el domingo según marca.", "Suerte!"]
+
+
+def test_chat_stream_no_retry_after_partial_answer(monkeypatch):
+    a = VoiceAssistant()
+    calls = {"n": 0}
+
+    def broken_stream(**kwargs):
+        calls["n"] += 1
+        yield from _stream_chunks("Primera frase. ")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(a.client.chat.completions, "create", broken_stream)
+    out = list(a.chat_stream("hola"))
+    assert calls["n"] == 1
+    assert out[0] == "Primera frase."
+    assert out[1].startswith("Error de conexión:")
+
+
+def test_chat_stream_remembers_what_was_spoken(monkeypatch):
+    a = VoiceAssistant()
+    monkeypatch.setattr(
+        a.client.chat.completions, "create",
+        lambda **kwargs: _stream_chunks("Uno. ", "Dos. ", "Tres."),
+    )
+    stream = a.chat_stream("cuenta")
+    assert next(stream) == "Uno."
+    stream.close()  # barge-in: el resto no se llegó a decir
+    assert a.history[-2:] == [
+        {"role": "user", "content": "cuenta"},
+        {"role": "assistant", "content": "Uno."},
+    ]
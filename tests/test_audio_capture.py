@@ -0,0 +1,81 @@
+import threading
+import wave
+
+import numpy as np
+
+from audio_capture import AudioCapture, FileCapture
+from voice_recognizer import VoiceRecognizer
+
+
+def test_cursors_read_independently():
+    cap = AudioCapture(buffer_s=1.0)
+    a = cap.cursor()
+    b = cap.cursor()
+    cap.write(np.arange(640, dtype=np.int16))
+
+    assert list(a.read(320)) == list(range(320))
+    assert list(a.read(320)) == list(range(320, 640))
+    # second cursor still sees the start of the stream
+    assert list(b.read(320)) == list(range(320))
+
+
+def test_read_wraps_and_skips_overrun():
+    cap = AudioCapture(sample_rate=1000, buffer_s=1.0)  # 1000-sample ring
+    cur = cap.cursor()
+    cap.write(np.full(900, 1, dtype=np.int16))
+    cap.write(np.full(600, 2, dtype=np.int16))
+
+    # first 500 samples were overwritten; reader jumps to the oldest one
+    out = cur.read(400)
+    assert cur.position == 900
+    assert cur.dropped == 500
+    assert list(out) == [1] * 400
+    assert list(cur.read(600)) == [2] * 600
+
+
+def test_read_returns_none_when_closed():
+    cap = AudioCapture()
+    cur = cap.cursor()
+    threading.Timer(0.05, cap.close).start()
+    assert cur.read(320) is None
+
+
+def test_recorder_reads_from_detection_point():
+    cap = AudioCapture()
+    rec = VoiceRecognizer(capture=cap)
+    seen = []
+    rec.vad.is_speech = lambda frame, rate: seen.append(frame) or False
+
+    cap.write(np.zeros(320, dtype=np.int16))
+    detected_at = cap.position
+    cap.write(np.ones(640, dtype=np.int16))
+    cap.close()
+
+    assert rec.record_and_transcribe(start=detected_at) == ""
+    assert len(seen) == 2
+    assert seen[0] == np.ones(320, dtype=np.int16).tobytes()
+
+
+def _write_wav(path, samples, rate=16000):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.astype(np.int16).tobytes())
+
+
+def test_file_capture_replays_wav_and_reports_endpoint(tmp_path):
+    # 0.5 s of "speech" followed by silence; tail silence lets endpointing finish
+    path = tmp_path / "cmd.wav"
+    _write_wav(path, np.concatenate([np.full(8000, 1000), np.zeros(1600)]))
+
+    cap = FileCapture(str(path), tail_silence_ms=1000)
+    rec = VoiceRecognizer(capture=cap)
+    rec.vad.is_speech = lambda frame, rate: any(frame)
+    cap.start()
+
+    assert rec.record_and_transcribe(start=0) == ""
+    stats = rec.last_stats
+    assert stats["speech_start_ms"] == 260  # first 20 ms frame past 250 ms
+    assert stats["endpoint_ms"] == 500 + rec.silence_threshold_ms
+    assert stats["final_result_ms"] is not None
@@ -25,3 +25,50 @@ def test_search_no_results(monkeypatch):
     monkeypatch.setattr(provider, "_search_web", lambda q, c: [])
     res = provider.search("hola", max_results=3)
     assert res == []
+
+
+def test_full_text_fetched_concurrently_within_budget():
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/search"):
+                port = self.server.server_address[1]
+                urls = [f"http://127.0.0.1:{port}/{name}" for name in ("a", "b", "slow")]
+                body = json.dumps({"web": {"results": [
+                    {"title": u, "url": u, "description": "d"} for u in urls
+                ]}}).encode()
+                ctype = "application/json"
+            else:
+                time.sleep(2.0 if self.path == "/slow" else 0.3)
+                body, ctype = b"<html><p>texto</p></html>", "text/html"
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    provider = BraveProvider(
+        api_key="dummy", endpoint=f"http://127.0.0.1:{server.server_address[1]}/search", budget_s=1.0
+    )
+    try:
+        t0 = time.monotonic()
+        res = provider.search("hola", max_results=3)
+        elapsed = time.monotonic() - t0
+    finally:
+        provider.close()
+        server.shutdown()
+        server.server_close()
+
+    assert elapsed < 1.3  # dos páginas de 0.3 s en paralelo; la lenta no se espera
+    assert [r.get("full_text") for r in res] == ["EXTRACTED", "EXTRACTED", None]
+    assert provider.last_stats["extracted"] == 2
@@ -0,0 +1,93 @@
+import json
+import wave
+
+import numpy as np
+
+import voice_recognizer
+from audio_capture import FileCapture
+from voice_recognizer import Endpointer, VoiceRecognizer
+
+
+def _recognizer_with_partial(partial):
+    class FakeKaldi:
+        def __init__(self, model, rate, *args):
+            pass
+
+        def AcceptWaveform(self, frame):
+            pass
+
+        def PartialResult(self):
+            return json.dumps({"partial": partial})
+
+        def FinalResult(self):
+            return json.dumps({"text": partial})
+
+        def Reset(self):
+            pass
+
+    return FakeKaldi
+
+
+def _run(tmp_path, monkeypatch, samples, partial="", **kwargs):
+    monkeypatch.setattr(voice_recognizer, "KaldiRecognizer", _recognizer_with_partial(partial))
+    path = tmp_path / "cmd.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(samples.astype(np.int16).tobytes())
+
+    cap = FileCapture(str(path), tail_silence_ms=1000)
+    rec = VoiceRecognizer(capture=cap, **kwargs)
+    rec.vad.is_speech = lambda frame, rate: any(frame)
+    cap.start()
+    text = rec.record_and_transcribe(start=0)
+    return text, rec.last_stats
+
+
+SPEECH = np.concatenate([np.full(8000, 1000), np.zeros(1600)])  # 500 ms + silence
+
+
+def test_complete_sentence_ends_after_min_silence(tmp_path, monkeypatch):
+    text, stats = _run(tmp_path, monkeypatch, SPEECH, partial="qué hora es")
+    assert text == "qué hora es"
+    assert stats["endpoint_reason"] == "complete"
+    assert stats["endpoint_ms"] == 500 + 300
+
+
+def test_unfinished_sentence_waits_longer(tmp_path, monkeypatch):
+    _, stats = _run(tmp_path, monkeypatch, SPEECH, partial="pon música de")
+    assert stats["endpoint_reason"] == "stable"
+    assert stats["endpoint_ms"] == 500 + 500
+
+
+def test_fixed_endpoint_ignores_partial(tmp_path, monkeypatch):
+    _, stats = _run(tmp_path, monkeypatch, SPEECH, partial="qué hora es",
+                    adaptive_endpoint=False)
+    assert stats["endpoint_reason"] == "silence"
+    assert stats["endpoint_ms"] == 500 + 700
+
+
+def test_energy_gate_ignores_noise_flagged_by_vad(tmp_path, monkeypatch):
+    # the stub VAD calls any non-zero frame speech; the tail is low-level noise
+    rng = np.random.default_rng(0)
+    noise = rng.integers(-30, 30, 16000)
+    _, stats = _run(tmp_path, monkeypatch, np.concatenate([np.full(8000, 1000), noise]))
+    assert stats["endpoint_reason"] == "silence"
+    assert stats["endpoint_ms"] == 500 + 700
+
+
+def test_max_record_length(tmp_path, monkeypatch):
+    _, stats = _run(tmp_path, monkeypatch, np.full(16000 * 3, 1000), max_record_ms=1000)
+    assert stats["endpoint_reason"] == "max_length"
+    assert stats["endpoint_ms"] == stats["speech_start_ms"] + 1000
+
+
+def test_noise_floor_from_silent_preroll():
+    endpointer = Endpointer()
+    quiet = np.full(320, 400, dtype=np.int16).tobytes()
+    loud = np.full(320, 5000, dtype=np.int16).tobytes()
+    endpointer.calibrate([quiet, loud], [False, True])
+    assert endpointer.noise_floor == 400
+    assert not endpointer.is_speech(quiet, True)
+    assert endpointer.is_speech(loud, True)
@@ -0,0 +1,65 @@
+import multiprocessing
+
+import numpy as np
+
+from frontend import RecognizerWorker, SharedAudioCapture, WakeWorker
+
+# fork keeps the conftest stubs (sounddevice, vosk, openwakeword) in the workers
+ctx = multiprocessing.get_context("fork")
+
+
+def _writer(spec):
+    capture = SharedAudioCapture.attach(spec)
+    for i in range(4):
+        capture.write(np.full(320, i, dtype=np.int16))
+    capture.close()
+    capture.release()
+
+
+def test_shared_ring_passes_audio_between_processes():
+    capture = SharedAudioCapture(buffer_s=1.0)
+    cursor = capture.cursor()
+    process = ctx.Process(target=_writer, args=(capture.spec(),))
+    process.start()
+
+    chunks = [cursor.read(320, timeout=5) for _ in range(4)]
+    process.join(5)
+
+    assert [int(c[0]) for c in chunks] == [0, 1, 2, 3]
+    assert capture.closed
+    assert cursor.read(320) is None
+    capture.release()
+
+
+def test_attached_view_skips_overrun():
+    capture = SharedAudioCapture(sample_rate=1000, buffer_s=1.0)
+    reader = SharedAudioCapture.attach(capture.spec()).cursor(0)
+    capture.write(np.full(900, 1, dtype=np.int16))
+    capture.write(np.full(600, 2, dtype=np.int16))
+
+    assert list(reader.read(400)) == [1] * 400
+    assert reader.dropped == 500
+    reader.capture.release()
+    capture.release()
+
+
+def test_workers_answer_over_ipc_and_stop_on_close():
+    capture = SharedAudioCapture()
+    wake = WakeWorker(ctx, capture, {})
+    recognizer = RecognizerWorker(ctx, capture, {})
+    wake.process.start()
+    recognizer.process.start()
+    wake.wait_ready(timeout=10)
+    recognizer.wait_ready(timeout=10)
+
+    # the stub VAD never hears speech: the follow-up window expires
+    capture.write(np.zeros(16000, dtype=np.int16))
+    assert recognizer.record_and_transcribe(start=0, start_timeout_ms=200) == ""
+
+    capture.close()
+    assert wake.activate() is False
+    for worker in (wake, recognizer):
+        worker.stop()
+        worker.process.join(5)
+        assert not worker.process.is_alive()
+    capture.release()
@@ -0,0 +1,54 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_pool import HTTPPool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}/"
+    srv.shutdown()
+
+
+def test_session_reuses_warmed_connection(server):
+    pool = HTTPPool(warm_urls=(server,))
+    pool.warm().join(timeout=5)
+
+    for _ in range(3):
+        assert pool.session.get(server, timeout=5).text == "ok"
+
+    snap = pool.metrics.snapshot()
+    assert snap["requests"] == 4
+    assert snap["connections"] == 1
+    assert snap["reused"] == 3
+    pool.close()
+
+
+def test_add_warm_url_keeps_origin_only():
+    pool = HTTPPool(warm_urls=())
+    pool.add_warm_url("https://api.openai.com/v1/audio/speech")
+    pool.add_warm_url("https://api.openai.com/v1/chat")
+    assert pool.warm_urls == ["https://api.openai.com/"]
@@ -0,0 +1,98 @@
+import datetime
+import types
+
+from assistant import VoiceAssistant
+from intents import AnswerCache, Timers, default_router, normalize
+
+
+class FakeTimers(Timers):
+    def __init__(self):
+        super().__init__()
+        self.started = []
+
+    def start(self, seconds, label):
+        self.started.append((seconds, label))
+
+
+def _router(timers=None):
+    clock = lambda: datetime.datetime(2026, 10, 18, 13, 5)  # noqa: E731
+    return default_router(timers or FakeTimers(), clock=clock)
+
+
+def test_normalize_strips_accents_and_punctuation():
+    assert normalize("¿Qué  HORA es?") == "que hora es"
+
+
+def test_time_and_date_intents():
+    router = _router()
+    assert router.route("¿Qué hora es?") == "Es la 1 y 5."
+    assert router.route("qué día es hoy") == "Hoy es domingo, 18 de octubre de 2026."
+
+
+def test_timer_parses_spoken_numbers():
+    timers = FakeTimers()
+    router = _router(timers)
+    assert router.route("pon un temporizador de cinco minutos") == \
+        "Temporizador de 5 minutos en marcha."
+    assert router.route("avísame en treinta y dos segundos")
+    assert router.route("pon un temporizador de setenta y cinco segundos")
+    assert router.route("temporizador de ciento veinte segundos")
+    assert timers.started == [
+        (300, "5 minutos"), (32, "32 segundos"), (75, "75 segundos"), (120, "120 segundos"),
+    ]
+
+
+def test_unknown_query_falls_through():
+    router = _router()
+    assert router.route("a qué hora es el partido") is None
+    assert router.route("cuéntame un chiste") is None
+
+
+def test_answer_cache_ttl_and_volatile(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("intents.time.monotonic", lambda: now[0])
+    cache = AnswerCache(ttl_s=10)
+
+    cache.put("¿Quién escribió el Quijote?", "Cervantes.")
+    cache.put("¿Qué tiempo hace hoy?", "Soleado.")
+    assert cache.get("quien escribio el quijote") == "Cervantes."
+    assert cache.get("Qué tiempo hace hoy") is None
+
+    now[0] += 11
+    assert cache.get("quien escribio el quijote") is None
+
+
+def test_answer_cache_skips_fixtures_results_and_prices():
+    cache = AnswerCache()
+    for question in (
+        "¿Cuándo juega el Real Madrid?",
+        "¿Quién ganó la liga?",
+        "¿Cuánto cuesta el bitcoin?",
+        "¿A cuánto cotiza el euro?",
+        "¿A qué hora cierra el Mercadona?",
+        "¿Cuál es el próximo festivo?",
+    ):
+        assert not cache.cacheable(question), question
+    assert cache.cacheable("¿Cuál es la capital de Francia?")
+    assert cache.cacheable("¿Cuántas patas tiene una araña?")
+
+
+def test_assistant_uses_local_path_before_llm(monkeypatch):
+    a = VoiceAssistant(router=_router(), answer_cache=AnswerCache())
+    calls = {"n": 0}
+
+    def fake_create(**kwargs):
+        calls["n"] += 1
+        msg = types.SimpleNamespace(content="Miguel de Cervantes.")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=msg)])
+
+    monkeypatch.setattr(a.client.chat.completions, "create", fake_create)
+
+    assert list(a.chat_stream("qué hora es")) == ["Es la 1 y 5."]
+    assert calls["n"] == 0
+
+    a.clear_history()  # la caché solo se usa sin conversación en curso
+    assert a.chat("¿Quién escribió el Quijote?") == "Miguel de Cervantes."
+    a.clear_history()
+    assert a.chat("quién escribió el quijote") == "Miguel de Cervantes."
+    assert calls["n"] == 1
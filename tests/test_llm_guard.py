@@ -0,0 +1,155 @@
+import threading
+import time
+import types
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from assistant import DEGRADED_RESPONSE, TIMEOUT_RESPONSE, VoiceAssistant
+from llm_guard import BudgetExceeded, CircuitBreaker, CircuitOpen, LLMGuard
+
+
+class _FakeLLM:
+    """Local HTTP server answering after a scripted delay per request."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests += 1
+                index = min(fake.requests, len(fake.delays)) - 1
+                time.sleep(fake.delays[index])
+                body = f"respuesta {fake.requests}".encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def request(self, timeout):
+        with urllib.request.urlopen(self.url, timeout=timeout) as resp:
+            return resp.read().decode()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_llm():
+    servers = []
+
+    def make(*delays):
+        servers.append(_FakeLLM(delays))
+        return servers[-1]
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def test_hedged_request_wins_over_slow_attempt(fake_llm):
+    server = fake_llm(1.5, 0.0)
+    guard = LLMGuard(budget_s=3.0, hedge_default_s=0.1)
+    t0 = time.monotonic()
+    assert guard.call(server.request) == "respuesta 2"
+    assert time.monotonic() - t0 < 1.0
+    assert guard.stats["hedges"] == 1
+    assert guard.stats["hedge_wins"] == 1
+
+
+def test_budget_exceeded_counts_as_breaker_failure(fake_llm):
+    server = fake_llm(1.0)
+    guard = LLMGuard(budget_s=0.3, hedge_default_s=0.1, breaker=CircuitBreaker(failure_threshold=1))
+    t0 = time.monotonic()
+    with pytest.raises(BudgetExceeded):
+        guard.call(server.request)
+    assert time.monotonic() - t0 < 0.8
+    assert guard.stats["timeouts"] == 1
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        guard.call(server.request)
+    assert guard.stats["fallbacks"] == 1
+
+
+def test_hedge_delay_follows_recent_latencies():
+    guard = LLMGuard(hedge_default_s=4.0, hedge_min_s=0.5, min_samples=4)
+    assert guard.hedge_delay() == 4.0
+    guard.latencies.extend([0.2, 0.8, 1.0, 1.2, 3.0])
+    assert guard.hedge_delay() == 3.0
+    guard.hedge_quantile = 0.5
+    assert guard.hedge_delay() == 1.0
+
+
+def test_breaker_half_open_probe():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_s=30, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 31.0
+    assert breaker.allow()  # una sola sonda
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2  # la sonda fallida vuelve a abrirlo
+
+    now[0] = 62.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_assistant_speaks_fallbacks(monkeypatch):
+    calls = {"n": 0}
+
+    def slow_create(**kwargs):
+        calls["n"] += 1
+        time.sleep(0.5)
+        return types.SimpleNamespace(choices=[])
+
+    guard = LLMGuard(budget_s=0.1, hedge_default_s=1.0, breaker=CircuitBreaker(failure_threshold=1))
+    a = VoiceAssistant(guard=guard)
+    monkeypatch.setattr(a.client.chat.completions, "create", slow_create)
+
+    assert a.chat("hola") == TIMEOUT_RESPONSE
+    assert list(a.chat_stream("hola")) == [DEGRADED_RESPONSE]
+    assert calls["n"] == 1
+    assert a.history == [a.system_message]
+
+
+def test_chat_stream_hedge_closes_losing_stream(monkeypatch):
+    closed = []
+
+    class FakeStream:
+        def __init__(self, delay, text):
+            self.delay, self.text = delay, text
+
+        def __iter__(self):
+            time.sleep(self.delay)
+            delta = types.SimpleNamespace(content=self.text)
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+        def close(self):
+            closed.append(self.text)
+
+    streams = iter([FakeStream(0.6, "Lenta."), FakeStream(0.0, "Rápida.")])
+    a = VoiceAssistant(guard=LLMGuard(budget_s=2.0, hedge_default_s=0.1))
+    monkeypatch.setattr(a.client.chat.completions, "create", lambda **kwargs: next(streams))
+
+    assert list(a.chat_stream("hola")) == ["Rápida."]
+    time.sleep(0.8)
+    assert sorted(closed) == ["Lenta.", "Rápida."]
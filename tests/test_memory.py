@@ -0,0 +1,107 @@
+import threading
+import time
+
+import memory
+from memory import LazyComponent
+from startup import ModelLoader
+
+
+class Heavy:
+    def __init__(self):
+        self.warmed = False
+        self.stopped = False
+
+    def warmup(self):
+        self.warmed = True
+
+    def stop(self):
+        self.stopped = True
+
+    def transcribe(self, seconds=0.0):
+        time.sleep(seconds)
+        return "hola"
+
+    def snapshot(self):
+        return {"rtf": 0.5}
+
+
+def test_lazy_component_loads_on_first_use():
+    loads = []
+    lazy = LazyComponent("heavy", lambda: loads.append(1) or Heavy(), idle_s=None)
+
+    # Lo que comprueban FallbackTTS y Pipeline no carga el modelo
+    lazy.stop()
+    assert lazy.snapshot() == {"loaded": 0, "loads": 0, "unloads": 0}
+    assert not loads
+
+    assert lazy.transcribe() == "hola"
+    lazy.on_first_byte = print  # se asigna en el componente
+    assert lazy.get().on_first_byte is print
+    assert lazy.snapshot()["rtf"] == 0.5
+    lazy.stop()
+    assert lazy.get().stopped
+    assert loads == [1]
+    assert "heavy_rss_mb" in memory.snapshot()
+
+
+def test_lazy_component_unloads_when_idle_and_reloads():
+    now = [0.0]
+    lazy = LazyComponent("idle", Heavy, idle_s=10, clock=lambda: now[0])
+    first = lazy.get()
+    now[0] = 5.0
+    assert not lazy.unload()  # aún no lleva idle_s sin usarse
+    now[0] = 10.0
+    assert lazy.unload()
+    assert not lazy.loaded and lazy.unloads == 1
+
+    assert lazy.transcribe() == "hola"
+    assert lazy.get() is not first
+    assert lazy.loads == 2
+    lazy.close()
+
+
+def test_reaper_does_not_unload_a_component_being_loaded():
+    now = [0.0]
+    results, reapers = [], []
+
+    def load():
+        # El reaper vio un _last_use viejo y espera el lock mientras se carga
+        now[0] = 100.0
+        reapers.append(threading.Thread(target=lambda: results.append(lazy.unload())))
+        reapers[0].start()
+        return Heavy()
+
+    lazy = LazyComponent("race", load, idle_s=10, clock=lambda: now[0])
+    component = lazy.get()
+    reapers[0].join()
+    assert results == [False]
+    assert lazy.get() is component and lazy.loads == 1
+    lazy.close()
+
+
+def test_lazy_component_not_unloaded_during_a_call():
+    lazy = LazyComponent("busy", Heavy, idle_s=None)
+    worker = threading.Thread(target=lazy.transcribe, args=(0.3,))
+    worker.start()
+    time.sleep(0.1)
+    assert not lazy.unload()
+    worker.join()
+    assert lazy.unload()
+    assert not lazy.loaded
+
+
+def test_measure_records_peak_and_steady_rss():
+    with memory.measure("buffer"):
+        block = b"\x01" * (64 * 1024 * 1024)
+        del block
+    figures = memory.snapshot_of("buffer")
+    assert figures["peak_mb"] >= 48
+    assert figures["rss_mb"] < figures["peak_mb"]
+
+
+def test_sequential_loader_reports_memory():
+    loader = ModelLoader(max_workers=1)
+    loader.submit("model", Heavy)
+    report = loader.report()
+    assert {"rss_mb", "peak_mb"} <= set(report["model"])
+    loader.shutdown()
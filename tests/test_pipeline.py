@@ -0,0 +1,352 @@
+import asyncio
+import threading
+import time
+
+import tracing
+from pipeline import Pipeline
+
+
+class FakeCapture:
+    def __init__(self):
+        self.closed = False
+        self._event = threading.Event()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+
+class FakeWake:
+    """Detects once, then blocks until the capture is closed."""
+
+    def __init__(self, capture):
+        self.capture = capture
+        self.detected_at = 1234
+        self.calls = 0
+
+    def activate(self):
+        self.calls += 1
+        if self.calls == 1:
+            return True
+        self.capture._event.wait(timeout=5)
+        return False
+
+    def snapshot(self):
+        return {}
+
+
+class FakeRecognizer:
+    def __init__(self):
+        self.starts = []
+
+    def record_and_transcribe(self, start=None, start_timeout_ms=None):
+        self.starts.append(start)
+        return "qué hora es"
+
+
+class FakeAssistant:
+    def __init__(self, first_spoken):
+        self.first_spoken = first_spoken
+        self.overlapped = False
+
+    def chat_stream(self, text):
+        yield "Primera frase."
+        # the second sentence is produced while TTS plays the first one
+        self.overlapped = self.first_spoken.wait(timeout=5)
+        yield "Segunda frase."
+
+
+class FakeTTS:
+    def __init__(self, first_spoken, done):
+        self.first_spoken = first_spoken
+        self.done = done
+        self.spoken = []
+
+    def reproduce(self, text):
+        self.spoken.append(text)
+        self.first_spoken.set()
+        if len(self.spoken) == 2:
+            self.done.set()
+
+    def stop(self):
+        pass
+
+
+def test_pipeline_runs_one_turn_with_overlapping_stages():
+    first_spoken, done = threading.Event(), threading.Event()
+    capture = FakeCapture()
+    recognizer = FakeRecognizer()
+    assistant = FakeAssistant(first_spoken)
+    tts = FakeTTS(first_spoken, done)
+    pipeline = Pipeline(capture, FakeWake(capture), recognizer, assistant, tts)
+
+    threading.Thread(target=lambda: done.wait(5) and pipeline.stop(), daemon=True).start()
+    try:
+        asyncio.run(pipeline.run())
+    except asyncio.CancelledError:
+        pass
+
+    assert recognizer.starts == [1234]
+    assert tts.spoken == ["Primera frase.", "Segunda frase."]
+    assert assistant.overlapped
+    assert capture.closed
+
+
+class PreloadingTTS:
+    """Plays each sentence until the next one has been handed to preload()."""
+
+    def __init__(self, done):
+        self.done = done
+        self.events = []
+        self.preloaded = threading.Event()
+
+    def reproduce(self, text):
+        self.events.append(("start", text))
+        if text == "Primera frase.":
+            self.preloaded.wait(timeout=5)
+        self.events.append(("end", text))
+        if text == "Segunda frase.":
+            self.done.set()
+
+    def preload(self, text):
+        self.events.append(("preload", text))
+        self.preloaded.set()
+
+    def stop(self):
+        pass
+
+
+def test_next_sentence_is_preloaded_while_the_current_one_plays():
+    first_spoken, done = threading.Event(), threading.Event()
+    capture = FakeCapture()
+    tts = PreloadingTTS(done)
+    assistant = FakeAssistant(first_spoken)
+    first_spoken.set()  # la segunda frase llega mientras suena la primera
+    pipeline = Pipeline(capture, FakeWake(capture), FakeRecognizer(), assistant, tts)
+
+    threading.Thread(target=lambda: done.wait(5) and pipeline.stop(), daemon=True).start()
+    try:
+        asyncio.run(pipeline.run())
+    except asyncio.CancelledError:
+        pass
+
+    assert tts.events == [
+        ("start", "Primera frase."),
+        ("preload", "Segunda frase."),
+        ("end", "Primera frase."),
+        ("start", "Segunda frase."),
+        ("end", "Segunda frase."),
+    ]
+
+
+class BargeInWake(FakeWake):
+    """Second detection happens while the first answer is being spoken."""
+
+    def __init__(self, capture, speaking):
+        super().__init__(capture)
+        self.speaking = speaking
+
+    def activate(self):
+        self.calls += 1
+        if self.calls == 1:
+            return True
+        if self.calls == 2:
+            return self.speaking.wait(timeout=5)
+        self.capture._event.wait(timeout=5)
+        return False
+
+
+class SlowTTS:
+    def __init__(self, speaking):
+        self.speaking = speaking
+        self.interrupted = threading.Event()
+        self.spoken = []
+
+    def reproduce(self, text):
+        self.spoken.append(text)
+        self.speaking.set()
+        self.interrupted.wait(timeout=5)
+
+    def stop(self):
+        self.interrupted.set()
+
+
+class ListAssistant:
+    def __init__(self, done):
+        self.done = done
+        self.calls = 0
+
+    def chat_stream(self, text):
+        self.calls += 1
+        yield f"Respuesta {self.calls}."
+        yield "Otra frase."
+        if self.calls == 2:
+            self.done.set()
+
+
+def test_barge_in_stops_playback_and_starts_new_turn():
+    speaking, done = threading.Event(), threading.Event()
+    capture = FakeCapture()
+    recognizer = FakeRecognizer()
+    tts = SlowTTS(speaking)
+    pipeline = Pipeline(capture, BargeInWake(capture, speaking), recognizer,
+                        ListAssistant(done), tts)
+
+    def stop_when_done():
+        if done.wait(5):
+            time.sleep(0.2)
+        pipeline.stop()
+
+    threading.Thread(target=stop_when_done, daemon=True).start()
+    try:
+        asyncio.run(pipeline.run())
+    except asyncio.CancelledError:
+        pass
+
+    assert tts.interrupted.is_set()
+    assert pipeline.barge_ins == 1
+    assert len(recognizer.starts) == 2
+    # the rest of the first answer is dropped
+    assert tts.spoken[0] == "Respuesta 1."
+    assert "Respuesta 2." in tts.spoken
+    assert tts.spoken.count("Otra frase.") <= 1
+
+
+class FakeSink:
+    """The device plays for another 50 ms after stop()."""
+
+    def __init__(self):
+        self.stops = 0
+
+    def stop(self):
+        self.stops += 1
+        self._silent_at = time.perf_counter() + 0.05
+
+    def wait_silent(self, timeout=None):
+        return self._silent_at
+
+    def snapshot(self):
+        return {}
+
+
+def test_barge_in_gauge_measures_wake_to_silence(monkeypatch):
+    speaking, done = threading.Event(), threading.Event()
+    gauges = {}
+    monkeypatch.setattr(tracing.tracer, "set_gauge", gauges.__setitem__)
+    capture = FakeCapture()
+    sink = FakeSink()
+    pipeline = Pipeline(capture, BargeInWake(capture, speaking), FakeRecognizer(),
+                        ListAssistant(done), SlowTTS(speaking), sink=sink)
+
+    def stop_when_done():
+        if done.wait(5):
+            time.sleep(0.2)
+        pipeline.stop()
+
+    threading.Thread(target=stop_when_done, daemon=True).start()
+    try:
+        asyncio.run(pipeline.run())
+    except asyncio.CancelledError:
+        pass
+
+    assert sink.stops >= 1
+    assert gauges["barge_ins_total"] == 1
+    assert gauges["barge_in_stop_ms"] >= 50  # hasta que el altavoz calla, no solo stop()
+
+
+class FollowUpCapture(FakeCapture):
+    position = 5000
+
+
+class FollowUpRecognizer:
+    """Answers the wake turn and one follow-up, then stays silent."""
+
+    def __init__(self, done):
+        self.done = done
+        self.calls = []
+
+    def record_and_transcribe(self, start=None, start_timeout_ms=None):
+        self.calls.append((start, start_timeout_ms))
+        if len(self.calls) == 3:
+            self.done.set()
+            return ""
+        return f"pregunta {len(self.calls)}"
+
+
+class HistoryAssistant:
+    def __init__(self):
+        self.cleared = 0
+
+    def chat_stream(self, text):
+        yield f"Respuesta a {text}."
+
+    def clear_history(self):
+        self.cleared += 1
+
+
+def test_follow_up_turn_without_wake_word():
+    done = threading.Event()
+    capture = FollowUpCapture()
+    recognizer = FollowUpRecognizer(done)
+    assistant = HistoryAssistant()
+    tts = SlowTTS(threading.Event())
+    tts.interrupted.set()  # no bloquea
+    pipeline = Pipeline(capture, FakeWake(capture), recognizer, assistant, tts,
+                        follow_up_ms=3000)
+
+    def stop_when_done():
+        if done.wait(5):
+            time.sleep(0.2)
+        pipeline.stop()
+
+    threading.Thread(target=stop_when_done, daemon=True).start()
+    try:
+        asyncio.run(pipeline.run())
+    except asyncio.CancelledError:
+        pass
+
+    # wake turn, follow-up answered, follow-up that timed out
+    assert recognizer.calls == [(1234, None), (5000, 3000), (5000, 3000)]
+    assert tts.spoken == ["Respuesta a pregunta 1.", "Respuesta a pregunta 2."]
+    assert assistant.cleared == 1
+
+
+class AnnounceWake(FakeWake):
+    """Detects only once an announcement is playing."""
+
+    def __init__(self, capture, speaking):
+        super().__init__(capture)
+        self.speaking = speaking
+
+    def activate(self):
+        self.calls += 1
+        if self.calls == 1:
+            return self.speaking.wait(timeout=5)
+        self.capture._event.wait(timeout=5)
+        return False
+
+
+def test_announcement_uses_tts_stage_and_is_interrupted_by_wake():
+    speaking = threading.Event()
+    capture = FakeCapture()
+    tts = SlowTTS(speaking)
+    pipeline = Pipeline(capture, AnnounceWake(capture, speaking), FakeRecognizer(),
+                        ListAssistant(threading.Event()), tts)
+
+    def announce_then_stop():
+        time.sleep(0.2)
+        pipeline.announce("Tu temporizador de 5 minutos ha terminado.")
+        deadline = time.monotonic() + 5
+        while len(tts.spoken) < 3 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        pipeline.stop()
+
+    threading.Thread(target=announce_then_stop, daemon=True).start()
+    try:
+        asyncio.run(pipeline.run())
+    except asyncio.CancelledError:
+        pass
+
+    # el aviso suena en la etapa de TTS y el wake word lo corta como a una respuesta
+    assert tts.spoken == ["Tu temporizador de 5 minutos ha terminado.", "Respuesta 1.", "Otra frase."]
+    assert pipeline.barge_ins == 1
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pytest
+
+import voice_recognizer
+from audio_capture import AudioCapture
+from voice_recognizer import VoiceRecognizer
+
+
+class FakeKaldi:
+    instances = []
+
+    def __init__(self, model, rate, grammar=None):
+        self.grammar = json.loads(grammar) if grammar else None
+        self.resets = 0
+        self.finals = 0
+        self.frames = 0
+        FakeKaldi.instances.append(self)
+
+    def AcceptWaveform(self, frame):
+        self.frames += 1
+
+    def PartialResult(self):
+        return json.dumps({"partial": FakeKaldi.command_partial if self.grammar else ""})
+
+    def FinalResult(self):
+        self.finals += 1
+        text = FakeKaldi.command_text if self.grammar else "enciende la luz del salón por favor"
+        return json.dumps({"text": text})
+
+    def Reset(self):
+        self.resets += 1
+
+
+@pytest.fixture
+def kaldi(monkeypatch):
+    FakeKaldi.instances = []
+    FakeKaldi.command_text = "enciende la luz"
+    FakeKaldi.command_partial = "enciende la"
+    monkeypatch.setattr(voice_recognizer, "KaldiRecognizer", FakeKaldi)
+    return FakeKaldi
+
+
+def _record(rec):
+    cap = AudioCapture()
+    rec.capture = cap
+    rec.vad.is_speech = lambda frame, rate: any(frame)
+    cap.write(np.full(8000, 1000, dtype=np.int16))
+    cap.write(np.zeros(16000, dtype=np.int16))
+    cap.close()
+    return rec.record_and_transcribe(start=0)
+
+
+def test_recognizers_are_reused_between_sessions(kaldi):
+    rec = VoiceRecognizer(pool_size=1)
+    _record(rec)
+    _record(rec)
+    assert len(kaldi.instances) == 1
+    assert kaldi.instances[0].resets == 2
+
+
+def test_command_recognizer_wins_on_exact_command(kaldi):
+    rec = VoiceRecognizer(pool_size=1, commands=["Enciende la luz", "apaga la luz"])
+    assert _record(rec) == "enciende la luz"
+
+    full, command = kaldi.instances
+    assert command.grammar == ["apaga la luz", "enciende la luz", "[unk]"]
+    assert full.finals == 0  # full FinalResult skipped
+    assert full.frames == 0 and command.frames > 0  # ni siquiera recibe el audio
+    assert rec.last_stats["replayed_ms"] == 0
+    assert rec.last_stats["decoder"] == "command"
+    assert set(rec.last_stats["decode_ms"]) == {"full", "command"}
+
+
+def test_falls_back_to_full_model_when_not_a_command(kaldi):
+    kaldi.command_text = "enciende la [unk]"
+    rec = VoiceRecognizer(pool_size=1, commands=["enciende la luz"])
+    assert _record(rec) == "enciende la luz del salón por favor"
+    assert rec.last_stats["decoder"] == "full"
+
+
+def test_full_model_takes_over_when_partial_leaves_the_grammar(kaldi):
+    kaldi.command_partial = "[unk]"
+    rec = VoiceRecognizer(pool_size=1, commands=["enciende la luz"])
+    assert _record(rec) == "enciende la luz del salón por favor"
+
+    full, command = kaldi.instances
+    assert command.frames == 1  # la gramática se abandona en el primer parcial
+    assert full.frames > 1  # el audio guardado se repite y después sigue en directo
+    assert command.finals == 0
+    assert rec.last_stats["replayed_ms"] == rec.chunk_ms
+
+
+def test_command_only_mode_has_no_full_decoder(kaldi):
+    rec = VoiceRecognizer(pool_size=1, commands=["enciende la luz"], command_mode="only")
+    assert _record(rec) == "enciende la luz"
+    assert len(kaldi.instances) == 1
+    assert set(rec.last_stats["decode_ms"]) == {"command"}
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import numpy as np
+
+from audio_capture import AudioCapture
+from satellite import Satellite
+from satellite_server import SatelliteServer
+
+FRAME = 1280
+
+
+class ToneWake:
+    """Detects a loud frame (stand-in for openWakeWord)."""
+
+    def __init__(self):
+        self.detected_at = None
+
+    def poll(self, cursor):
+        if cursor.lag < FRAME:
+            return False
+        samples = cursor.read(FRAME, timeout=0)
+        if samples is not None and samples.max() > 20000:
+            self.detected_at = cursor.position
+            return True
+        return False
+
+    def reset(self):
+        pass
+
+    def snapshot(self):
+        return {}
+
+
+class FixedRecognizer:
+    def for_capture(self, capture):
+        return self
+
+    def record_and_transcribe(self, start=None):
+        return "qué hora es"
+
+
+class TwoSentences:
+    def chat_stream(self, text):
+        yield "Son las cinco."
+        yield "Buenas tardes."
+
+
+class SlowTTS:
+    sample_rate = 16000
+
+    def synthesize(self, text):
+        time.sleep(0.2)
+        return np.zeros(8000, dtype=np.int16).tobytes()  # 0.5 s
+
+
+def _feed(capture, wake_after_s):
+    capture.write(np.zeros(int(16000 * wake_after_s), dtype=np.int16))
+    capture.write(np.full(FRAME, 30000, dtype=np.int16))
+    capture.write(np.zeros(16000, dtype=np.int16))
+
+
+def test_satellites_get_answers_and_session_limit():
+    server = SatelliteServer(ToneWake, FixedRecognizer(), TwoSentences, SlowTTS(),
+                             host="127.0.0.1", port=0, max_sessions=1)
+    events = {"a": [], "b": []}
+
+    async def scenario():
+        await server.start()
+        sats = {}
+        for name in events:
+            capture = AudioCapture()
+            sats[name] = Satellite(capture, port=server.port, name=name,
+                                   on_event=events[name].append)
+        tasks = [asyncio.ensure_future(s.run()) for s in sats.values()]
+        await asyncio.sleep(0.1)
+        _feed(sats["a"].capture, 0.08)
+        await asyncio.sleep(0.15)
+        _feed(sats["b"].capture, 0.08)  # "a" is still being answered
+        for _ in range(100):
+            if any(e["event"] == "audio_end" for e in events["a"]):
+                break
+            await asyncio.sleep(0.05)
+        for sat in sats.values():
+            sat.capture.close()
+        await asyncio.wait(tasks, timeout=2)
+        await server.stop()
+        return sats
+
+    sats = asyncio.run(scenario())
+
+    kinds_a = [e["event"] for e in events["a"]]
+    assert kinds_a == ["wake", "transcript", "audio_start", "audio_end"]
+    assert sats["a"].received_bytes == 2 * 16000  # two 0.5 s sentences
+    assert [e["event"] for e in events["b"]] == ["busy"]
+    assert server.busy_rejections == 1
+    assert server.sessions[0]["stream"] == "a"
+    assert server.sessions[0]["first_audio_ms"] is not None
+    assert server.sessions_total == 1
@@ -0,0 +1,71 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from pipeline import Pipeline
+from startup import ModelLoader
+from test_pipeline import FakeAssistant, FakeCapture, FakeRecognizer, FakeTTS, FakeWake
+
+
+class Model:
+    def __init__(self):
+        self.warmed = False
+
+    def warmup(self):
+        self.warmed = True
+
+
+def test_loader_runs_in_parallel_and_warms_up():
+    loader = ModelLoader()
+
+    def slow():
+        time.sleep(0.2)
+        return Model()
+
+    t0 = time.perf_counter()
+    a = loader.submit("a", slow)
+    b = loader.submit("b", slow)
+    report = loader.report()
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 0.35  # both loads overlapped
+    assert a.result().warmed and b.result().warmed
+    assert set(report) == {"a", "b"}
+    assert report["a"]["load_ms"] >= 150
+    loader.shutdown()
+
+
+def test_loader_reports_failures():
+    loader = ModelLoader()
+
+    def broken():
+        raise FileNotFoundError("models/vosk")
+
+    loader.submit("vosk", broken)
+    assert loader.wait(timeout=1)
+    assert loader.loaded("vosk") is None
+    assert loader.report() == {}
+    loader.shutdown()
+
+
+def test_pipeline_waits_for_components_still_loading():
+    first_spoken, done = threading.Event(), threading.Event()
+    capture = FakeCapture()
+    recognizer = FakeRecognizer()
+    pending = concurrent.futures.Future()
+    # Vosk finishes loading after the wake word has already been detected
+    threading.Timer(0.2, pending.set_result, args=(recognizer,)).start()
+
+    tts = FakeTTS(first_spoken, done)
+    pipeline = Pipeline(capture, FakeWake(capture), pending,
+                        FakeAssistant(first_spoken), tts)
+
+    threading.Thread(target=lambda: done.wait(5) and pipeline.stop(), daemon=True).start()
+    try:
+        asyncio.run(pipeline.run())
+    except asyncio.CancelledError:
+        pass
+
+    assert recognizer.starts == [1234]
+    assert tts.spoken == ["Primera frase.", "Segunda frase."]
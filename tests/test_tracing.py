@@ -0,0 +1,42 @@
+import json
+
+import tracing
+
+
+def test_turn_spans_and_outputs(tmp_path):
+    t = tracing.Tracer(
+        jsonl_path=str(tmp_path / "trace.jsonl"), prom_path=str(tmp_path / "m.prom")
+    )
+    t.start_turn()
+    t.mark("speech_start")
+    t.mark("endpoint")
+    t.mark("endpoint")  # only the first mark counts
+    t.mark("llm_request")
+    t.set_gauge("http_reused", 3)
+    record = t.end_turn()
+
+    assert list(record["spans_ms"]) == ["speech_start", "endpoint", "llm_request"]
+    line = json.loads((tmp_path / "trace.jsonl").read_text().splitlines()[0])
+    assert line["turn"] == 1
+    prom = (tmp_path / "m.prom").read_text()
+    assert 'homegpt_stage_latency_ms{stage="endpoint",quantile="0.95"}' in prom
+    assert "homegpt_turns_total 1" in prom
+    assert "homegpt_http_reused 3" in prom
+
+
+def test_mark_without_turn_is_noop():
+    t = tracing.Tracer(jsonl_path=None, prom_path=None)
+    t.mark("endpoint")
+    assert t.end_turn() is None
+
+
+def test_rolling_percentiles():
+    t = tracing.Tracer(jsonl_path=None, prom_path=None, window=10)
+    for ms in range(20):
+        t.start_turn()
+        t._marks["speech_start"] = float(ms)
+        t.end_turn()
+    p = t.percentiles()["speech_start"]
+    assert p["count"] == 10
+    assert p["p50"] == 15.0
+    assert p["p95"] == 19.0
@@ -1,9 +1,20 @@
+import struct
+import sys
+import time
+import types
 from unittest import mock
 
+import numpy as np
 import pytest
+from piper.voice import PiperVoice
 
+from tts.base import BaseTTS
+from tts.cache import AudioCache, CachedTTS
+from tts.fallback import FallbackTTS
 from tts.openai_tts import OpenAITTS
+from tts.opus import OggOpusDecoder
 from tts.piper import PiperTTS
+from tts.playback import PlaybackSink, Resampler, SinkOutput
 
 
 def test_openai_tts_empty_text_returns():
@@ -26,3 +37,450 @@ def test_piper_raises_when_model_missing(monkeypatch):
     with mock.patch("os.path.exists", return_value=False):
         with pytest.raises(FileNotFoundError):
             PiperTTS(model_path="/nope.onnx")
+
+
+def test_openai_tts_prefetch_plays_segments_in_order(monkeypatch):
+    t = OpenAITTS(api_key="x", prefetch=2, min_segment_chars=0)
+    requested = []
+
+    class _Resp:
+        def __init__(self, text):
+            self.text = text
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def iter_content(self, chunk_size):
+            yield self.text.encode()
+
+        @property
+        def content(self):
+            return self.text.encode()
+
+    def fake_request(text):
+        requested.append(text)
+        return _Resp(text)
+
+    monkeypatch.setattr(t, "_request", fake_request)
+    with mock.patch("subprocess.Popen") as popen:
+        t.reproduce("Uno. Dos. Tres. Cuatro.")
+    t.close()
+
+    writes = [c.args[0] for c in popen.return_value.stdin.write.call_args_list]
+    assert writes == [b"Uno.", b"Dos.", b"Tres.", b"Cuatro."]
+    assert popen.call_count == 1  # single player for the whole answer
+    assert sorted(requested) == sorted(["Uno.", "Dos.", "Tres.", "Cuatro."])
+
+
+def test_openai_tts_preload_fetches_next_sentence_once(monkeypatch):
+    t = OpenAITTS(api_key="x", prefetch=1)
+    requested = []
+
+    class _Resp:
+        def __init__(self, text):
+            self.text = text
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def iter_content(self, chunk_size):
+            yield self.text.encode()
+
+        @property
+        def content(self):
+            return self.text.encode()
+
+    monkeypatch.setattr(t, "_request", lambda text: requested.append(text) or _Resp(text))
+    with mock.patch("subprocess.Popen") as popen:
+        t.preload("Segunda frase.")
+        t.reproduce("Primera frase.")
+        t.reproduce("Segunda frase.")
+        t.preload("Tercera frase.")
+        t.stop()  # barge-in: la precarga se descarta
+        assert t._take_preloaded("Tercera frase.") is None
+    t.close()
+
+    writes = [c.args[0] for c in popen.return_value.stdin.write.call_args_list]
+    assert writes == [b"Primera frase.", b"Segunda frase."]
+    assert requested.count("Segunda frase.") == 1
+
+
+def test_playback_sink_drains_and_counts():
+    sink = PlaybackSink(sample_rate=16000)
+    out = SinkOutput(sink, 16000)
+    out.write(b"\x01\x00\x02")  # odd byte is held until the next chunk
+    out.write(b"\x00")
+
+    buf = bytearray(8)
+    sink._callback(buf, 4, None, None)
+    assert bytes(buf) == b"\x01\x00\x02\x00" + b"\x00" * 4
+    assert sink.last_ttfs_ms is not None
+    assert sink.underruns == 1  # ran dry while the engine was still writing
+
+    sink.end()
+    assert sink.wait(timeout=1)
+    assert not sink.playing
+
+
+def test_playback_sink_resamples_and_stops():
+    sink = PlaybackSink(sample_rate=16000)
+    sink.begin()
+    sink.write(b"\x00\x00" * 240, sample_rate=24000)
+    sink.write(b"\x00\x00" * 240, sample_rate=24000)
+    sink.end()  # vacía la cola que retiene el filtro
+    assert len(sink._buf) == 320 * 2
+    sink.stop()
+    assert not sink.playing
+
+
+def _tone(freq, rate, seconds=0.1):
+    t = np.arange(int(rate * seconds)) / rate
+    return (10000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def test_resampler_is_continuous_across_chunks():
+    tone = _tone(440, 22050)
+    whole = Resampler(22050, 24000)
+    expected = whole.process(tone.tobytes()) + whole.flush()
+
+    chunked = Resampler(22050, 24000)
+    out = b"".join(chunked.process(tone[i:i + 333].tobytes()) for i in range(0, len(tone), 333))
+    out += chunked.flush()
+    assert out == expected
+    assert len(out) // 2 == int(np.ceil(len(tone) * 24000 / 22050))
+
+
+def test_resampler_low_passes_before_decimating():
+    def level(freq):
+        r = Resampler(48000, 24000)
+        out = np.frombuffer(r.process(_tone(freq, 48000).tobytes()) + r.flush(), dtype=np.int16)
+        return np.abs(out[200:-200]).max()
+
+    assert level(1000) > 9000  # la banda útil pasa
+    assert level(18000) < 500  # por encima de 12 kHz no se pliega
+
+
+def test_piper_plays_through_sink():
+    sink = PlaybackSink(sample_rate=16000)
+    with mock.patch("os.path.exists", return_value=True):
+        t = PiperTTS(sink=sink)
+    with mock.patch.object(sink, "wait") as wait, \
+            mock.patch("subprocess.Popen") as popen:
+        t.reproduce("hola")
+    popen.assert_not_called()
+    wait.assert_called_once()
+    assert len(sink._buf) == 2 * 512
+
+
+def test_sink_stop_measures_interrupt_latency():
+    sink = PlaybackSink(sample_rate=16000)
+    sink.begin()
+    sink.write(b"\x01\x00" * 1000)
+    t_stop = time.perf_counter()
+    sink.stop()
+    assert sink.wait_silent(timeout=0.01) is None  # el dispositivo aún no ha callado
+
+    buf = bytearray(8)
+    sink._callback(buf, 4, None, None)
+    assert bytes(buf) == b"\x00" * 8
+    assert sink.snapshot()["interrupt_ms"] is not None
+    assert sink.wait_silent(timeout=0) >= t_stop
+
+
+def test_openai_tts_stop_interrupts_remaining_segments(monkeypatch):
+    t = OpenAITTS(api_key="x", prefetch=0, min_segment_chars=0)
+    requested = []
+
+    class _Resp:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def iter_content(self, chunk_size):
+            t.stop()  # barge-in while the first segment plays
+            yield b"audio"
+
+        content = b"audio"
+
+    monkeypatch.setattr(t, "_request", lambda text: requested.append(text) or _Resp())
+    with mock.patch("subprocess.Popen") as popen:
+        t.reproduce("Uno. Dos. Tres.")
+
+    assert requested == ["Uno."]
+    popen.return_value.terminate.assert_called()
+    popen.return_value.stdin.write.assert_not_called()
+
+
+def test_openai_tts_play_keeps_pending_stop():
+    sink = mock.Mock()
+    t = OpenAITTS(api_key="x", endpoint="http://localhost", sink=sink)
+    t.start_utterance()
+    t.stop()  # llegó mientras se descargaba/leía el audio
+    t.play(b"AUDIO")
+    sink.write.assert_not_called()
+
+    t.start_utterance()
+    t.play(b"AUDIO")
+    sink.write.assert_called_once()
+
+
+class _FakeEngine(BaseTTS):
+    def __init__(self, delay=0.0, error=None):
+        self.delay, self.error = delay, error
+        self.spoken = []
+
+    def reproduce(self, text):
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline and not self._stopped:
+            time.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        if self._stopped:
+            return
+        self._notify_first_byte()
+        self.spoken.append(text)
+
+
+def test_fallback_tts_prefers_primary_when_fast():
+    primary, local = _FakeEngine(), _FakeEngine()
+    tts = FallbackTTS(primary, local, first_byte_timeout_s=0.5, keep_warm_s=None)
+    first = []
+    tts.on_first_byte = lambda: first.append(True)
+    tts.reproduce("hola")
+    assert primary.spoken == ["hola"] and local.spoken == []
+    assert first == [True]
+    assert tts.stats["primary"] == 1
+
+
+def test_fallback_tts_bounds_time_to_first_audio():
+    primary, local = _FakeEngine(delay=2.0), _FakeEngine()
+    tts = FallbackTTS(primary, local, first_byte_timeout_s=0.1, keep_warm_s=None)
+    t0 = time.monotonic()
+    tts.reproduce("hola")
+    assert time.monotonic() - t0 < 0.5
+    assert local.spoken == ["hola"]
+    assert tts.stats["fallback_timeout"] == 1
+    # la voz local sigue durante sticky_s
+    tts.reproduce("adiós")
+    assert local.spoken == ["hola", "adiós"]
+    assert tts.stats["fallback_sticky"] == 1
+    time.sleep(0.1)
+    assert primary.spoken == []  # la petición abandonada no suena
+
+
+def test_stop_before_reproduce_is_kept_until_start_utterance(tmp_path):
+    primary, local = _FakeEngine(), _FakeEngine()
+    tts = FallbackTTS(
+        CachedTTS(primary, AudioCache(str(tmp_path))), local, keep_warm_s=None
+    )
+    tts.start_utterance()  # el pipeline empieza la frase antes de encolarla
+    tts.stop()  # barge-in entre el submit y reproduce()
+    tts.reproduce("hola")
+    assert primary.spoken == [] and local.spoken == []
+
+    tts.start_utterance()
+    tts.reproduce("hola")
+    assert primary.spoken == ["hola"]
+
+
+class _StreamingEngine(_FakeEngine):
+    """First audio after 50 ms, whole sentence after `total` seconds."""
+
+    def __init__(self, total):
+        super().__init__()
+        self.total = total
+
+    def reproduce(self, text):
+        time.sleep(0.05)
+        self._notify_first_byte()
+        time.sleep(self.total)
+        self.spoken.append(text)
+
+    def synthesize(self, text):
+        time.sleep(0.05 + self.total)  # descarga completa
+        return b"audio"
+
+    def play(self, audio):
+        self._notify_first_byte()
+
+    def cache_params(self):
+        return {"engine": "stream"}
+
+
+def test_fallback_deadline_uses_first_streamed_byte_through_cache(tmp_path):
+    engine, local = _StreamingEngine(total=0.5), _FakeEngine()
+    tts = FallbackTTS(CachedTTS(engine, AudioCache(str(tmp_path))), local,
+                      first_byte_timeout_s=0.3, keep_warm_s=None)
+    tts.reproduce("Una frase nueva.")
+    assert engine.spoken == ["Una frase nueva."] and local.spoken == []
+    assert tts.stats["primary"] == 1 and tts.stats["fallback_timeout"] == 0
+    assert tts.last_first_byte_ms < 300
+
+
+def test_fallback_tts_on_primary_error():
+    primary, local = _FakeEngine(error=RuntimeError("sin red")), _FakeEngine()
+    tts = FallbackTTS(primary, local, first_byte_timeout_s=1.0, sticky_s=0, keep_warm_s=None)
+    t0 = time.monotonic()
+    tts.reproduce("hola")
+    assert time.monotonic() - t0 < 0.5
+    assert local.spoken == ["hola"]
+    assert tts.stats["fallback_error"] == 1
+
+
+class _SlowVoice:
+    sample_rate = 16000
+
+    def synthesize(self, text):
+        for _ in range(3):
+            time.sleep(0.1)
+            yield types.SimpleNamespace(audio_int16_bytes=b"\x00\x00" * 1600)  # 0.1 s
+
+
+def test_piper_reads_ahead_while_playing():
+    with mock.patch("os.path.exists", return_value=True):
+        t = PiperTTS(read_ahead=2, warmup_on_load=False)
+    t.voice = _SlowVoice()
+    with mock.patch("subprocess.Popen") as popen:
+        popen.return_value.stdin.write.side_effect = lambda data: time.sleep(0.1)
+        t0 = time.monotonic()
+        t.reproduce("Uno. Dos. Tres.")
+        elapsed = time.monotonic() - t0
+    assert popen.return_value.stdin.write.call_count == 3
+    assert elapsed < 0.55  # alternando serían 0.6 s
+    assert 0.9 < t.last_stats["rtf"] < 1.5
+    assert t.last_stats["audio_s"] == 0.3
+
+
+def test_piper_onnx_session_options(monkeypatch):
+    created = {}
+
+    class _Options:
+        pass
+
+    fake_ort = types.SimpleNamespace(
+        SessionOptions=_Options,
+        GraphOptimizationLevel=types.SimpleNamespace(ORT_ENABLE_ALL="all"),
+        InferenceSession=lambda path, sess_options, providers: created.update(
+            path=path, options=sess_options, providers=providers
+        ) or "session",
+    )
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake_ort)
+    session = mock.Mock()
+    session.get_providers.return_value = ["CPUExecutionProvider"]
+    monkeypatch.setattr(PiperVoice, "session", session, raising=False)
+    with mock.patch("os.path.exists", return_value=True):
+        t = PiperTTS(model_path="voz.onnx", intra_op_threads=3)
+    assert created["options"].intra_op_num_threads == 3
+    assert created["providers"] == ["CPUExecutionProvider"]
+    assert t.voice.session == "session"
+
+
+def test_piper_low_memory_session(monkeypatch):
+    created = {}
+
+    class _Options:
+        def __init__(self):
+            self.entries = {}
+
+        def add_session_config_entry(self, key, value):
+            self.entries[key] = value
+
+    fake_ort = types.SimpleNamespace(
+        SessionOptions=_Options,
+        GraphOptimizationLevel=types.SimpleNamespace(ORT_ENABLE_ALL="all"),
+        InferenceSession=lambda path, sess_options, providers: created.update(options=sess_options) or "session",
+    )
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake_ort)
+    session = mock.Mock()
+    session.get_providers.return_value = ["CPUExecutionProvider"]
+    monkeypatch.setattr(PiperVoice, "session", session, raising=False)
+    with mock.patch("os.path.exists", return_value=True):
+        PiperTTS(model_path="voz.ort", low_memory=True)
+    options = created["options"]
+    assert options.enable_cpu_mem_arena is False and options.enable_mem_pattern is False
+    assert options.entries["session.disable_prepacking"] == "1"
+    assert options.entries["session.use_ort_model_bytes_for_initializers"] == "1"
+
+
+def _ogg_page(packets, header_type=0, seq=0):
+    lacing, body = bytearray(), bytearray()
+    for packet in packets:
+        n = len(packet)
+        lacing += bytes([255] * (n // 255) + [n % 255])
+        body += packet
+    return struct.pack("<4sBBqIIIB", b"OggS", 0, header_type, 0, 1, seq, 0, len(lacing)) + lacing + body
+
+
+class _FakeOpus:
+    """Decodes a packet into one int16 sample per byte, with the byte value."""
+
+    def decode(self, packet, frame_size):
+        return np.frombuffer(packet, dtype=np.uint8).astype(np.int16).tobytes()
+
+
+def test_ogg_opus_decoder_is_incremental():
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<H", 2) + b"\x00" * 7
+    stream = (
+        _ogg_page([head], header_type=0x02)
+        + _ogg_page([b"OpusTags"], seq=1)
+        + _ogg_page([bytes([1, 2, 3, 4]), bytes([5] * 300)], seq=2)  # 300 B: 2 segmentos
+        + _ogg_page([bytes([6, 7])], header_type=0x04, seq=3)
+    )
+    decoder = OggOpusDecoder(decoder_factory=lambda channels: _FakeOpus())
+    out = b"".join(decoder.feed(stream[i:i + 7]) for i in range(0, len(stream), 7))
+    samples = np.frombuffer(out, dtype=np.int16)
+    # pre-skip de 2 muestras
+    assert samples.tolist() == [3, 4] + [5] * 300 + [6, 7]
+
+
+def test_ogg_opus_decoder_at_24khz_scales_pre_skip():
+    created = []
+
+    def factory(channels):
+        created.append(channels)
+        return _FakeOpus()
+
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<H", 4) + b"\x00" * 7
+    stream = _ogg_page([head], header_type=0x02) + _ogg_page([b"OpusTags"], seq=1) \
+        + _ogg_page([bytes([1, 2, 3, 4])], seq=2)
+    decoder = OggOpusDecoder(decoder_factory=factory, sample_rate=24000)
+    samples = np.frombuffer(decoder.feed(stream), dtype=np.int16)
+    assert samples.tolist() == [3, 4]  # 4 muestras de pre-skip a 48 kHz = 2 a 24 kHz
+    with pytest.raises(ValueError):
+        OggOpusDecoder(sample_rate=22050)
+
+
+def test_openai_tts_pcm_stream_reports_first_audio_and_bytes(monkeypatch):
+    sink = PlaybackSink(sample_rate=24000)
+    t = OpenAITTS(api_key="x", sink=sink, min_segment_chars=0)
+    chunks = [b"\x00\x00" * 2400, b"\x00\x00" * 2400]  # 0.2 s a 24 kHz
+
+    class _Resp:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def iter_content(self, chunk_size):
+            yield from chunks
+
+    monkeypatch.setattr(t, "_request", lambda text: _Resp())
+    first = []
+    t.on_first_byte = lambda: first.append(True)
+    with mock.patch.object(sink, "wait"):
+        t.reproduce("hola")
+    assert first == [True]
+    assert t.last_stats["format"] == "pcm"
+    assert t.last_stats["wire_bytes"] == 9600
+    assert t.last_stats["audio_s"] == 0.2
+    assert t.last_stats["ttfa_ms"] is not None
+    assert t.snapshot()["pcm_kbps"] == 384.0
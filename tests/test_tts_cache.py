@@ -0,0 +1,111 @@
+from tts.base import BaseTTS
+from tts.cache import AudioCache, CachedTTS
+
+
+class FakeTTS(BaseTTS):
+    def __init__(self):
+        self.synth_calls = []
+        self.played = []
+        self.streamed = []
+
+    def reproduce(self, text):
+        self.streamed.append(text)
+        self._notify_first_byte()
+        self._emit_audio(text.encode() * 10)
+
+    def synthesize(self, text):
+        self.synth_calls.append(text)
+        return text.encode() * 10
+
+    def play(self, audio):
+        self.played.append(audio)
+
+    def cache_params(self):
+        return {"engine": "fake", "voice": "v", "model": "m", "format": "raw"}
+
+
+def test_key_depends_on_engine_params():
+    k1 = AudioCache.key("hola", engine="openai", voice="alloy")
+    k2 = AudioCache.key("hola", engine="openai", voice="nova")
+    assert k1 != k2
+    assert k1 == AudioCache.key(" hola ", engine="openai", voice="alloy")
+
+
+def test_miss_streams_and_repeated_sentence_is_cached(tmp_path):
+    engine = FakeTTS()
+    first_bytes = []
+    tts = CachedTTS(engine, AudioCache(str(tmp_path)))
+    tts.on_first_byte = lambda: first_bytes.append(1)
+
+    tts.reproduce("Hola.")  # única: se emite en streaming y no se guarda
+    assert engine.streamed == ["Hola."] and tts.cache.size_bytes == 0
+    tts.reproduce("Hola.")  # repetida: se guarda lo recibido en streaming
+    tts.reproduce("Hola.")
+
+    assert engine.synth_calls == []
+    assert engine.streamed == ["Hola.", "Hola."]
+    assert engine.played == [b"Hola." * 10]
+    assert tts.cache.hits == 1
+    assert len(first_bytes) == 3
+
+
+def test_stopped_stream_is_not_cached(tmp_path):
+    engine = FakeTTS()
+    tts = CachedTTS(engine, AudioCache(str(tmp_path)))
+    tts.reproduce("Hola.")
+
+    def interrupted(text):
+        engine._emit_audio(b"medio")
+        tts.stop()  # barge-in a mitad de frase
+
+    engine.reproduce = interrupted
+    tts.reproduce("Hola.")
+    assert tts.cache.size_bytes == 0
+
+
+def test_long_text_is_streamed(tmp_path):
+    engine = FakeTTS()
+    tts = CachedTTS(engine, AudioCache(str(tmp_path)), max_text_chars=5)
+    tts.reproduce("una respuesta larga")
+    assert engine.streamed == ["una respuesta larga"]
+    assert engine.synth_calls == []
+
+
+def test_lru_eviction_and_persistence(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=25)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 10)
+    assert cache.get("a") is not None  # "a" becomes most recent
+    cache.put("c", b"x" * 10)
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+
+    reloaded = AudioCache(str(tmp_path), max_bytes=25)
+    assert reloaded.size_bytes == 20
+    assert reloaded.get("c") == b"x" * 10
+
+
+def test_prerender_skips_cached(tmp_path):
+    engine = FakeTTS()
+    tts = CachedTTS(engine, AudioCache(str(tmp_path)))
+    assert tts.prerender(["Uno.", "Dos."]) == 2
+    assert tts.prerender(["Uno.", "Dos."]) == 0
+    tts.reproduce("Uno.")
+    assert engine.synth_calls == ["Uno.", "Dos."]
+
+
+def test_stop_while_reading_cache_skips_playback(tmp_path):
+    engine = FakeTTS()
+    tts = CachedTTS(engine, AudioCache(str(tmp_path)))
+    tts.prerender(["Hola."])
+    get = tts.cache.get
+
+    def slow_get(key):
+        audio = get(key)
+        tts.stop()  # barge-in mientras se lee el disco
+        return audio
+
+    tts.cache.get = slow_get
+    tts.reproduce("Hola.")
+    assert engine.played == [] and engine.streamed == []
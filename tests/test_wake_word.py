@@ -0,0 +1,188 @@
+import collections
+import queue
+import time
+import wave
+
+import numpy as np
+
+from audio_capture import AudioCapture, AudioCursor, FileCapture
+from wake_word import FRAME_SAMPLES, SharedWakeWord, WakeWordModel
+
+
+class _Model:
+    def __init__(self, scores):
+        self.scores = list(scores)
+        self.inputs = []
+
+    def predict(self, frame):
+        self.inputs.append(len(frame))
+        return {"alexa": self.scores.pop(0)}
+
+    def reset(self):
+        pass
+
+
+def test_callback_counts_dropped_frames_when_queue_full():
+    w = WakeWordModel(queue_frames=2)
+    indata = np.zeros((FRAME_SAMPLES, 1), dtype=np.float32)
+    for _ in range(3):
+        w._callback(indata, FRAME_SAMPLES, None, None)
+    assert w.frames.qsize() == 2
+    assert w.snapshot()["dropped"] == 1
+
+
+def test_next_batch_groups_pending_frames():
+    w = WakeWordModel(max_batch=3)
+    for i in range(4):
+        w.frames.put((0.0, np.full(FRAME_SAMPLES, i, dtype=np.int16)))
+    _, batch = w._next_batch()
+    assert [int(f[0]) for f in batch] == [0, 1, 2]
+    assert w.frames.qsize() == 1
+
+
+def test_next_batch_blocks_until_timeout():
+    w = WakeWordModel()
+    try:
+        w._next_batch(timeout=0.01)
+    except queue.Empty:
+        pass
+    else:
+        raise AssertionError("expected queue.Empty")
+
+
+def test_shared_capture_batches_backlog_and_detects(monkeypatch):
+    cap = AudioCapture()
+    w = WakeWordModel(capture=cap, max_batch=4)
+    w.model = _Model([0.1, 0.9])
+
+    # the detector starts 5 frames behind the writer
+    monkeypatch.setattr(cap, "cursor", lambda start=None: AudioCursor(cap, 0))
+    cap.write(np.zeros(5 * FRAME_SAMPLES, dtype=np.int16))
+
+    # the first read takes a batch of 4 frames, the next one a single frame
+    assert w.activate()
+    assert w.model.inputs == [4 * FRAME_SAMPLES, FRAME_SAMPLES]
+    assert w.detected_at == 5 * FRAME_SAMPLES
+    assert w.snapshot()["batches"] == 1
+    assert w.snapshot()["frames"] == 5
+
+
+def test_threshold_is_raised_while_playing():
+    w = WakeWordModel(threshold=0.5, playback_threshold=0.8)
+    w.model = _Model([0.6, 0.6])
+    assert w._check(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+    w.is_playing = lambda: True
+    assert not w._check(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+
+
+def test_poll_never_blocks_and_batches_buffered_frames():
+    cap = AudioCapture()
+    w = WakeWordModel(capture=cap, max_batch=4)
+    w.model = _Model([0.1, 0.9])
+    cursor = cap.cursor()
+
+    assert w.poll(cursor) is False  # nothing buffered yet: returns at once
+    cap.write(np.zeros(FRAME_SAMPLES * 3, dtype=np.int16))
+    assert w.poll(cursor) is False
+    cap.write(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+    assert w.poll(cursor) is True
+
+    assert w.model.inputs == [FRAME_SAMPLES * 3, FRAME_SAMPLES]
+    assert w.detected_at == FRAME_SAMPLES * 4
+
+
+def test_activate_scores_file_from_given_start(tmp_path):
+    path = tmp_path / "alexa.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(np.zeros(6 * FRAME_SAMPLES, dtype=np.int16).tobytes())
+    cap = FileCapture(str(path), tail_silence_ms=0)
+    cap.start()
+    while cap.position < 6 * FRAME_SAMPLES:  # sin ritmo: todo el fichero de golpe
+        time.sleep(0.01)
+
+    w = WakeWordModel(capture=cap)
+    w.model = _Model([0.0, 0.9, 0.0, 0.0, 0.9, 0.0])
+    assert w.activate(start=0)
+    assert w.detected_at == 2 * FRAME_SAMPLES
+    assert w.activate(start=w.detected_at)
+    assert w.detected_at == 5 * FRAME_SAMPLES
+    assert w.stats["frames"] == 5  # ninguna muestra del principio se salta
+
+
+class _Features:
+    """Stand-in for openWakeWord's AudioFeatures: one feature per frame (its peak)."""
+
+    def __init__(self):
+        self.raw_data_buffer = collections.deque(maxlen=10)
+        self.reset()
+
+    def reset(self):
+        self.raw_data_buffer.clear()
+        self.feature_buffer = np.zeros((4, 1), dtype=np.float32)
+
+    def __call__(self, x):
+        for frame in np.split(x, len(x) // FRAME_SAMPLES):
+            self.raw_data_buffer.append(frame)
+            peak = np.abs(frame).max() / 32767
+            self.feature_buffer = np.vstack([self.feature_buffer, [[peak]]])[-4:]
+        return len(x)
+
+    def get_features(self, n, start_ndx=-1):
+        end = start_ndx + n or None
+        return self.feature_buffer[start_ndx:end][None].astype(np.float32)
+
+
+class _SharedModel:
+    def __init__(self):
+        self.preprocessor = _Features()
+        self.model_inputs = {"alexa": 2}
+        self.batches = []
+        self.model_prediction_function = {"alexa": self._predict}
+
+    def _predict(self, x):
+        self.batches.append(x.shape)
+        return [x[:, -1, :]]  # puntuación = pico del último frame
+
+
+def test_shared_model_scores_every_stream_in_one_batch():
+    shared = SharedWakeWord(max_batch=2)
+    shared.model = _SharedModel()
+    streams = [(shared.stream(), AudioCapture()) for _ in range(2)]
+    cursors = [cap.cursor() for _, cap in streams]
+    pairs = [(detector, cursor) for (detector, _), cursor in zip(streams, cursors)]
+
+    # Calentamiento: los primeros frames de cada stream no se evalúan
+    for _, cap in streams:
+        cap.write(np.zeros(SharedWakeWord.WARMUP_FRAMES * FRAME_SAMPLES, dtype=np.int16))
+    while any(c.lag for c in cursors):
+        assert shared.poll_batch(pairs) == [False, False]
+    assert shared.model.batches == []
+
+    streams[0][1].write(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+    streams[1][1].write(np.full(FRAME_SAMPLES, 30000, dtype=np.int16))
+    assert shared.poll_batch(pairs) == [False, True]
+    assert shared.model.batches == [(2, 2, 1)]  # una sola predicción para los dos
+    assert pairs[1][0].detected_at == (SharedWakeWord.WARMUP_FRAMES + 1) * FRAME_SAMPLES
+    # Cada stream tiene sus propios buffers de características
+    assert pairs[0][0].features.raw_data_buffer is not pairs[1][0].features.raw_data_buffer
+    assert pairs[0][0].features.feature_buffer.max() == 0
+
+
+def test_shared_model_falls_back_to_single_rows():
+    shared = SharedWakeWord()
+    shared.model = _SharedModel()
+    calls = []
+
+    def fixed_batch(x):
+        calls.append(len(x))
+        if len(x) > 1:
+            raise ValueError("batch dimension must be 1")
+        return [x[:, -1, :]]
+
+    shared.model.model_prediction_function["alexa"] = fixed_batch
+    scores = shared._predict("alexa", np.array([[[0.1], [0.2]], [[0.3], [0.9]]], dtype=np.float32))
+    assert [round(float(s), 1) for s in scores] == [0.2, 0.9]
+    assert calls == [2, 1, 1]
@@ -0,0 +1,80 @@
+import os
+import time
+
+from web.brave import BraveProvider
+from web.cache import WebCache, normalize_query
+
+
+def test_similar_spoken_queries_share_a_key():
+    assert normalize_query("¿Qué tiempo hace en Madrid?") == normalize_query("tiempo en madrid")
+    assert normalize_query("Madrid tiempo") == normalize_query("tiempo madrid")
+    assert normalize_query("tiempo en Sevilla") != normalize_query("tiempo en Madrid")
+
+
+def test_different_questions_get_different_keys():
+    questions = [
+        "¿Cuándo juega el Real Madrid?",
+        "¿Dónde juega el Real Madrid?",
+        "¿Quién es el presidente de Francia?",
+        "¿Cómo es el presidente de Francia?",
+        "¿Cuál es el presidente de Francia?",
+        "tiempo en Madrid hoy",
+        "tiempo en Madrid mañana",
+    ]
+    assert len({normalize_query(q) for q in questions}) == len(questions)
+
+
+def _provider(tmp_path, calls):
+    provider = BraveProvider(api_key="dummy", cache=WebCache(cache_dir=str(tmp_path)))
+
+    def fake_search_web(query, count):
+        calls.append("search")
+        return [{"title": "A", "href": "http://x", "snippet": "s"},
+                {"title": "B", "href": "http://y", "snippet": "t"}]
+
+    def fake_fetch_and_extract(results, deadline):
+        calls.append(("pages", [r["href"] for r in results]))
+        for r in results:
+            r["full_text"] = f"texto de {r['href']}"
+
+    provider._search_web = fake_search_web
+    provider._fetch_and_extract = fake_fetch_and_extract
+    return provider
+
+
+def test_both_levels_hit_and_persist(tmp_path):
+    calls = []
+    provider = _provider(tmp_path, calls)
+    first = provider.search("¿Qué tiempo hace en Madrid?", 2)
+    second = provider.search("tiempo en madrid", 2)
+    assert calls == ["search", ("pages", ["http://x", "http://y"])]
+    assert second == first
+    assert provider.last_stats["cached"] and provider.last_stats["cached_pages"] == 2
+
+    # otra instancia (reinicio) lee la caché del disco
+    calls.clear()
+    restarted = _provider(tmp_path, calls)
+    assert restarted.search("tiempo madrid", 2)[0]["full_text"] == "texto de http://x"
+    assert calls == []
+    snapshot = provider.snapshot()
+    assert snapshot["query_hit_ratio"] == 0.5 and snapshot["page_hit_ratio"] == 0.5
+    assert snapshot["saved_ms_total"] >= 0
+
+
+def test_query_expires_but_pages_are_reused(tmp_path):
+    calls = []
+    provider = _provider(tmp_path, calls)
+    provider.cache.queries.ttl_s = 0.05
+    provider.search("noticias", 2)
+    time.sleep(0.1)
+    provider.search("noticias", 2)
+    assert calls == ["search", ("pages", ["http://x", "http://y"]), "search"]
+
+
+def test_levels_are_size_bounded(tmp_path):
+    cache = WebCache(cache_dir=str(tmp_path), max_pages=2)
+    for i in range(4):
+        cache.put_page(f"http://p{i}", f"texto {i}")
+    assert cache.get_page("http://p0") is None
+    assert cache.get_page("http://p3") == "texto 3"
+    assert len(os.listdir(tmp_path / "pages")) == 2
@@ -1,15 +1,36 @@
 import logging
 import os
 import re
-import time
+from typing import Iterator, Optional
 
 from openai import OpenAI
 
+import tracing
+from llm_guard import BudgetExceeded, CircuitOpen, LLMGuard
+from web.base import make_web_search
+
 logger = logging.getLogger(__name__)
 
+# Frases fijas del sistema (se pre-renderizan en la caché de TTS)
+NO_ANSWER_RESPONSE = "Lo siento, no pude generar una respuesta."
+UNEXPECTED_ERROR_RESPONSE = "Lo siento, ocurrió un error inesperado."
+CONNECTION_ERROR_RESPONSE = "Error de conexión: no pude contactar con el asistente."
+TIMEOUT_RESPONSE = "Lo siento, el asistente está tardando demasiado. Inténtalo de nuevo."
+DEGRADED_RESPONSE = "El asistente no está disponible ahora mismo. Inténtalo en un momento."
+SYSTEM_PHRASES = (
+    NO_ANSWER_RESPONSE,
+    UNEXPECTED_ERROR_RESPONSE,
+    CONNECTION_ERROR_RESPONSE,
+    TIMEOUT_RESPONSE,
+    DEGRADED_RESPONSE,
+)
+
+# Fin de frase: puntuación final (con cierres opcionales) seguida de espacio
+_SENTENCE_END = re.compile(r'[.!?…]["»”)]*\s+')
+
 
 class VoiceAssistant:
-    def __init__(self):
+    def __init__(self, http_client=None, router=None, answer_cache=None, guard=None, web_search=None):
         api_key = os.getenv("OPENAI_API_KEY")
 
         if not api_key:
@@ -17,7 +38,23 @@ class VoiceAssistant:
                 "OPENAI_API_KEY no encontrada. Verifica tu archivo config.env"
             )
 
-        self.client = OpenAI(api_key=api_key)
+        # http_client: httpx.Client compartido (HTTPPool) para reutilizar conexiones
+        if http_client is not None:
+            self.client = OpenAI(api_key=api_key, http_client=http_client)
+        else:
+            self.client = OpenAI(api_key=api_key)
+
+        # Camino rápido local: intents (hora, fecha, temporizadores) y caché de respuestas
+        self.router = router
+        self.answer_cache = answer_cache
+
+        # Contexto web opcional (WebSearchProvider con su propio presupuesto de tiempo)
+        self.web_search = web_search
+        self.web_results = 3
+
+        # Presupuesto de latencia, peticiones duplicadas y circuit breaker
+        # (compartible entre asistentes, p. ej. en el servidor de satélites)
+        self.guard = guard or LLMGuard()
 
         # Configuración
         self.model = "gpt-5-search-api"
@@ -31,37 +68,204 @@ class VoiceAssistant:
             ),
         }
 
-    def chat(self, user_text: str) -> str:
-        """Envía texto al LLM y devuelve la respuesta."""
+        # Historial de conversación (modo continuo): sistema + últimos mensajes
+        self.max_turns = 9  # mensajes guardados, incluido el de sistema
+        self.max_history_tokens = 1500  # presupuesto aproximado del historial
+        self.history = [self.system_message]
 
+    def _build_messages(self, user_text: str) -> list:
         query = (
             f"{user_text}\n\n"
             "Recuerda: respuesta breve, sin URLs ni enlaces, menciona fuentes de forma natural."
         )
+        if self.web_search is not None:
+            context = make_web_search(user_text, self.web_results, self.web_search)
+            if context:
+                query = f"{context}\n\nPregunta: {query}"
+
+        return self.history + [{"role": "user", "content": query}]
+
+    def clear_history(self) -> None:
+        """Olvida la conversación (deja solo el mensaje de sistema)."""
+        self.history = [self.system_message]
 
-        messages = [
-            self.system_message,
-            {"role": "user", "content": query}
-        ]
+    def _local_answer(self, user_text: str) -> Optional[str]:
+        """Respuesta sin LLM: intent local o respuesta en caché."""
+        if self.router is not None:
+            answer = self.router.route(user_text)
+            if answer:
+                return answer
+        # La caché solo vale fuera de una conversación (sin contexto previo)
+        if self.answer_cache is not None and len(self.history) == 1:
+            answer = self.answer_cache.get(user_text)
+            if answer:
+                logger.info("Respuesta en caché")
+                return answer
+        return None
 
-        for attempt in range(3):
+    def _cache_answer(self, user_text: str, answer: str) -> None:
+        if self.answer_cache is not None and len(self.history) == 1:
+            self.answer_cache.put(user_text, answer)
+
+    def _remember(self, user_text: str, answer: str) -> None:
+        """Añade el intercambio al historial y lo recorta."""
+        self.history.append({"role": "user", "content": user_text})
+        self.history.append({"role": "assistant", "content": answer})
+        self._trim_history()
+
+    def _trim_history(self) -> None:
+        """Mantiene el historial dentro de max_turns mensajes y max_history_tokens.
+
+        Se descartan los intercambios más antiguos; el mensaje de sistema se
+        conserva siempre y el historial recortado empieza por un mensaje de usuario.
+        """
+        turns = self.history[1:]
+        while turns and (
+            len(turns) > self.max_turns - 1
+            or _estimate_tokens(turns) > self.max_history_tokens
+            or turns[0]["role"] != "user"
+        ):
+            turns.pop(0)
+        self.history = [self.system_message] + turns
+
+    def chat(self, user_text: str) -> str:
+        """Envía texto al LLM y devuelve la respuesta."""
+
+        local = self._local_answer(user_text)
+        if local:
+            self._remember(user_text, local)
+            return local
+
+        messages = self._build_messages(user_text)
+
+        def request(timeout: float):
+            tracing.mark("llm_request")
+            return self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_completion_tokens=self.max_tokens,
+                timeout=timeout,
+            )
+
+        try:
+            resp = self.guard.call(request)
+        except CircuitOpen:
+            return DEGRADED_RESPONSE
+        except BudgetExceeded:
+            return TIMEOUT_RESPONSE
+        except Exception as e:
+            logger.error(f"Error llamando al LLM: {e}")
+            return CONNECTION_ERROR_RESPONSE
+
+        tracing.mark("llm_first_token")
+        answer = (resp.choices[0].message.content or "").strip()
+        if not answer:
+            return NO_ANSWER_RESPONSE
+        answer = self._clean_response(answer)
+        self._cache_answer(user_text, answer)
+        self._remember(user_text, answer)
+        return answer
+
+    def chat_stream(self, user_text: str) -> Iterator[str]:
+        """Envía texto al LLM en modo streaming y produce frases ya limpias.
+
+        Cada frase se entrega en cuanto el modelo la termina, para que el TTS
+        empiece a hablar sin esperar a la respuesta completa. El presupuesto de
+        latencia y la petición duplicada cubren hasta el primer fragmento con
+        texto; después ya no se reintenta.
+        """
+
+        local = self._local_answer(user_text)
+        if local:
+            self._remember(user_text, local)
+            sentences, tail = self._split_sentences(local + " ")
+            for sentence in sentences + [tail]:
+                if sentence.strip():
+                    yield sentence.strip()
+            return
+
+        messages = self._build_messages(user_text)
+
+        def request(timeout: float):
+            """Abre el stream y espera al primer fragmento con texto."""
+            tracing.mark("llm_request")
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_completion_tokens=self.max_tokens,
+                stream=True,
+                timeout=timeout,
+            )
+            chunks = iter(stream)
+            for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    return stream, chunks, chunk.choices[0].delta.content
+            return stream, chunks, ""
+
+        try:
+            stream, chunks, pending = self.guard.call(request, discard=lambda r: _close(r[0]))
+        except CircuitOpen:
+            yield DEGRADED_RESPONSE
+            return
+        except BudgetExceeded:
+            yield TIMEOUT_RESPONSE
+            return
+        except Exception as e:
+            logger.error(f"Error en streaming del LLM: {e}")
+            yield CONNECTION_ERROR_RESPONSE
+            return
+
+        if pending:
+            tracing.mark("llm_first_token")
+        spoken: list[str] = []
+        try:
+            # Ya hay respuesta: un fallo a mitad de stream no se reintenta
             try:
-                resp = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    max_completion_tokens=self.max_tokens,
-                )
-                answer = (resp.choices[0].message.content or "").strip()
-                if answer:
-                    answer = self._clean_response(answer)
-                    return answer
-                return "Lo siento, no pude generar una respuesta."
+                text = ""
+                for delta in _deltas(pending, chunks):
+                    text += delta
+                    sentences, text = self._split_sentences(text)
+                    for sentence in sentences:
+                        sentence = self._clean_response(sentence)
+                        if sentence:
+                            spoken.append(sentence)
+                            yield sentence
+                tail = self._clean_response(text)
+                if tail:
+                    spoken.append(tail)
+                    yield tail
             except Exception as e:
-                if attempt == 2:
-                    return f"Error de conexión: {str(e)}"
-                time.sleep(0.6 * (attempt + 1))
-                
-        return "Lo siento, ocurrió un error inesperado."
+                logger.error(f"Error en streaming del LLM: {e}")
+                yield CONNECTION_ERROR_RESPONSE
+                return
+
+            if spoken:
+                self._cache_answer(user_text, " ".join(spoken))
+            else:
+                yield NO_ANSWER_RESPONSE
+        finally:
+            _close(stream)  # libera la conexión también tras un barge-in
+            # También si se corta a mitad (barge-in): se guarda lo que se llegó a decir
+            if spoken:
+                self._remember(user_text, " ".join(spoken))
+
+    @staticmethod
+    def _split_sentences(text: str) -> tuple[list[str], str]:
+        """Separa las frases completas del texto pendiente.
+
+        No corta dentro de enlaces markdown abiertos para que _clean_response
+        reciba siempre el enlace entero.
+        """
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(text):
+            candidate = text[start:match.end()]
+            if candidate.count("[") != candidate.count("]") or \
+                    candidate.count("(") != candidate.count(")"):
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        return sentences, text[start:]
 
     def _clean_response(self, text: str) -> str:
         """Elimina enlaces markdown y limpia el formato para voz."""
@@ -78,6 +282,24 @@ class VoiceAssistant:
         return text
 
 
+def _deltas(first: str, chunks) -> Iterator[str]:
+    yield first
+    for chunk in chunks:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+
+def _close(stream) -> None:
+    close = getattr(stream, "close", None)
+    if close is not None:
+        close()
+
+
+def _estimate_tokens(messages: list) -> int:
+    """Estimación barata de tokens (~4 caracteres por token)."""
+    return sum(len(m["content"]) // 4 + 4 for m in messages)
+
+
 if __name__ == "__main__":
     from dotenv import load_dotenv
 
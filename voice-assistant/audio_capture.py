@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+import wave
+from typing import Optional
+
+import numpy as np
+import sounddevice as sd
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCapture:
+    """Persistent microphone capture into a preallocated int16 ring buffer.
+
+    A single input stream stays open for the lifetime of the assistant. Consumers
+    (wake word, recorder) read through their own AudioCursor, so switching from
+    detection to recording never reopens the device and no audio is lost.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        block_ms: int = 20,
+        buffer_s: float = 10.0,
+        device=None,
+    ):
+        """
+        Initialize capture frontend.
+
+        Args:
+            sample_rate: Audio sample rate (Hz)
+            block_ms: Device callback block duration (ms)
+            buffer_s: Ring buffer length (s)
+            device: sounddevice input device (None = default)
+        """
+        self.sample_rate = sample_rate
+        self.block_samples = sample_rate * block_ms // 1000
+        self.capacity = int(sample_rate * buffer_s)
+        self.device = device
+
+        self._buf = np.zeros(self.capacity, dtype=np.int16)
+        self._written = 0  # total samples written since start (monotonic)
+        self._cond = threading.Condition()
+        self._stream = None
+        self._closed = False
+
+    @property
+    def position(self) -> int:
+        """Absolute index of the next sample to be written."""
+        with self._cond:
+            return self._written
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def start(self) -> None:
+        """Open the input stream (idempotent)."""
+        if self._stream is not None:
+            return
+        self._closed = False
+        self._stream = sd.RawInputStream(
+            samplerate=self.sample_rate,
+            blocksize=self.block_samples,
+            dtype="int16",
+            channels=1,
+            device=self.device,
+            callback=self._callback,
+        )
+        self._stream.start()
+        logger.info("Audio capture started")
+
+    def close(self) -> None:
+        """Stop the input stream and wake up any blocked reader."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _callback(self, indata, frames, time, status):
+        if status:
+            logger.warning(f"Audio callback status: {status}")
+        self.write(np.frombuffer(indata, dtype=np.int16))
+
+    def write(self, samples: np.ndarray) -> None:
+        """Append int16 samples to the ring buffer."""
+        total = len(samples)
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        with self._cond:
+            start = (self._written + total - n) % self.capacity
+            first = min(n, self.capacity - start)
+            self._buf[start:start + first] = samples[:first]
+            self._buf[:n - first] = samples[first:]
+            self._written += total
+            self._cond.notify_all()
+
+    def cursor(self, start: Optional[int] = None) -> "AudioCursor":
+        """Create a reader positioned at `start` (default: current position)."""
+        return AudioCursor(self, self.position if start is None else start)
+
+    def _read(self, pos: int, n: int, timeout: Optional[float]):
+        """Return (samples, pos) once `n` samples from `pos` are available.
+
+        If `pos` has already been overwritten the read is moved forward to the
+        oldest sample still in the buffer. Returns (None, pos) on timeout/close.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._written - pos >= n or self._closed, timeout
+            )
+            if not ready or self._written - pos < n:
+                return None, pos
+            oldest = self._written - self.capacity
+            if pos < oldest:
+                logger.warning(f"Audio overrun: {oldest - pos} samples lost")
+                pos = oldest
+            start = pos % self.capacity
+            first = min(n, self.capacity - start)
+            out = np.empty(n, dtype=np.int16)
+            out[:first] = self._buf[start:start + first]
+            out[first:] = self._buf[:n - first]
+            return out, pos + n
+
+
+class AudioCursor:
+    """Independent read position over an AudioCapture ring buffer."""
+
+    def __init__(self, capture: AudioCapture, position: int):
+        self.capture = capture
+        self.position = position
+        self.dropped = 0  # samples skipped because they were overwritten
+
+    @property
+    def lag(self) -> int:
+        """Samples written but not yet read by this cursor."""
+        return self.capture.position - self.position
+
+    def read(self, n: int, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Block until `n` samples are available and return them.
+
+        Returns None if the capture is closed or the timeout expires.
+        """
+        samples, position = self.capture._read(self.position, n, timeout)
+        if samples is not None:
+            self.dropped += position - n - self.position
+        self.position = position
+        return samples
+
+
+class FileCapture(AudioCapture):
+    """AudioCapture fed from a 16-bit mono WAV file instead of a microphone.
+
+    Used for offline replay (benchmarks, tests). With speed=0 the whole file is
+    written at once (the ring holds all of it); speed=1.0 paces it in real time.
+    Trailing silence is appended so endpointing can finish, then the capture
+    closes, which makes blocked readers return None.
+    """
+
+    def __init__(self, path: str, speed: float = 0.0, tail_silence_ms: int = 1500, block_ms: int = 20):
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+                raise ValueError(f"{path}: se requiere WAV PCM 16-bit mono")
+            sample_rate = wav.getframerate()
+            self.samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+        self.path = path
+        self.speed = speed
+        self.tail_samples = sample_rate * tail_silence_ms // 1000
+        total = len(self.samples) + self.tail_samples
+        super().__init__(
+            sample_rate=sample_rate,
+            block_ms=block_ms,
+            buffer_s=total / sample_rate + 1.0,
+        )
+        self._thread = None
+
+    @property
+    def duration_s(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._closed = False
+        self._thread = threading.Thread(target=self._feed, name="file-capture", daemon=True)
+        self._thread.start()
+
+    def _feed(self) -> None:
+        audio = np.concatenate([self.samples, np.zeros(self.tail_samples, dtype=np.int16)])
+        block_s = self.block_samples / self.sample_rate
+        for i in range(0, len(audio), self.block_samples):
+            if self._closed:
+                return
+            self.write(audio[i:i + self.block_samples])
+            if self.speed > 0:
+                time.sleep(block_s / self.speed)
+        self.close()
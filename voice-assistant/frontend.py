@@ -0,0 +1,339 @@
+import logging
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+import tracing
+from audio_capture import AudioCapture
+
+logger = logging.getLogger(__name__)
+
+# Cabecera del buffer compartido: [muestras escritas, cerrado]
+_HEADER_BYTES = 16
+
+
+class SharedAudioCapture(AudioCapture):
+    """AudioCapture whose ring buffer lives in shared memory.
+
+    The process that creates it owns the segment; worker processes attach()
+    to it by name. There is a single writer (the capture process), so the
+    write counter in the header is only ever incremented by one process and
+    readers poll it instead of waiting on a Condition, which cannot cross
+    process boundaries. A read that gets overtaken by the writer while copying
+    is retried from the oldest sample still in the buffer.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        block_ms: int = 20,
+        buffer_s: float = 10.0,
+        device=None,
+        name: Optional[str] = None,
+    ):
+        super().__init__(sample_rate=sample_rate, block_ms=block_ms, buffer_s=buffer_s, device=device)
+        self.buffer_s = buffer_s
+        self._owner = name is None
+        self._poll_s = block_ms / 2000  # medio bloque
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=_HEADER_BYTES + self.capacity * 2
+            )
+        else:
+            # Los workers comparten el resource tracker del padre: solo el
+            # propietario hace unlink()
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._header = np.ndarray((2,), dtype=np.int64, buffer=self._shm.buf)
+        self._buf = np.ndarray(
+            (self.capacity,), dtype=np.int16, buffer=self._shm.buf, offset=_HEADER_BYTES
+        )
+        if self._owner:
+            self._header[:] = 0
+
+    def spec(self) -> dict:
+        """Arguments a worker process needs to attach()."""
+        return {
+            "name": self._shm.name,
+            "sample_rate": self.sample_rate,
+            "block_ms": self.block_samples * 1000 // self.sample_rate,
+            "buffer_s": self.buffer_s,
+            "device": self.device,
+        }
+
+    @classmethod
+    def attach(cls, spec: dict) -> "SharedAudioCapture":
+        return cls(**spec)
+
+    @property
+    def position(self) -> int:
+        return int(self._header[0])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[1])
+
+    def close(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+        self._header[1] = 1
+
+    def write(self, samples: np.ndarray) -> None:
+        total = len(samples)
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        written = int(self._header[0])
+        start = (written + total - n) % self.capacity
+        first = min(n, self.capacity - start)
+        self._buf[start:start + first] = samples[:first]
+        self._buf[:n - first] = samples[first:]
+        # El contador se publica después de copiar las muestras
+        self._header[0] = written + total
+
+    def _read(self, pos: int, n: int, timeout: Optional[float]):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            written = self.position
+            if written - pos < n:
+                if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                    return None, pos
+                time.sleep(self._poll_s)
+                continue
+            oldest = written - self.capacity
+            if pos < oldest:
+                logger.warning(f"Audio overrun: {oldest - pos} samples lost")
+                pos = oldest
+            start = pos % self.capacity
+            first = min(n, self.capacity - start)
+            out = np.empty(n, dtype=np.int16)
+            out[:first] = self._buf[start:start + first]
+            out[first:] = self._buf[:n - first]
+            if self.position - self.capacity > pos:
+                continue  # el escritor nos adelantó durante la copia
+            return out, pos + n
+
+    def release(self) -> None:
+        """Detach from the segment (and remove it if this process owns it)."""
+        self._header = self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class _MarkCollector:
+    """Stand-in tracer in a worker: keeps raw timestamps for the main process."""
+
+    def __init__(self):
+        self.marks: list = []
+
+    def mark(self, stage: str, at: Optional[float] = None) -> None:
+        self.marks.append((stage, time.perf_counter() if at is None else at))
+
+
+def _capture_main(spec: dict) -> None:
+    capture = SharedAudioCapture.attach(spec)
+    try:
+        capture.start()
+        while not capture.closed:
+            time.sleep(0.1)
+    finally:
+        capture.close()
+        capture.release()
+
+
+def _wake_main(spec: dict, kwargs: dict, playing, commands, events) -> None:
+    capture = SharedAudioCapture.attach(spec)
+    try:
+        from wake_word import WakeWordModel
+
+        wake = WakeWordModel(capture=capture, **kwargs)
+        wake.is_playing = lambda: bool(playing.value)
+        wake.warmup()
+        events.put(("ready", None, None))
+        while commands.get() is not None:
+            detected = wake.activate()
+            events.put(("wake" if detected else "closed", wake.detected_at, wake.snapshot()))
+            if not detected:
+                return
+    except Exception as e:
+        events.put(("error", repr(e), None))
+    finally:
+        capture.release()
+
+
+def _stt_main(spec: dict, kwargs: dict, commands, results) -> None:
+    capture = SharedAudioCapture.attach(spec)
+    try:
+        from voice_recognizer import VoiceRecognizer
+
+        recognizer = VoiceRecognizer(capture=capture, **kwargs)
+        recognizer.warmup()
+        collector = _MarkCollector()
+        tracing.tracer = collector
+        results.put(("ready", None, None, None))
+        while True:
+            command = commands.get()
+            if command is None:
+                return
+            collector.marks = []
+            text = recognizer.record_and_transcribe(*command)
+            results.put(("text", text, recognizer.last_stats, collector.marks))
+    except Exception as e:
+        results.put(("error", repr(e), None, None))
+    finally:
+        capture.release()
+
+
+class _Worker:
+    """Main-process side of a worker: command queue in, event queue out."""
+
+    def __init__(self, ctx, capture: SharedAudioCapture, target, *args):
+        self.capture = capture
+        self.commands = ctx.Queue()
+        self.events = ctx.Queue()
+        self.process = ctx.Process(
+            target=target,
+            args=(capture.spec(), *args, self.commands, self.events),
+            name=target.__name__.strip("_"),
+            daemon=True,
+        )
+
+    def wait_ready(self, timeout: Optional[float] = None):
+        """Block until the worker has loaded and warmed up its model."""
+        kind, detail = self._get(timeout)[:2]
+        if kind != "ready":
+            raise RuntimeError(f"{self.process.name}: {detail}")
+        return self
+
+    def _get(self, timeout: Optional[float] = None, poll=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if poll is not None:
+                poll()
+            alive = self.process.is_alive()
+            try:
+                return self.events.get(timeout=0.05)
+            except queue.Empty:
+                pass
+            if not alive:
+                # Ya no llegará nada: captura cerrada o el worker ha muerto
+                if self.capture.closed:
+                    return ("closed", None, None, None)
+                return ("error", f"exit code {self.process.exitcode}", None, None)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(self.process.name)
+
+    def stop(self) -> None:
+        self.commands.put(None)
+
+
+class WakeWorker(_Worker):
+    """Drop-in for WakeWordModel backed by a worker process."""
+
+    def __init__(self, ctx, capture: SharedAudioCapture, kwargs: dict):
+        self._playing = ctx.Value("b", 0)
+        super().__init__(ctx, capture, _wake_main, kwargs, self._playing)
+        self.is_playing = None
+        self.detected_at: Optional[int] = None
+        self._stats: dict = {}
+
+    def _sync_playing(self) -> None:
+        if self.is_playing is not None:
+            self._playing.value = int(bool(self.is_playing()))
+
+    def activate(self) -> bool:
+        self.commands.put("activate")
+        kind, detected_at, stats = self._get(poll=self._sync_playing)[:3]
+        if kind == "error":
+            raise RuntimeError(f"wake worker: {detected_at}")
+        self._stats = stats or self._stats
+        if kind != "wake":
+            return False
+        self.detected_at = detected_at
+        return True
+
+    def snapshot(self) -> dict:
+        return dict(self._stats)
+
+
+class RecognizerWorker(_Worker):
+    """Drop-in for VoiceRecognizer backed by a worker process.
+
+    Only the command (start position, timeout) and the transcript with its
+    stats and trace marks cross the process boundary; the audio is read by
+    the worker straight from the shared ring buffer.
+    """
+
+    def __init__(self, ctx, capture: SharedAudioCapture, kwargs: dict):
+        super().__init__(ctx, capture, _stt_main, kwargs)
+        self.last_stats: dict = {}
+
+    def record_and_transcribe(self, start=None, start_timeout_ms=None) -> str:
+        if start is None:
+            start = self.capture.position
+        self.commands.put((start, start_timeout_ms))
+        kind, text, stats, marks = self._get()
+        if kind != "text":
+            if kind == "error":
+                logger.error(f"Error en el proceso de STT: {text}")
+            return ""
+        self.last_stats = stats
+        for stage, at in marks:
+            tracing.mark(stage, at)
+        return text
+
+
+class AudioFrontend:
+    """Capture, wake word and STT decoding in three worker processes.
+
+    Audio flows through a SharedAudioCapture; only commands, wake events and
+    transcripts travel over multiprocessing queues. The main process keeps
+    the asyncio pipeline, the LLM client and TTS, so the audio callback, VAD,
+    openWakeWord and Kaldi no longer compete with them for the GIL.
+    wake/recognizer/capture are drop-in replacements for the in-process
+    objects used by Pipeline.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        block_ms: int = 20,
+        buffer_s: float = 10.0,
+        device=None,
+        wake_kwargs: Optional[dict] = None,
+        recognizer_kwargs: Optional[dict] = None,
+        start_method: str = "spawn",
+    ):
+        ctx = multiprocessing.get_context(start_method)
+        self.capture = SharedAudioCapture(sample_rate, block_ms, buffer_s, device)
+        self.wake = WakeWorker(ctx, self.capture, wake_kwargs or {})
+        self.recognizer = RecognizerWorker(ctx, self.capture, recognizer_kwargs or {})
+        self._capture_process = ctx.Process(
+            target=_capture_main, args=(self.capture.spec(),), name="capture", daemon=True
+        )
+
+    @property
+    def processes(self) -> list:
+        return [self._capture_process, self.wake.process, self.recognizer.process]
+
+    def start(self) -> None:
+        for process in self.processes:
+            process.start()
+        logger.info(f"Frontend multiproceso: {', '.join(f'{p.name}={p.pid}' for p in self.processes)}")
+
+    def close(self, timeout: float = 2.0) -> None:
+        self.capture.close()  # los workers ven el cierre en la memoria compartida
+        self.wake.stop()
+        self.recognizer.stop()
+        for process in self.processes:
+            if process.pid is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.capture.release()
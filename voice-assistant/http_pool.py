@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionMetrics:
+    """Thread-safe counters for requests, new connections and handshake time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.handshake_ms_total = 0.0
+        self.last_handshake_ms = 0.0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, ms: float) -> None:
+        with self._lock:
+            self.connections += 1
+            self.handshake_ms_total += ms
+            self.last_handshake_ms = ms
+
+    @property
+    def reused(self) -> int:
+        """Requests served on an already open (keep-alive) connection."""
+        return max(0, self.requests - self.connections)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.handshake_ms_total / self.connections if self.connections else 0.0
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "reused": max(0, self.requests - self.connections),
+                "handshake_ms_avg": round(avg, 1),
+                "handshake_ms_last": round(self.last_handshake_ms, 1),
+            }
+
+
+def _metered_pool_classes(metrics: ConnectionMetrics) -> dict:
+    """urllib3 pool classes whose connections report handshake time."""
+
+    def timed(cls):
+        class _Timed(cls):
+            def connect(self):
+                t0 = time.perf_counter()
+                super().connect()
+                metrics.record_connect((time.perf_counter() - t0) * 1000)
+
+        return _Timed
+
+    class _HTTPPool(HTTPConnectionPool):
+        ConnectionCls = timed(HTTPConnection)
+
+    class _HTTPSPool(HTTPSConnectionPool):
+        ConnectionCls = timed(HTTPSConnection)
+
+    return {"http": _HTTPPool, "https": _HTTPSPool}
+
+
+class _MeteredAdapter(HTTPAdapter):
+    def __init__(self, metrics: ConnectionMetrics, **kwargs):
+        self._metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _metered_pool_classes(self._metrics)
+
+    def send(self, request, *args, **kwargs):
+        self._metrics.record_request()
+        return super().send(request, *args, **kwargs)
+
+
+class HTTPPool:
+    """Shared keep-alive HTTP connections for the OpenAI endpoints.
+
+    - `session`: pooled requests.Session (TTS and other plain HTTP calls).
+    - `httpx_client()`: pooled httpx.Client for the OpenAI SDK (chat).
+    - `warm()`: opens/refreshes connections in the background, e.g. right after
+      the wake word, so the TCP+TLS handshake is done before the first request.
+    Both clients report into the same ConnectionMetrics.
+    """
+
+    def __init__(
+        self,
+        warm_urls: tuple = ("https://api.openai.com/",),
+        pool_maxsize: int = 4,
+        keepalive_s: float = 120.0,
+        warm_timeout: float = 5.0,
+    ):
+        self.warm_urls = list(warm_urls)
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_s = keepalive_s
+        self.warm_timeout = warm_timeout
+        self.metrics = ConnectionMetrics()
+
+        self.session = requests.Session()
+        adapter = _MeteredAdapter(
+            self.metrics, pool_connections=2, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._httpx = None
+        self._warming = threading.Lock()
+
+    def add_warm_url(self, url: str) -> None:
+        """Register the origin of `url` to be warmed up."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        if origin not in self.warm_urls:
+            self.warm_urls.append(origin)
+
+    def httpx_client(self):
+        """Pooled httpx.Client (created once) to pass to OpenAI(http_client=...)."""
+        if self._httpx is None:
+            import httpx
+
+            metrics = self.metrics
+
+            def on_request(request):
+                metrics.record_request()
+                started = {}
+                # Handshake ends after TLS for https, after TCP connect for http
+                done = (
+                    "connection.start_tls.complete"
+                    if request.url.scheme == "https"
+                    else "connection.connect_tcp.complete"
+                )
+
+                def trace(event: str, info: dict) -> None:
+                    if event == "connection.connect_tcp.started":
+                        started["t0"] = time.perf_counter()
+                    elif event == done and "t0" in started:
+                        metrics.record_connect(
+                            (time.perf_counter() - started.pop("t0")) * 1000
+                        )
+
+                request.extensions["trace"] = trace
+
+            self._httpx = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize,
+                    keepalive_expiry=self.keepalive_s,
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                event_hooks={"request": [on_request]},
+            )
+        return self._httpx
+
+    def warm(self) -> Optional[threading.Thread]:
+        """Open connections to the registered origins in a background thread.
+
+        Returns None if a warm-up is already in progress.
+        """
+        if not self._warming.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                for url in self.warm_urls:
+                    t0 = time.perf_counter()
+                    try:
+                        self.session.head(url, timeout=self.warm_timeout)
+                        if self._httpx is not None:
+                            self._httpx.head(url, timeout=self.warm_timeout)
+                    except Exception as e:  # noqa: BLE001 - warm-up is best effort
+                        logger.debug(f"Warm-up fallido para {url}: {e}")
+                        continue
+                    logger.debug(
+                        f"Conexión precalentada: {url} "
+                        f"({(time.perf_counter() - t0) * 1000:.0f} ms)"
+                    )
+            finally:
+                self._warming.release()
+
+        thread = threading.Thread(target=run, name="http-warm", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self) -> None:
+        self.session.close()
+        if self._httpx is not None:
+            self._httpx.close()
+            self._httpx = None
@@ -0,0 +1,228 @@
+import datetime
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DIAS = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+MESES = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+)
+
+# Números tal y como los escribe Vosk ("cinco minutos", "veinte segundos")
+_UNIDADES = {
+    "un": 1, "uno": 1, "una": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5,
+    "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "once": 11,
+    "doce": 12, "trece": 13, "catorce": 14, "quince": 15, "dieciseis": 16,
+    "diecisiete": 17, "dieciocho": 18, "diecinueve": 19, "veinte": 20,
+    "veintiuno": 21, "veintidos": 22, "veintitres": 23, "veinticuatro": 24,
+    "veinticinco": 25, "veintiseis": 26, "veintisiete": 27, "veintiocho": 28,
+    "veintinueve": 29,
+}
+_DECENAS = {
+    "treinta": 30, "cuarenta": 40, "cincuenta": 50, "sesenta": 60, "setenta": 70,
+    "ochenta": 80, "noventa": 90, "cien": 100, "ciento": 100,
+}
+_UNIDADES_TIEMPO = {"segundo": 1, "minuto": 60, "hora": 3600}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes, sin puntuación y con espacios simples."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class Intent:
+    def __init__(self, name: str, pattern: str, handler: Callable[[re.Match], str]):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.handler = handler
+
+
+class IntentRouter:
+    """Local fast path: answers simple intents offline before calling the LLM.
+
+    Intents are regular expressions matched against the normalized transcript
+    (lowercase, no accents or punctuation). The first match wins and its handler
+    returns the spoken answer; route() returns None when nothing matches so the
+    query falls through to the LLM.
+    """
+
+    def __init__(self):
+        self.intents: list[Intent] = []
+
+    def register(self, name: str, pattern: str, handler: Callable[[re.Match], str]) -> None:
+        self.intents.append(Intent(name, pattern, handler))
+
+    def route(self, text: str) -> Optional[str]:
+        normalized = normalize(text)
+        for intent in self.intents:
+            match = intent.pattern.search(normalized)
+            if not match:
+                continue
+            try:
+                answer = intent.handler(match)
+            except Exception as e:
+                logger.error(f"Error en intent local '{intent.name}': {e}")
+                continue
+            if answer:
+                logger.info(f"Intent local: {intent.name}")
+                return answer
+        return None
+
+
+def _parse_number(words: str) -> Optional[int]:
+    """'cinco' -> 5, 'treinta y dos' -> 32, '15' -> 15."""
+    words = words.strip()
+    if words.isdigit():
+        return int(words)
+    total = 0
+    for word in words.split():
+        if word == "y":
+            continue
+        if word in _DECENAS:
+            total += _DECENAS[word]
+        elif word in _UNIDADES:
+            total += _UNIDADES[word]
+        else:
+            return None
+    return total or None
+
+
+def _say_time(now: datetime.datetime) -> str:
+    hour = now.hour % 12 or 12
+    article = "Es la" if hour == 1 else "Son las"
+    if now.minute == 0:
+        return f"{article} {hour} en punto."
+    return f"{article} {hour} y {now.minute}."
+
+
+def _say_date(now: datetime.datetime) -> str:
+    return f"Hoy es {DIAS[now.weekday()]}, {now.day} de {MESES[now.month - 1]} de {now.year}."
+
+
+class Timers:
+    """Countdown timers announced through a callback (e.g. the TTS)."""
+
+    def __init__(self, on_finish: Optional[Callable[[str], None]] = None):
+        self.on_finish = on_finish
+        self._timers: list[threading.Timer] = []
+
+    def start(self, seconds: int, label: str) -> None:
+        timer = threading.Timer(seconds, self._finish, args=(label,))
+        timer.daemon = True
+        self._timers = [t for t in self._timers if t.is_alive()] + [timer]
+        timer.start()
+
+    def _finish(self, label: str) -> None:
+        message = f"Tu temporizador de {label} ha terminado."
+        logger.info(message)
+        if self.on_finish is not None:
+            self.on_finish(message)
+
+    def cancel_all(self) -> None:
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+
+
+def default_router(
+    timers: Optional[Timers] = None,
+    clock: Callable[[], datetime.datetime] = datetime.datetime.now,
+) -> IntentRouter:
+    """Router with the built-in intents: time, date and timers."""
+    timers = timers or Timers()
+    router = IntentRouter()
+
+    router.register(
+        "hora",
+        r"^(?:dime la hora|(?:dime |me dices |sabes )?que hora es(?: ahora)?)$",
+        lambda m: _say_time(clock()),
+    )
+    router.register(
+        "fecha",
+        r"^(?:que dia es hoy|que fecha es(?: hoy)?|a que dia estamos|en que dia estamos)$",
+        lambda m: _say_date(clock()),
+    )
+
+    def timer(match: re.Match) -> Optional[str]:
+        amount = _parse_number(match.group("n"))
+        if amount is None:
+            return None
+        unit = match.group("unit")
+        label = f"{amount} {unit}{'s' if amount != 1 else ''}"
+        timers.start(amount * _UNIDADES_TIEMPO[unit], label)
+        return f"Temporizador de {label} en marcha."
+
+    router.register(
+        "temporizador",
+        r"(?:temporizador|alarma|avisame|cuenta atras)(?: de| en| dentro de| para)*"
+        r" (?P<n>[\w ]+?) (?P<unit>segundo|minuto|hora)s?$",
+        timer,
+    )
+    return router
+
+
+class AnswerCache:
+    """In-memory cache of LLM answers keyed by the normalized question.
+
+    Only non-volatile questions are stored: anything about the current time,
+    news, weather, fixtures and results, prices, opening hours... is always
+    asked again. Entries expire after
+    ttl_s and the least recently used one is evicted past max_entries.
+    """
+
+    VOLATILE = re.compile(
+        r"\b(hoy|ahora|manana|ayer|actual|actualmente|ultim[oa]s?|noticias?|tiempo|"
+        r"clima|temperatura|esta semana|este ano|este mes|esta noche|"
+        r"proxim[oa]s?|siguiente|"
+        # Deportes: cuándo juega, quién ganó, cómo va la liga...
+        r"juega|juegan|jugara|jugaran|jugo|jugaron|partidos?|gana|ganan|gano|"
+        r"ganaron|ganara|ganador|ganadora|resultados?|marcador|clasificacion|"
+        # Precios y mercados
+        r"precios?|cuesta|cuestan|costara|vale|valen|cotiza|cotizan|cotizacion|"
+        r"bitcoin|bolsa|euribor|"
+        # Horarios que cambian
+        r"abre|abren|cierra|cierran|abierto|abierta)\b"
+    )
+
+    def __init__(self, ttl_s: float = 24 * 3600, max_entries: int = 256):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, question: str) -> bool:
+        return not self.VOLATILE.search(normalize(question))
+
+    def get(self, question: str) -> Optional[str]:
+        key = normalize(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, question: str, answer: str) -> None:
+        if not answer or not self.cacheable(question):
+            return
+        key = normalize(question)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,240 @@
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """The API is considered degraded; the call was not attempted."""
+
+
+class BudgetExceeded(TimeoutError):
+    """No attempt answered within the turn's latency budget."""
+
+
+class CircuitBreaker:
+    """Classic three-state breaker counting failed turns.
+
+    After failure_threshold consecutive failed turns the breaker opens and
+    every call is refused for reset_s seconds. Then a single probe is let
+    through (half-open): success closes the breaker, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_s: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.clock = clock
+        self.failures = 0
+        self.trips = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current()
+
+    def _current(self) -> str:
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_s:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("LLM recuperado: circuito cerrado")
+            self._state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                    logger.warning(f"LLM degradado: circuito abierto durante {self.reset_s:.0f} s")
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+                self._probing = False
+
+
+class LLMGuard:
+    """Latency budget, hedged requests and circuit breaker around LLM calls.
+
+    call(request) runs request(timeout) in a worker thread, where timeout is
+    the budget left (to pass on to the HTTP client). If it has not answered
+    after hedge_delay() -- the hedge_quantile of recent successful latencies,
+    or hedge_default_s until min_samples are known -- an identical hedged
+    request is sent and the first one to answer wins; the loser is handed to
+    discard() when it finishes (e.g. to close a stream). Fast errors are
+    retried while budget and attempts remain. When nothing answers within
+    budget_s the call raises BudgetExceeded, and the turn counts as a failure
+    for the breaker; while it is open, calls raise CircuitOpen immediately so
+    the assistant can say a fallback phrase instead of waiting.
+    """
+
+    def __init__(
+        self,
+        budget_s: float = 10.0,
+        hedge_quantile: float = 0.95,
+        hedge_default_s: float = 4.0,
+        hedge_min_s: float = 1.0,
+        min_samples: int = 10,
+        window: int = 100,
+        max_attempts: int = 3,
+        retry_backoff_s: float = 0.3,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 4,
+    ):
+        self.budget_s = budget_s
+        self.hedge_quantile = hedge_quantile
+        self.hedge_default_s = hedge_default_s
+        self.hedge_min_s = hedge_min_s
+        self.min_samples = min_samples
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = collections.deque(maxlen=window)  # s, llamadas con éxito
+        self.stats = {"calls": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "failures": 0, "fallbacks": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return self.hedge_default_s
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))
+        return max(self.hedge_min_s, ordered[index])
+
+    def call(self, request: Callable[[float], object], discard: Optional[Callable[[object], None]] = None):
+        if not self.breaker.allow():
+            self._count("fallbacks")
+            raise CircuitOpen("circuito abierto")
+        self._count("calls")
+
+        t0 = time.monotonic()
+        deadline = t0 + self.budget_s
+        hedge_at = t0 + self.hedge_delay()
+        pending: dict[Future, bool] = {}  # future -> es la petición duplicada
+        attempts = 0
+        hedged = False
+        last_error: Optional[Exception] = None
+
+        def timed(timeout: float):
+            start = time.monotonic()
+            return request(timeout), time.monotonic() - start
+
+        def launch(hedge: bool) -> None:
+            nonlocal attempts
+            attempts += 1
+            pending[self._executor.submit(timed, max(0.0, deadline - time.monotonic()))] = hedge
+
+        launch(False)
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait_s = deadline - now
+            if not hedged:
+                wait_s = min(wait_s, max(0.0, hedge_at - now))
+            done, _ = concurrent.futures.wait(
+                pending, timeout=wait_s, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                hedge = pending.pop(future)
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"Intento de LLM fallido: {e}")
+                    continue
+                with self._lock:
+                    self.latencies.append(elapsed)
+                if hedge:
+                    self._count("hedge_wins")
+                self._abandon(pending, discard)
+                self.breaker.record_success()
+                self._publish()
+                return result
+
+            now = time.monotonic()
+            if not pending:
+                # Todos los intentos fallaron rápido: se reintenta si queda presupuesto
+                backoff = self.retry_backoff_s * attempts
+                if attempts >= self.max_attempts or now + backoff >= deadline:
+                    break
+                time.sleep(backoff)
+                launch(False)
+            elif not hedged and now >= hedge_at:
+                hedged = True
+                if attempts < self.max_attempts:
+                    logger.info(f"LLM lento ({(now - t0) * 1000:.0f} ms): petición duplicada")
+                    self._count("hedges")
+                    launch(True)
+
+        timed_out = bool(pending) or last_error is None
+        self._abandon(pending, discard)
+        self.breaker.record_failure()
+        self._count("timeouts" if timed_out else "failures")
+        if timed_out:
+            logger.warning(f"LLM sin respuesta en {self.budget_s:.1f} s")
+            raise BudgetExceeded(f"sin respuesta en {self.budget_s:.1f} s")
+        raise last_error
+
+    def _abandon(self, pending: dict, discard: Optional[Callable[[object], None]]) -> None:
+        """Let the attempts still running finish in the background."""
+
+        def cleanup(future: Future) -> None:
+            if discard is not None and not future.cancelled() and future.exception() is None:
+                try:
+                    discard(future.result()[0])
+                except Exception as e:
+                    logger.debug(f"Error descartando respuesta del LLM: {e}")
+
+        for future in pending:
+            future.add_done_callback(cleanup)
+        pending.clear()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+        self._publish()
+
+    def _publish(self) -> None:
+        tracer = tracing.tracer
+        for name, value in list(self.stats.items()):
+            tracer.set_gauge(f"llm_{name}_total", value)
+        state = self.breaker.state
+        # 0 cerrado, 0.5 medio abierto (sondeando), 1 abierto
+        tracer.set_gauge("llm_breaker_open", {self.breaker.CLOSED: 0, self.breaker.HALF_OPEN: 0.5}.get(state, 1))
+        tracer.set_gauge("llm_breaker_trips_total", self.breaker.trips)
+        tracer.set_gauge("llm_hedge_delay_ms", round(self.hedge_delay() * 1000, 1))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
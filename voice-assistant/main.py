@@ -1,11 +1,17 @@
+import asyncio
 import logging
+import os
+import threading
 
 from dotenv import load_dotenv
 
-from assistant import VoiceAssistant
-from tts.openai_tts import OpenAITTS
-from voice_recognizer import VoiceRecognizer
-from wake_word import WakeWordModel
+from audio_capture import AudioCapture
+from http_pool import HTTPPool
+from intents import AnswerCache, Timers, default_router
+from pipeline import Pipeline
+from startup import ModelLoader
+import tracing
+from tts.playback import PlaybackSink
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,38 +19,153 @@ logger = logging.getLogger(__name__)
 
 def main():
     load_dotenv("config.env")
-    wake = WakeWordModel()
-    recognizer = VoiceRecognizer()
-    assistant = VoiceAssistant()
-    tts = OpenAITTS()
-
-    logger.info("Asistente listo. Esperando wake word...")
+    tracing.configure()
+    # Perfil para Pi Zero (512 MB): Vosk y Piper se cargan al usarse y se
+    # descargan tras MODEL_IDLE_S sin uso; las cargas van de una en una
+    low_memory = os.getenv("LOW_MEMORY") == "1"
+    idle_s = float(os.getenv("MODEL_IDLE_S", "120"))
+    # Captura, wake word y Vosk en procesos aparte (aprovecha los 4 núcleos de la Pi)
+    frontend = None
+    if os.getenv("MULTIPROCESS_FRONTEND") == "1" and low_memory:
+        logger.warning("MULTIPROCESS_FRONTEND ignorado con LOW_MEMORY=1 (un proceso por modelo no cabe)")
+    elif os.getenv("MULTIPROCESS_FRONTEND") == "1":
+        from frontend import AudioFrontend
+
+        frontend = AudioFrontend(wake_kwargs={"max_batch": 4})
+        frontend.start()  # los workers cargan sus modelos mientras tanto
+        capture = frontend.capture
+    else:
+        capture = AudioCapture()
+    http = HTTPPool()
+    sink = PlaybackSink()
+    timers = Timers()
+    loader = ModelLoader(max_workers=1 if low_memory else 4)
+
+    # Los módulos pesados (openWakeWord, Vosk, OpenAI) se importan dentro de
+    # cada carga para que también los imports vayan en paralelo
+    def load_wake():
+        if frontend is not None:
+            wake = frontend.wake.wait_ready()
+            wake.is_playing = lambda: sink.playing
+            return wake
+
+        from wake_word import WakeWordModel
+
+        wake = WakeWordModel(capture=capture, max_batch=4)
+        # Umbral más alto mientras suena la respuesta (eco del altavoz)
+        wake.is_playing = lambda: sink.playing
+        return wake
+
+    def load_recognizer():
+        if frontend is not None:
+            return frontend.recognizer.wait_ready()
+
+        from voice_recognizer import VoiceRecognizer
+
+        if low_memory:
+            from memory import LazyComponent
+
+            # Un solo recognizer por vocabulario: cada uno reserva su propio grafo de decodificación
+            return LazyComponent("vosk", lambda: VoiceRecognizer(capture=capture, pool_size=1), idle_s=idle_s)
+        return VoiceRecognizer(capture=capture)
+
+    def load_assistant():
+        from assistant import VoiceAssistant
+
+        web_search = None
+        if os.getenv("BRAVE_API_KEY"):
+            from web.brave import BRAVE_ENDPOINT, BraveProvider
+            from web.cache import WebCache
+
+            # Páginas descargadas en paralelo, con presupuesto de tiempo y caché en disco
+            web_search = BraveProvider(session=http.session, cache=WebCache())
+            http.add_warm_url(BRAVE_ENDPOINT)
+        return VoiceAssistant(
+            http_client=http.httpx_client(),
+            router=default_router(timers),
+            answer_cache=AnswerCache(),
+            web_search=web_search,
+        )
+
+    def load_tts():
+        from assistant import SYSTEM_PHRASES
+        from tts.cache import AudioCache, CachedTTS
+        from tts.openai_tts import OpenAITTS
+
+        engine = OpenAITTS(
+            session=http.session, sink=sink, stream_format=os.getenv("TTS_STREAM_FORMAT", "pcm")
+        )
+        cached = CachedTTS(engine, AudioCache())
+        # Frases fijas listas en caché sin retrasar el arranque
+        threading.Thread(target=cached.prerender, args=(SYSTEM_PHRASES,), daemon=True).start()
+        tts = cached
+        try:
+            from tts.fallback import FallbackTTS
+            from tts.piper import PiperTTS
+
+            # Piper en memoria: si OpenAI no da audio a tiempo, habla la voz local
+            # (el warm-up lo hace el cargador con FallbackTTS.warmup)
+            def load_piper():
+                return PiperTTS(
+                    sink=sink,
+                    intra_op_threads=int(os.getenv("PIPER_THREADS", "0")) or (1 if low_memory else None),
+                    warmup_on_load=False,
+                    low_memory=low_memory,
+                )
+
+            if low_memory:
+                from memory import LazyComponent
+
+                # Piper solo entra en memoria cuando OpenAI falla, sin recalentarlo en segundo plano
+                piper = LazyComponent("piper", load_piper, idle_s=idle_s)
+            else:
+                piper = load_piper()
+            # El plazo se mide hasta el primer audio que llega en streaming de OpenAI
+            # (CachedTTS no descarga las frases nuevas antes de reproducirlas)
+            tts = FallbackTTS(
+                cached,
+                piper,
+                first_byte_timeout_s=float(os.getenv("TTS_FIRST_BYTE_TIMEOUT_S", "1.5")),
+                keep_warm_s=None if low_memory else 300.0,
+            )
+        except Exception as e:
+            logger.warning(f"Piper no disponible, sin voz de respaldo: {e}")
+        tts.on_first_byte = lambda: tracing.mark("tts_first_byte")
+        return tts
+
+    wake = loader.submit("wake_word", load_wake)
+    # En modo bajo consumo Vosk y Piper no se calientan al arrancar: se cargan al usarse
+    recognizer = loader.submit("vosk", load_recognizer, warmup=not low_memory)
+    assistant = loader.submit("assistant", load_assistant)
+    tts = loader.submit("tts", load_tts, warmup=not low_memory)
+    threading.Thread(target=loader.report, daemon=True).start()
+
+    sink.on_first_sample = lambda: tracing.mark("playback_start")
+    # El audio se captura desde ya: lo dicho mientras carga Vosk queda en el buffer
+    if frontend is None:
+        capture.start()
+    sink.start()
+    http.warm()
+    pipeline = Pipeline(
+        capture, wake, recognizer, assistant, tts, http=http, sink=sink, follow_up_ms=6000
+    )
+    # Los avisos de los temporizadores pasan por la etapa de TTS (nunca a la vez que una respuesta)
+    timers.on_finish = pipeline.announce
 
     try:
-        while True:
-            if not wake.activate():
-                continue
-
-            logger.info("Wake word detectado. Grabando...")
-
-            try:
-                text = recognizer.record_and_transcribe()
-                if not text:
-                    logger.warning("No se detectó texto.")
-                    continue
-
-                logger.info(f"Transcripción: {text}")
-
-                response = assistant.chat(text)
-                logger.info(f"Respuesta: {response}")
-
-                tts.reproduce(response)
-
-            except Exception as e:
-                logger.error(f"Error procesando: {e}")
-
+        asyncio.run(pipeline.run())
     except KeyboardInterrupt:
         logger.info("Deteniendo asistente...")
+    finally:
+        timers.cancel_all()
+        capture.close()
+        if frontend is not None:
+            frontend.close()
+        sink.close()
+        if loader.loaded("tts") is not None:
+            loader.loaded("tts").close()
+        loader.shutdown()
+        http.close()
 
 
 if __name__ == "__main__":
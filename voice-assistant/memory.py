@@ -0,0 +1,225 @@
+import gc
+import logging
+import resource
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# RSS de cada componente medida al cargarlo: nombre -> {"rss_mb", "peak_mb"}
+_components: dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+def _status_mb(field: str) -> Optional[float]:
+    """A memory field of /proc/self/status (VmRSS, VmHWM...) in MB."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024  # kB
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def rss_mb() -> float:
+    """Current resident set size of the process."""
+    rss = _status_mb("VmRSS")
+    return rss if rss is not None else peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size since start (or since the last reset_peak())."""
+    peak = _status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kB en Linux
+
+
+def reset_peak() -> None:
+    """Restart the peak RSS count (Linux >= 4.0), so peaks can be taken per load or turn."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def record(name: str, rss: float, peak: float) -> None:
+    with _lock:
+        _components[name] = {"rss_mb": round(rss, 1), "peak_mb": round(peak, 1)}
+
+
+class measure:
+    """Context manager recording the steady and peak RSS growth of a load.
+
+    steady = RSS after the load (and a gc pass) minus RSS before; peak =
+    highest RSS reached during the load minus RSS before (temporary buffers
+    included, which is what decides whether a turn swaps). Loads must not
+    overlap for the numbers to be attributable: ModelLoader only measures
+    with a single worker.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.before = 0.0
+
+    def __enter__(self) -> "measure":
+        gc.collect()
+        reset_peak()
+        self.before = rss_mb()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        peak = peak_rss_mb()
+        gc.collect()
+        record(self.name, rss_mb() - self.before, max(peak - self.before, 0.0))
+
+
+def snapshot_of(name: str) -> dict:
+    """Steady and peak RSS growth recorded for one component ({} if not measured)."""
+    with _lock:
+        return dict(_components.get(name, {}))
+
+
+def snapshot() -> dict:
+    """Process RSS/peak plus the per-component figures (memory_* gauges)."""
+    snapshot = {"rss_mb": round(rss_mb(), 1), "peak_mb": round(peak_rss_mb(), 1)}
+    with _lock:
+        for name, figures in _components.items():
+            snapshot.update({f"{name}_{k}": v for k, v in figures.items()})
+    return snapshot
+
+
+class LazyComponent:
+    """Loads a heavy component on first use and unloads it when idle.
+
+    Attribute access is forwarded to the component, loading it if needed, so
+    LazyComponent(lambda: VoiceRecognizer(...)) can be passed wherever the
+    recognizer is expected. A call through the proxy counts as in use until
+    it returns; after idle_s seconds without calls a reaper thread drops the
+    component and runs the garbage collector, giving the memory back before
+    the next turn needs it. The load is measured (see measure) and its RSS
+    published under `name`.
+
+    warmup(), stop(), start_utterance(), snapshot() and close() are defined
+    here so that the calls and hasattr() checks done by FallbackTTS and
+    Pipeline never trigger a load: all but warmup() only act on a loaded
+    component.
+    """
+
+    _OWN = frozenset({"name", "load", "idle_s", "clock", "loads", "unloads"})
+
+    def __init__(
+        self,
+        name: str,
+        load: Callable[[], object],
+        idle_s: Optional[float] = 120.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.load = load
+        self.idle_s = idle_s
+        self.clock = clock
+        self.loads = 0
+        self.unloads = 0
+        self._component = None
+        self._active = 0
+        self._last_use = clock()
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        if idle_s:
+            threading.Thread(target=self._reap, name=f"{name}-reaper", daemon=True).start()
+
+    @property
+    def loaded(self) -> bool:
+        return self._component is not None
+
+    def get(self):
+        """The component, loading it if it is not in memory."""
+        with self._lock:
+            if self._component is None:
+                t0 = time.perf_counter()
+                with measure(self.name):
+                    self._component = self.load()
+                self.loads += 1
+                logger.info(
+                    f"{self.name} cargado bajo demanda en {(time.perf_counter() - t0) * 1000:.0f} ms "
+                    f"(RSS {rss_mb():.0f} MB)"
+                )
+            self._last_use = self.clock()
+            return self._component
+
+    def __getattr__(self, attr: str):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        value = getattr(self.get(), attr)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            with self._lock:
+                self._active += 1
+            try:
+                return value(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._last_use = self.clock()
+
+        return call
+
+    def __setattr__(self, attr: str, value) -> None:
+        if attr.startswith("_") or attr in self._OWN:
+            object.__setattr__(self, attr, value)
+        else:
+            # p. ej. FallbackTTS asigna on_first_byte antes de cada frase
+            setattr(self.get(), attr, value)
+
+    def unload(self) -> bool:
+        """Drop the component if it is idle (no call in progress, unused for idle_s)."""
+        with self._lock:
+            # Se comprueba con el lock: un get() recién terminado ha renovado _last_use
+            if self._component is None or self._active:
+                return False
+            if self.idle_s and self.clock() - self._last_use < self.idle_s:
+                return False
+            self._component = None
+            self.unloads += 1
+        gc.collect()
+        logger.info(f"{self.name} descargado por inactividad (RSS {rss_mb():.0f} MB)")
+        return True
+
+    def _reap(self) -> None:
+        while not self._closed.wait(min(self.idle_s / 4, 30.0)):
+            self.unload()
+
+    def warmup(self) -> None:
+        component = self.get()
+        if hasattr(component, "warmup"):
+            component.warmup()
+
+    def stop(self) -> None:
+        component = self._component
+        if component is not None and hasattr(component, "stop"):
+            component.stop()
+
+    def start_utterance(self) -> None:
+        component = self._component
+        if component is not None and hasattr(component, "start_utterance"):
+            component.start_utterance()
+
+    def snapshot(self) -> dict:
+        component = self._component
+        snapshot = {"loaded": int(component is not None), "loads": self.loads, "unloads": self.unloads}
+        if component is not None and hasattr(component, "snapshot"):
+            snapshot.update(component.snapshot())
+        return snapshot
+
+    def close(self) -> None:
+        self._closed.set()
+        component = self._component
+        if component is not None and hasattr(component, "close"):
+            component.close()
@@ -0,0 +1,344 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import memory
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Marca de fin de respuesta en la cola de frases
+_END = None
+
+
+class Pipeline:
+    """Asyncio orchestrator for wake -> STT -> LLM -> TTS.
+
+    Each stage is a coroutine connected to the next by a bounded asyncio.Queue.
+    Blocking libraries (openWakeWord, Vosk, the OpenAI client, Piper/ffplay) run
+    in a thread pool, so the LLM keeps producing sentences while the TTS stage
+    is still speaking the previous ones. Audio capture itself is the shared
+    AudioCapture running in the sounddevice thread.
+
+    Wake detection keeps running while the answer is generated and spoken. A
+    detection in that phase is a barge-in: playback and pending synthesis are
+    stopped, leftover sentences of the old turn are discarded and recording
+    starts right away.
+
+    With follow_up_ms > 0 the conversation stays open after each answer: the
+    next turn starts recording without a wake word and gives up if no speech
+    starts within that window, which also clears the conversation history.
+
+    wake, recognizer, assistant and tts may also be concurrent Futures still
+    loading in the background (ModelLoader): each stage waits only for the
+    component it needs, so wake detection can start before Vosk is ready.
+
+    announce() speaks text outside of a turn (e.g. a finished timer) through
+    the same TTS stage, so it never overlaps an answer and a wake word while
+    it plays interrupts it like any other answer.
+
+    Cancelling run() (Ctrl+C, stop()) cancels every stage and closes the
+    capture, which unblocks any executor thread waiting for audio.
+    """
+
+    def __init__(
+        self,
+        capture,
+        wake,
+        recognizer,
+        assistant,
+        tts,
+        http=None,
+        sink=None,
+        sentence_queue: int = 4,
+        follow_up_ms: int = 0,
+    ):
+        self.capture = capture
+        self.wake = wake
+        self.recognizer = recognizer
+        self.assistant = assistant
+        self.tts = tts
+        self.http = http
+        self.sink = sink
+        self.sentence_queue = sentence_queue
+        self.follow_up_ms = follow_up_ms  # 0 = sin conversación continua
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listening: Optional[asyncio.Event] = None
+        self._sentences: Optional[asyncio.Queue] = None
+        self._stopping = threading.Event()
+        self._turn = 0  # id del turno actual; las frases de turnos viejos se descartan
+        self._active = False
+        self._speaking = False  # el TTS está reproduciendo (respuesta o aviso)
+        self.barge_ins = 0
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping.clear()
+        self._task = asyncio.current_task()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline")
+        self._listening = asyncio.Event()
+        self._listening.set()
+
+        wakes: asyncio.Queue = asyncio.Queue(maxsize=1)
+        texts: asyncio.Queue = asyncio.Queue(maxsize=1)
+        sentences: asyncio.Queue = asyncio.Queue(maxsize=self.sentence_queue)
+        self._sentences = sentences
+
+        stages = [
+            asyncio.ensure_future(self._wake_stage(wakes)),
+            asyncio.ensure_future(self._stt_stage(wakes, texts)),
+            asyncio.ensure_future(self._llm_stage(texts, sentences)),
+            asyncio.ensure_future(self._tts_stage(sentences, wakes)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            self._stopping.set()
+            for stage in stages:
+                stage.cancel()
+            self.capture.close()  # desbloquea lecturas pendientes en el executor
+            tts = _loaded(self.tts)
+            if tts is not None:
+                tts.stop()
+            if self.sink is not None:
+                self.sink.stop()
+            await asyncio.gather(*stages, return_exceptions=True)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self) -> None:
+        """Stop the pipeline from any thread."""
+        if self._loop is not None and self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    def announce(self, text: str) -> None:
+        """Speak `text` from any thread, after whatever the TTS stage has queued."""
+        if self._loop is None or self._sentences is None or self._stopping.is_set():
+            logger.warning(f"Aviso descartado, el asistente no está en marcha: {text}")
+            return
+        # turno None: no pertenece a ningún turno y no se descarta con ellos
+        asyncio.run_coroutine_threadsafe(self._sentences.put((None, text)), self._loop)
+
+    async def _blocking(self, fn, *args):
+        return await self._loop.run_in_executor(self._executor, fn, *args)
+
+    async def _ready(self, component):
+        """Wait for a component that may still be loading in the background."""
+        if isinstance(component, concurrent.futures.Future):
+            return await asyncio.wrap_future(component)
+        return component
+
+    async def _wake_stage(self, wakes: asyncio.Queue) -> None:
+        wake = await self._ready(self.wake)
+        logger.info("Asistente listo. Esperando wake word...")
+        while True:
+            # No se escucha mientras se graba; sí durante el LLM y la reproducción
+            await self._listening.wait()
+            if not await self._blocking(wake.activate):
+                if self.capture.closed:
+                    return
+                continue
+            t_wake = time.perf_counter()
+            if not self._listening.is_set():
+                continue  # ya se está grabando un turno de seguimiento
+            if self._active or self._speaking:
+                self._barge_in(t_wake)
+            self._turn += 1
+            self._active = True
+            self._listening.clear()
+            tracing.tracer.start_turn()
+            logger.info("Wake word detectado. Grabando...")
+            if self.http is not None:
+                # Handshake TCP/TLS mientras el usuario habla
+                self.http.warm()
+            await wakes.put((self._turn, wake.detected_at, None))
+
+    async def _stt_stage(self, wakes: asyncio.Queue, texts: asyncio.Queue) -> None:
+        while True:
+            turn, start, timeout_ms = await wakes.get()
+            if turn != self._turn:
+                continue  # seguimiento adelantado por un wake word
+            try:
+                recognizer = await self._ready(self.recognizer)
+                text = await self._blocking(
+                    recognizer.record_and_transcribe, start, timeout_ms
+                )
+            except Exception as e:
+                logger.error(f"Error en transcripción: {e}")
+                text = ""
+            finally:
+                self._listening.set()
+            if not text and timeout_ms is not None:
+                logger.info("Fin de la conversación.")
+                (await self._ready(self.assistant)).clear_history()
+                self._end_turn(turn, discard=True)
+                continue
+            if not text:
+                logger.warning("No se detectó texto.")
+                self._end_turn(turn)
+                continue
+            logger.info(f"Transcripción: {text}")
+            await texts.put((turn, text))
+
+    async def _llm_stage(self, texts: asyncio.Queue, sentences: asyncio.Queue) -> None:
+        loop = self._loop
+
+        def produce(assistant, turn: int, text: str) -> None:
+            # Corre en el executor; put() bloquea si la cola está llena (backpressure)
+            for sentence in assistant.chat_stream(text):
+                if turn != self._turn:
+                    return  # turno interrumpido: se descarta el resto
+                logger.info(f"Respuesta: {sentence}")
+                future = asyncio.run_coroutine_threadsafe(
+                    sentences.put((turn, sentence)), loop
+                )
+                while True:
+                    try:
+                        future.result(timeout=0.5)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if self._stopping.is_set():
+                            future.cancel()
+                            return
+
+        while True:
+            turn, text = await texts.get()
+            try:
+                assistant = await self._ready(self.assistant)
+                await self._blocking(produce, assistant, turn, text)
+            except Exception as e:
+                logger.error(f"Error en el LLM: {e}")
+            await sentences.put((turn, _END))
+
+    async def _tts_stage(self, sentences: asyncio.Queue, wakes: asyncio.Queue) -> None:
+        pending = None  # siguiente frase, ya sacada de la cola y precargada
+        while True:
+            turn, sentence = pending if pending is not None else await sentences.get()
+            pending = None
+            if turn is not None and turn != self._turn:
+                continue  # frase de un turno interrumpido
+            if sentence is _END:
+                self._end_turn(turn)
+                if self.follow_up_ms and wakes.empty():
+                    await wakes.put(self._follow_up())
+                continue
+            try:
+                tts = await self._ready(self.tts)
+                self._speaking = True
+                if hasattr(tts, "start_utterance"):
+                    # Antes de encolar: un barge-in desde aquí ya no se pierde
+                    tts.start_utterance()
+                playing = asyncio.ensure_future(self._blocking(tts.reproduce, sentence))
+                pending = await self._look_ahead(sentences, playing, tts)
+                await playing
+            except Exception as e:
+                logger.error(f"Error en TTS: {e}")
+            finally:
+                self._speaking = False
+
+    async def _look_ahead(self, sentences: asyncio.Queue, playing: asyncio.Future, tts):
+        """While a sentence plays, take the next one and start its synthesis.
+
+        Each reproduce() call gets a single sentence, so without this the
+        next one would only be requested once the current one finished.
+        """
+        preload = getattr(tts, "preload", None)
+        if preload is None:
+            return None
+        getter = asyncio.ensure_future(sentences.get())
+        await asyncio.wait({playing, getter}, return_when=asyncio.FIRST_COMPLETED)
+        if not getter.done():
+            getter.cancel()
+            try:
+                return await getter  # pudo completarse a la vez que la cancelación
+            except asyncio.CancelledError:
+                return None
+        turn, sentence = item = getter.result()
+        if sentence is not _END and (turn is None or turn == self._turn):
+            preload(sentence)
+        return item
+
+    def _barge_in(self, t_wake: float) -> None:
+        """Silence the current answer and drop the rest of the turn."""
+        tts = _loaded(self.tts)
+        if tts is not None:
+            tts.stop()
+        self.barge_ins += 1
+        tracing.tracer.set_gauge("barge_ins_total", self.barge_ins)
+        self._end_turn(self._turn)
+        if self.sink is None:
+            # Sin sink el reproductor externo se corta en stop()
+            self._publish_barge_in(t_wake, time.perf_counter())
+            return
+        self.sink.stop()
+
+        def silent(future: asyncio.Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                self._publish_barge_in(t_wake, future.result())
+
+        asyncio.ensure_future(self._blocking(self.sink.wait_silent, 1.0)).add_done_callback(silent)
+
+    def _publish_barge_in(self, t_wake: float, silent_at: Optional[float]) -> None:
+        """barge_in_stop_ms: wake word detection to the speaker going silent."""
+        if silent_at is None:
+            logger.warning("Barge-in: el audio no se cortó en 1 s")
+            return
+        stop_ms = (silent_at - t_wake) * 1000
+        logger.info(f"Barge-in: respuesta interrumpida ({stop_ms:.0f} ms)")
+        tracing.tracer.set_gauge("barge_in_stop_ms", round(stop_ms, 1))
+
+    def _follow_up(self) -> tuple:
+        """Open a new turn that records right away, without a wake word."""
+        self._turn += 1
+        self._active = True
+        self._listening.clear()
+        tracing.tracer.start_turn("follow_up")
+        logger.info("Escuchando seguimiento...")
+        return self._turn, self.capture.position, self.follow_up_ms
+
+    def _end_turn(self, turn: int, discard: bool = False) -> None:
+        if turn != self._turn or not self._active:
+            return
+        self._active = False
+        if discard:
+            tracing.tracer.discard_turn()
+            return
+        self._publish_metrics()
+        record = tracing.tracer.end_turn()
+        if record is not None:
+            logger.info(f"Latencias del turno (ms): {record['spans_ms']}")
+
+    def _publish_metrics(self) -> None:
+        sources = [("wake", _loaded(self.wake).snapshot())]
+        if self.http is not None:
+            sources.append(("http", self.http.metrics.snapshot()))
+        if self.sink is not None:
+            sources.append(("playback", self.sink.snapshot()))
+        tts = _loaded(self.tts)
+        if hasattr(tts, "snapshot"):
+            sources.append(("tts", tts.snapshot()))
+        web_search = getattr(_loaded(self.assistant), "web_search", None)
+        if web_search is not None:
+            sources.append(("web", web_search.snapshot()))
+        # RSS del proceso y de cada modelo; el pico es el de este turno
+        sources.append(("memory", memory.snapshot()))
+        memory.reset_peak()
+        for prefix, snapshot in sources:
+            for name, value in snapshot.items():
+                if value is not None:
+                    tracing.tracer.set_gauge(f"{prefix}_{name}", value)
+
+
+def _loaded(component):
+    """The component, or None if it is a Future that has not finished loading."""
+    if isinstance(component, concurrent.futures.Future):
+        if not component.done() or component.exception() is not None:
+            return None
+        return component.result()
+    return component
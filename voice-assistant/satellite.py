@@ -0,0 +1,122 @@
+"""Lightweight satellite: streams the microphone to a HomeGPT server.
+
+No models run here: the device only captures 16 kHz PCM, sends it over TCP
+and plays back the audio the server answers with.
+
+Usage:
+    python voice-assistant/satellite.py --host 192.168.1.10 --name cocina
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from typing import Callable, Optional
+
+from satellite_server import AUDIO, DEFAULT_PORT, EVENT, HELLO, encode, encode_json, read_message
+
+logger = logging.getLogger(__name__)
+
+
+class Satellite:
+    """Client side of the satellite protocol.
+
+    capture is any AudioCapture (microphone, FileCapture, ...); received PCM
+    goes to sink.write(pcm, sample_rate) when a PlaybackSink is given and
+    every server event is passed to on_event.
+    """
+
+    def __init__(
+        self,
+        capture,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        name: str = "satelite",
+        sink=None,
+        on_event: Optional[Callable[[dict], None]] = None,
+        chunk_ms: int = 20,
+    ):
+        self.capture = capture
+        self.host = host
+        self.port = port
+        self.name = name
+        self.sink = sink
+        self.on_event = on_event
+        self.chunk_samples = capture.sample_rate * chunk_ms // 1000
+        self.sample_rate = 0  # del audio recibido
+        self.received_bytes = 0
+
+    async def run(self) -> None:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(encode_json(HELLO, {"name": self.name, "sample_rate": self.capture.sample_rate}))
+        await writer.drain()
+        sender = asyncio.ensure_future(self._send_audio(writer))
+        try:
+            await self._receive(reader)
+        finally:
+            sender.cancel()
+            writer.close()
+
+    async def _send_audio(self, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        cursor = self.capture.cursor()
+        while True:
+            samples = await loop.run_in_executor(None, cursor.read, self.chunk_samples, 0.5)
+            if samples is None:
+                if self.capture.closed:
+                    writer.write_eof()
+                    return
+                continue
+            writer.write(encode(AUDIO, samples.tobytes()))
+            await writer.drain()
+
+    async def _receive(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            message = await read_message(reader)
+            if message is None:
+                return
+            kind, payload = message
+            if kind == AUDIO:
+                self.received_bytes += len(payload)
+                if self.sink is not None:
+                    self.sink.write(payload, self.sample_rate)
+            elif kind == EVENT:
+                event = json.loads(payload)
+                logger.info(f"{self.name}: {event}")
+                if event["event"] == "audio_start":
+                    self.sample_rate = event["sample_rate"]
+                    if self.sink is not None:
+                        self.sink.begin()
+                elif event["event"] == "audio_end" and self.sink is not None:
+                    self.sink.end()
+                if self.on_event is not None:
+                    self.on_event(event)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="HomeGPT satellite")
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--name", required=True, help="Nombre de la habitación")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from audio_capture import AudioCapture
+    from tts.playback import PlaybackSink
+
+    capture = AudioCapture()
+    sink = PlaybackSink()
+    capture.start()
+    sink.start()
+    try:
+        asyncio.run(Satellite(capture, args.host, args.port, args.name, sink=sink).run())
+    except KeyboardInterrupt:
+        logger.info("Deteniendo satélite...")
+    finally:
+        capture.close()
+        sink.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
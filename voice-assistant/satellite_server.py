@@ -0,0 +1,362 @@
+"""Satellite server: many microphones, one HomeGPT.
+
+Satellites (satellite.py) stream 16 kHz int16 PCM over TCP. The server keeps
+one Vosk model, one TTS voice and one LLM client setup for every room, runs
+wake word detection for all streams from a single thread and, per session,
+STT -> LLM -> TTS, streaming the synthesized PCM back to the satellite.
+
+Usage:
+    python voice-assistant/satellite_server.py --port 10700 --max-sessions 2
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import logging
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+from audio_capture import AudioCapture
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 10700
+
+# Protocolo: [tipo: 1 byte][longitud: uint32 big-endian][payload]
+HELLO = b"H"  # satélite -> servidor, JSON {"name", "sample_rate"}
+AUDIO = b"A"  # PCM int16 mono en ambos sentidos
+EVENT = b"E"  # servidor -> satélite, JSON {"event": ...}
+_HEADER = struct.Struct(">cI")
+MAX_PAYLOAD = 1 << 20
+
+
+def encode(kind: bytes, payload: bytes = b"") -> bytes:
+    return _HEADER.pack(kind, len(payload)) + payload
+
+
+def encode_json(kind: bytes, data: dict) -> bytes:
+    return encode(kind, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[tuple]:
+    """Read one (kind, payload) message; None on EOF."""
+    try:
+        kind, length = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+        if length > MAX_PAYLOAD:
+            raise ValueError(f"mensaje demasiado grande ({length} bytes)")
+        return kind, await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+class SatelliteStream:
+    """One connected satellite: its audio ring buffer and outgoing queue."""
+
+    def __init__(self, name: str, sample_rate: int, wake, assistant, loop, outbox_size: int):
+        self.name = name
+        self.capture = AudioCapture(sample_rate=sample_rate)
+        self.wake = wake
+        self.assistant = assistant
+        self.cursor = self.capture.cursor()
+        self.in_session = False
+        self.closed = False
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=outbox_size)
+        self._loop = loop
+
+    def send(self, message: bytes) -> bool:
+        """Queue a message from a worker thread.
+
+        Blocks while the outbox is full (backpressure from a slow satellite);
+        returns False if the satellite disconnected.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.outbox.put(message), self._loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self.closed:
+                    future.cancel()
+                    return False
+
+    def send_event(self, event: str, **data) -> bool:
+        return self.send(encode_json(EVENT, {"event": event, **data}))
+
+    def rearm(self) -> None:
+        """Listen for the wake word again from the current position."""
+        self.wake.reset()
+        self.cursor = self.capture.cursor()
+        self.in_session = False
+
+
+class SatelliteServer:
+    """TCP server running the assistant for many satellites.
+
+    - wake_factory() -> per-stream detector with poll(cursor), reset(),
+      detected_at and snapshot() (SharedWakeWord.stream); detectors with a
+      `shared` attribute are scored together through shared.poll_batch()
+    - recognizer.for_capture(capture) -> recorder for one stream (VoiceRecognizer)
+    - assistant_factory() -> per-stream conversation with chat_stream(text)
+    - tts.synthesize(text) -> int16 PCM at tts.sample_rate (one shared voice)
+
+    Wake word inference for every stream runs in one scheduler thread, which
+    evaluates the frames buffered for every stream in one batch per pass. Sessions
+    (STT + LLM + TTS) run in a pool of max_sessions threads; a wake word while
+    every slot is busy gets a "busy" event instead of queueing. Each stream
+    has a bounded outbox, so a slow satellite only slows down its own TTS.
+    """
+
+    def __init__(
+        self,
+        wake_factory: Callable[[], object],
+        recognizer,
+        assistant_factory: Callable[[], object],
+        tts,
+        host: str = "0.0.0.0",
+        port: int = DEFAULT_PORT,
+        max_sessions: int = 2,
+        max_streams: int = 8,
+        outbox_size: int = 32,
+        chunk_bytes: int = 4096,
+        max_recent_sessions: int = 256,
+    ):
+        self.wake_factory = wake_factory
+        self.recognizer = recognizer
+        self.assistant_factory = assistant_factory
+        self.tts = tts
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.max_streams = max_streams
+        self.outbox_size = outbox_size
+        self.chunk_bytes = chunk_bytes
+
+        self.streams: dict[str, SatelliteStream] = {}
+        # Métricas de las últimas sesiones terminadas (acotadas: el servidor no para)
+        self.sessions: collections.deque = collections.deque(maxlen=max_recent_sessions)
+        self.sessions_total = 0
+        self.busy_rejections = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = threading.Event()
+        self._scheduler: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_sessions, thread_name_prefix="session")
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._scheduler = threading.Thread(target=self._schedule, name="wake-scheduler", daemon=True)
+        self._scheduler.start()
+        logger.info(f"Servidor de satélites escuchando en {self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for stream in list(self.streams.values()):
+            stream.closed = True
+            stream.capture.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        hello = await read_message(reader)
+        if hello is None or hello[0] != HELLO:
+            writer.close()
+            return
+        info = json.loads(hello[1])
+        name = info.get("name") or f"sat-{len(self.streams) + 1}"
+        if len(self.streams) >= self.max_streams or name in self.streams:
+            writer.write(encode_json(EVENT, {"event": "rejected"}))
+            await writer.drain()
+            writer.close()
+            return
+
+        stream = SatelliteStream(
+            name, int(info.get("sample_rate", 16000)), self.wake_factory(),
+            self.assistant_factory(), self._loop, self.outbox_size,
+        )
+        self.streams[name] = stream
+        sender = asyncio.ensure_future(self._send_loop(stream, writer))
+        logger.info(f"Satélite conectado: {name}")
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                kind, payload = message
+                if kind == AUDIO:
+                    stream.capture.write(np.frombuffer(payload, dtype=np.int16))
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Satélite {name}: {e}")
+        finally:
+            stream.closed = True
+            stream.capture.close()  # desbloquea una sesión en curso
+            del self.streams[name]
+            sender.cancel()
+            writer.close()
+            logger.info(f"Satélite desconectado: {name}")
+
+    async def _send_loop(self, stream: SatelliteStream, writer: asyncio.StreamWriter) -> None:
+        while True:
+            writer.write(await stream.outbox.get())
+            await writer.drain()  # backpressure TCP: la cola se llena si el satélite va lento
+
+    def _schedule(self) -> None:
+        """Wake word detection for every stream from a single thread."""
+        while not self._stopping.is_set():
+            ready = [s for s in list(self.streams.values()) if not s.in_session and not s.closed]
+            positions = [stream.cursor.position for stream in ready]
+            for stream in self._poll(ready):
+                self._on_wake(stream)
+            # Mientras algún stream avance se sigue sin dormir
+            if not any(s.cursor.position != p for s, p in zip(ready, positions)):
+                time.sleep(0.01)
+
+    def _poll(self, streams: list) -> list:
+        """Streams whose wake word was heard in this pass.
+
+        Detectors sharing a model (SharedWakeWord) are scored together with
+        one batched prediction; any other detector is polled on its own.
+        """
+        detected = []
+        groups: dict[int, tuple] = {}
+        for stream in streams:
+            shared = getattr(stream.wake, "shared", None)
+            if shared is not None:
+                groups.setdefault(id(shared), (shared, []))[1].append(stream)
+                continue
+            try:
+                if stream.wake.poll(stream.cursor):
+                    detected.append(stream)
+            except Exception as e:
+                logger.error(f"Error de wake word en {stream.name}: {e}")
+        for shared, group in groups.values():
+            try:
+                hits = shared.poll_batch([(s.wake, s.cursor) for s in group])
+            except Exception as e:
+                logger.error(f"Error de wake word en {', '.join(s.name for s in group)}: {e}")
+                continue
+            detected += [s for s, hit in zip(group, hits) if hit]
+        return detected
+
+    def _on_wake(self, stream: SatelliteStream) -> None:
+        with self._lock:
+            if self._active >= self.max_sessions:
+                self.busy_rejections += 1
+                full = True
+            else:
+                self._active += 1
+                full = False
+        if full:
+            logger.warning(f"Sesiones completas: {stream.name} rechazado")
+            asyncio.run_coroutine_threadsafe(
+                stream.outbox.put(encode_json(EVENT, {"event": "busy"})), self._loop
+            )
+            stream.rearm()
+            return
+        stream.in_session = True
+        self._executor.submit(self._session, stream, stream.wake.detected_at, time.perf_counter())
+
+    def _session(self, stream: SatelliteStream, start: int, t_wake: float) -> None:
+        metrics = {"stream": stream.name, "stt_ms": None, "first_audio_ms": None, "total_ms": None}
+        try:
+            stream.send_event("wake")
+            recognizer = self.recognizer.for_capture(stream.capture)
+            text = recognizer.record_and_transcribe(start)
+            metrics["stt_ms"] = round((time.perf_counter() - t_wake) * 1000, 1)
+            stream.send_event("transcript", text=text)
+            if not text:
+                return
+            stream.send_event("audio_start", sample_rate=self.tts.sample_rate)
+            for sentence in stream.assistant.chat_stream(text):
+                pcm = self.tts.synthesize(sentence)
+                for i in range(0, len(pcm), self.chunk_bytes):
+                    if metrics["first_audio_ms"] is None:
+                        metrics["first_audio_ms"] = round((time.perf_counter() - t_wake) * 1000, 1)
+                    if not stream.send(encode(AUDIO, pcm[i:i + self.chunk_bytes])):
+                        return
+            stream.send_event("audio_end")
+        except Exception as e:
+            logger.error(f"Error en la sesión de {stream.name}: {e}")
+        finally:
+            metrics["total_ms"] = round((time.perf_counter() - t_wake) * 1000, 1)
+            with self._lock:
+                self.sessions.append(metrics)
+                self.sessions_total += 1
+                self._active -= 1
+            stream.rearm()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="HomeGPT satellite server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-sessions", type=int, default=2)
+    parser.add_argument("--max-streams", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from dotenv import load_dotenv
+
+    from assistant import VoiceAssistant
+    from http_pool import HTTPPool
+    from intents import AnswerCache, default_router
+    from llm_guard import LLMGuard
+    from tts.piper import PiperTTS
+    from voice_recognizer import VoiceRecognizer
+    from wake_word import SharedWakeWord
+
+    load_dotenv("config.env")
+    http = HTTPPool()
+    client = http.httpx_client()
+    answers = AnswerCache()
+    guard = LLMGuard()  # un solo circuit breaker para todas las habitaciones
+    recognizer = VoiceRecognizer(pool_size=args.max_sessions)
+    recognizer.warmup()
+    tts = PiperTTS()  # con warm-up al cargar
+    wake = SharedWakeWord(max_batch=4)  # un solo modelo para todos los satélites
+
+    server = SatelliteServer(
+        wake_factory=wake.stream,
+        recognizer=recognizer,
+        assistant_factory=lambda: VoiceAssistant(
+            http_client=client, router=default_router(), answer_cache=answers, guard=guard
+        ),
+        tts=tts,
+        host=args.host,
+        port=args.port,
+        max_sessions=args.max_sessions,
+        max_streams=args.max_streams,
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Deteniendo servidor...")
+    finally:
+        http.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
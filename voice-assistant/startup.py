@@ -0,0 +1,98 @@
+import concurrent.futures
+import contextlib
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import memory
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class ModelLoader:
+    """Loads the heavy components in background threads.
+
+    Each submit() runs the loader function (imports included, so heavy
+    libraries are imported in parallel too) followed by the component's
+    warmup() method if it has one, and returns a Future. The Pipeline accepts
+    those futures directly: wake detection starts as soon as the wake model is
+    ready while Vosk or Piper are still loading, and audio captured meanwhile
+    stays in the shared ring buffer until the recognizer catches up.
+
+    With max_workers=1 (low-memory profile) loads run one after another, so
+    their peaks do not add up, and the steady/peak RSS of each component is
+    measured and reported next to its timings.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="loader")
+        # Con cargas en paralelo el RSS no se puede atribuir a un componente
+        self.measure_memory = max_workers == 1
+        self._t0 = time.perf_counter()
+        self._futures: dict[str, Future] = {}
+        self.timings: dict[str, dict] = {}
+
+    def submit(self, name: str, load: Callable[[], object], warmup: bool = True) -> Future:
+        def run():
+            measured = memory.measure(name) if self.measure_memory else contextlib.nullcontext()
+            with measured:
+                t0 = time.perf_counter()
+                component = load()
+                t1 = time.perf_counter()
+                if warmup and hasattr(component, "warmup"):
+                    try:
+                        component.warmup()
+                    except Exception as e:
+                        logger.warning(f"Warm-up de {name} fallido: {e}")
+                t2 = time.perf_counter()
+            self.timings[name] = {
+                "load_ms": round((t1 - t0) * 1000, 1),
+                "warmup_ms": round((t2 - t1) * 1000, 1),
+                "ready_ms": round((t2 - self._t0) * 1000, 1),
+            }
+            if self.measure_memory:
+                self.timings[name].update(memory.snapshot_of(name))
+            logger.info(f"{name} listo en {self.timings[name]['ready_ms']:.0f} ms")
+            return component
+
+        future = self._executor.submit(run)
+        self._futures[name] = future
+        return future
+
+    def loaded(self, name: str):
+        """The component if it finished loading successfully, else None."""
+        future = self._futures.get(name)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every component is loaded (or failed)."""
+        done, pending = concurrent.futures.wait(self._futures.values(), timeout=timeout)
+        return not pending
+
+    def report(self) -> dict:
+        """Wait for every component and log the startup timing table."""
+        self.wait()
+        header = "Arranque (ms):        carga  warm-up   listo"
+        lines = [header + ("   RSS MB  pico MB" if self.measure_memory else "")]
+        for name, future in self._futures.items():
+            error = future.exception()
+            if error is not None:
+                lines.append(f"  {name:<18} ERROR: {error}")
+                continue
+            t = self.timings[name]
+            line = f"  {name:<18} {t['load_ms']:>6.0f} {t['warmup_ms']:>8.0f} {t['ready_ms']:>7.0f}"
+            if "rss_mb" in t:
+                line += f" {t['rss_mb']:>8.1f} {t['peak_mb']:>8.1f}"
+            lines.append(line)
+            tracing.tracer.set_gauge(f"startup_{name}_ready_ms", t["ready_ms"])
+        total = max((t["ready_ms"] for t in self.timings.values()), default=0.0)
+        lines.append(f"  total              {total:>24.0f}")
+        logger.info("\n".join(lines))
+        return dict(self.timings)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,168 @@
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Etapas de un turno, en orden
+STAGES = (
+    "wake_detected",
+    "follow_up",  # inicio de un turno de seguimiento (sin wake word)
+    "speech_start",
+    "endpoint",
+    "stt_final",
+    "llm_request",
+    "llm_first_token",
+    "tts_first_byte",
+    "playback_start",
+)
+
+
+class Tracer:
+    """Per-turn latency tracing with rolling percentiles.
+
+    mark(stage) records the first timestamp of each stage in the current turn
+    (a perf_counter call and a dict insert, cheap enough for a Pi). end_turn()
+    turns the marks into spans (time since the previous marked stage), appends
+    one JSON line per turn and rewrites a Prometheus text file with p50/p95 per
+    stage over the last `window` turns. Extra values (connection reuse,
+    underruns...) can be published with set_gauge().
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Optional[str] = "logs/trace.jsonl",
+        prom_path: Optional[str] = "logs/metrics.prom",
+        window: int = 200,
+    ):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        self._t0: Optional[float] = None
+        self._marks: dict = {}
+        self._spans = {s: collections.deque(maxlen=window) for s in STAGES}
+        self._gauges: dict = {}
+        self.turns = 0
+
+    def start_turn(self, stage: str = "wake_detected") -> None:
+        with self._lock:
+            self._t0 = time.perf_counter()
+            self._marks = {stage: 0.0}
+
+    def mark(self, stage: str, at: Optional[float] = None) -> None:
+        """Record a stage; `at` is a perf_counter() value taken elsewhere.
+
+        perf_counter() is CLOCK_MONOTONIC on Linux, so timestamps taken in a
+        worker process (multi-process frontend) can be passed in as is.
+        """
+        now = time.perf_counter() if at is None else at
+        with self._lock:
+            if self._t0 is not None and stage not in self._marks:
+                self._marks[stage] = (now - self._t0) * 1000
+
+    def set_gauge(self, name: str, value) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def discard_turn(self) -> None:
+        """Drop the current turn without recording it (e.g. an unused follow-up)."""
+        with self._lock:
+            self._marks, self._t0 = {}, None
+
+    def end_turn(self) -> Optional[dict]:
+        """Close the current turn, update percentiles and write the outputs."""
+        with self._lock:
+            if self._t0 is None:
+                return None
+            marks, self._marks, self._t0 = self._marks, {}, None
+            self.turns += 1
+            spans = {}
+            prev = None
+            for stage in STAGES:
+                if stage not in marks:
+                    continue
+                if prev is not None:
+                    spans[stage] = round(marks[stage] - marks[prev], 1)
+                    self._spans[stage].append(spans[stage])
+                prev = stage
+            record = {
+                "turn": self.turns,
+                "time": time.time(),
+                "marks_ms": {k: round(v, 1) for k, v in marks.items()},
+                "spans_ms": spans,
+            }
+            prom = self._render_prometheus()
+
+        try:
+            if self.jsonl_path:
+                _ensure_dir(self.jsonl_path)
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            if self.prom_path:
+                _ensure_dir(self.prom_path)
+                tmp = f"{self.prom_path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(prom)
+                os.replace(tmp, self.prom_path)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir la traza: {e}")
+        return record
+
+    def percentiles(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"p50": _quantile(v, 0.5), "p95": _quantile(v, 0.95), "count": len(v)}
+                for stage, v in self._spans.items()
+                if v
+            }
+
+    def _render_prometheus(self) -> str:
+        lines = [
+            "# HELP homegpt_stage_latency_ms Time since the previous stage of the turn.",
+            "# TYPE homegpt_stage_latency_ms summary",
+        ]
+        for stage, values in self._spans.items():
+            if not values:
+                continue
+            for q in (0.5, 0.95):
+                lines.append(
+                    f'homegpt_stage_latency_ms{{stage="{stage}",quantile="{q}"}} '
+                    f"{_quantile(values, q)}"
+                )
+            lines.append(f'homegpt_stage_latency_ms_count{{stage="{stage}"}} {len(values)}')
+        lines.append("# TYPE homegpt_turns_total counter")
+        lines.append(f"homegpt_turns_total {self.turns}")
+        for name, value in sorted(self._gauges.items()):
+            if isinstance(value, (int, float)):
+                lines.append(f"homegpt_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _ensure_dir(path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+# Tracer global: los módulos llaman a tracing.mark() sin recibir el objeto.
+# Sin configure() no hay turno abierto y mark() no hace nada.
+tracer = Tracer(jsonl_path=None, prom_path=None)
+
+
+def configure(**kwargs) -> Tracer:
+    global tracer
+    tracer = Tracer(**kwargs)
+    return tracer
+
+
+def mark(stage: str, at: Optional[float] = None) -> None:
+    tracer.mark(stage, at)
@@ -1,5 +1,15 @@
-from .piper import PiperTTS as TTSEngine
-from .piper import PiperTTS
 from .base import BaseTTS
+from .cache import AudioCache, CachedTTS
+from .fallback import FallbackTTS
+from .playback import PlaybackSink
 
-__all__ = ["BaseTTS", "PiperTTS", "TTSEngine"]
+__all__ = ["AudioCache", "BaseTTS", "CachedTTS", "FallbackTTS", "PiperTTS", "PlaybackSink", "TTSEngine"]
+
+
+def __getattr__(name):
+    # Piper (onnxruntime) solo se importa si se usa: acelera el arranque
+    if name in ("PiperTTS", "TTSEngine"):
+        from .piper import PiperTTS
+
+        return PiperTTS
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Callable, Optional
 
 
 class BaseTTS(ABC):
@@ -8,9 +9,29 @@ class BaseTTS(ABC):
     - Implementations must load any resources in __init__ (fast) or lazily on first use.
     - reproduce(text): synthesize and play audio for the given text.
     - sample_rate: int property indicating playback sample rate (Hz).
+    - synthesize(text) / play(audio): optional split of reproduce() into rendering
+      and playback, used by CachedTTS. cache_params() identifies the rendered audio.
+    - sink: optional shared PlaybackSink; when set, audio is played in-process
+      instead of through an external player.
+    - on_first_byte: optional hook called when the first audio of an utterance
+      is available (network byte or synthesized chunk), for latency tracing.
+    - on_audio: optional hook receiving the audio of reproduce() as it streams,
+      in the format play() accepts (CachedTTS stores it without a second request).
+    - preload(text): optional hint that `text` is the next utterance; engines
+      with network synthesis start fetching it while the current one plays.
+    - stop(): may be called from another thread to silence the current
+      utterance and drop pending synthesis (barge-in). The engine stays silent
+      until start_utterance(), which the caller (Pipeline) invokes before
+      handing over each sentence: a stop() that lands between the executor
+      submit and reproduce() is kept. Wrappers forward start_utterance().
     """
 
     sample_rate: int = 16000
+    sink = None
+    on_first_byte: Optional[Callable[[], None]] = None
+    on_audio: Optional[Callable[[bytes], None]] = None
+    _output = None
+    _stopped = False
 
     @abstractmethod
     def reproduce(self, text: str) -> None:
@@ -21,5 +42,44 @@ class BaseTTS(ABC):
         """
         raise NotImplementedError
 
+    def synthesize(self, text: str) -> bytes:
+        """Render the complete audio for `text` without playing it."""
+        raise NotImplementedError
+
+    def play(self, audio: bytes) -> None:
+        """Play audio previously returned by synthesize()."""
+        raise NotImplementedError
+
+    def preload(self, text: str) -> None:
+        """Start rendering the next utterance in the background (no-op by default)."""
+
+    def cache_params(self) -> dict:
+        """Engine settings that change the rendered audio (engine, voice, model, format)."""
+        return {"engine": type(self).__name__}
+
+    def stop(self) -> None:
+        """Interrupt the current playback and any pending synthesis."""
+        self._stopped = True
+        output = self._output
+        if output is not None:
+            output.abort()
+
+    def start_utterance(self) -> None:
+        """Forget a stop() aimed at the previous utterance."""
+        self._stopped = False
+
+    def _start_output(self, output):
+        """Register the output of an utterance so stop() can abort it."""
+        self._output = output
+        return output
+
+    def _notify_first_byte(self) -> None:
+        if self.on_first_byte is not None:
+            self.on_first_byte()
+
+    def _emit_audio(self, audio: bytes) -> None:
+        if self.on_audio is not None:
+            self.on_audio(audio)
+
     def close(self) -> None:
         pass
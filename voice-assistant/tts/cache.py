@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from .base import BaseTTS
+
+
+class AudioCache:
+    """Disk-backed, size-bounded LRU cache of rendered audio.
+
+    Entries are content-addressed: the file name is the SHA-256 of the text plus
+    the engine parameters (engine, voice, model, format). Recency is tracked with
+    the file mtime so the LRU order survives restarts.
+    """
+
+    def __init__(self, cache_dir: str = "cache/tts", max_bytes: int = 50 * 1024 * 1024) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size, LRU first
+        self._total = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(text: str, **params) -> str:
+        text = re.sub(r"\s+", " ", text).strip()
+        raw = json.dumps({"text": text, **params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def _load_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".audio"):
+                continue
+            st = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((st.st_mtime, name[: -len(".audio")], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._index
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            with self._lock:
+                self._total -= self._index.pop(key, 0)
+            return None
+
+    def put(self, key: str, audio: bytes) -> None:
+        if not audio or len(audio) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total += len(audio) - self._index.pop(key, 0)
+            self._index[key] = len(audio)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    @property
+    def size_bytes(self) -> int:
+        return self._total
+
+
+class CachedTTS(BaseTTS):
+    """Wraps any BaseTTS engine with an AudioCache.
+
+    - Cache hit (prerendered system phrases, repeated sentences): the stored
+      audio is played directly, no synthesis/API call.
+    - Miss: delegated to engine.reproduce() so it keeps streaming (and
+      prefetching). A short sentence seen before is stored from the streamed
+      bytes (on_audio) once it finished playing; one-off answers never touch
+      the disk.
+    - Long text (answers) is always streamed and never stored.
+    Engines without play() are simply passed through.
+    """
+
+    def __init__(
+        self, engine: BaseTTS, cache: AudioCache, max_text_chars: int = 200, max_seen: int = 1024
+    ) -> None:
+        self.engine = engine
+        self.cache = cache
+        self.max_text_chars = max_text_chars
+        self.max_seen = max_seen
+        self._seen: "OrderedDict[str, None]" = OrderedDict()  # claves oídas una vez, LRU
+
+    @property
+    def sample_rate(self) -> int:  # type: ignore[override]
+        return self.engine.sample_rate
+
+    def _key(self, text: str) -> str:
+        return self.cache.key(text, **self.engine.cache_params())
+
+    def reproduce(self, text: str) -> None:
+        if not text or not text.strip():
+            logging.warning("Texto vacío, no se reproduce nada")
+            return
+
+        if self._stopped:
+            return  # stop() llegó antes de empezar la frase
+        # Streaming paths report first audio through the wrapped engine
+        self.engine.on_first_byte = self.on_first_byte
+        if len(text) > self.max_text_chars:
+            self.engine.reproduce(text)
+            return
+
+        key = self._key(text)
+        audio = self.cache.get(key)
+        if self._stopped:
+            return
+        if audio is not None:
+            logging.debug(f"Audio en caché: '{text[:50]}'")
+            self._notify_first_byte()
+            try:
+                self.engine.play(audio)
+                return
+            except NotImplementedError:
+                pass
+        self._stream(text, key)
+
+    def preload(self, text: str) -> None:
+        if len(text) > self.max_text_chars or self._key(text) not in self.cache:
+            self.engine.preload(text)
+
+    def _stream(self, text: str, key: str) -> None:
+        """Miss: stream with the engine, storing the bytes of a repeated sentence."""
+        chunks: Optional[list] = [] if self._repeated(key) else None
+        self.engine.on_audio = chunks.append if chunks is not None else None
+        try:
+            self.engine.reproduce(text)
+        finally:
+            self.engine.on_audio = None
+        if chunks and not self._stopped:
+            self.cache.put(key, b"".join(chunks))
+
+    def _repeated(self, key: str) -> bool:
+        seen = key in self._seen
+        self._seen[key] = None
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        return seen
+
+    def prerender(self, phrases: Iterable[str]) -> int:
+        """Render and store phrases missing from the cache. Returns how many."""
+        rendered = 0
+        for phrase in phrases:
+            key = self._key(phrase)
+            if key in self.cache:
+                continue
+            try:
+                self.cache.put(key, self.engine.synthesize(phrase))
+                rendered += 1
+            except NotImplementedError:
+                return rendered
+            except Exception as e:  # noqa: BLE001 - keep going with the rest
+                logging.warning(f"No se pudo pre-renderizar '{phrase[:30]}': {e}")
+        logging.info(f"Frases pre-renderizadas en caché: {rendered}")
+        return rendered
+
+    def snapshot(self) -> dict:
+        snapshot = {"cache_hits": self.cache.hits, "cache_misses": self.cache.misses}
+        if hasattr(self.engine, "snapshot"):
+            snapshot.update(self.engine.snapshot())
+        return snapshot
+
+    def stop(self) -> None:
+        self._stopped = True
+        self.engine.stop()
+
+    def start_utterance(self) -> None:
+        super().start_utterance()
+        self.engine.start_utterance()
+
+    def close(self) -> None:
+        self.engine.close()
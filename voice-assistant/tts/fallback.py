@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from .base import BaseTTS
+
+
+class _Abandoned(Exception):
+    """Raised inside the primary engine once the fallback has taken over."""
+
+
+class FallbackTTS(BaseTTS):
+    """Races a network engine against a deadline and falls back to a local one.
+
+    reproduce() runs primary.reproduce() in a worker thread and waits for its
+    first audio byte (on_first_byte). If it does not arrive within
+    first_byte_timeout_s, or the primary fails before producing audio, the
+    primary is stopped and the text is spoken by the fallback engine (Piper),
+    so time to first audio is bounded by the deadline plus one local synthesis
+    chunk. Once the primary has started producing audio the utterance is left
+    to it (no voice switch mid-sentence).
+
+    After a fallback the local engine keeps answering for sticky_s seconds
+    (the rest of the answer keeps one voice and the network is not charged the
+    deadline on every sentence); a primary still stuck on an abandoned request
+    is never reused until it returns. The fallback engine is warmed up again
+    every keep_warm_s seconds of inactivity so the switch stays cheap.
+
+    - primary: streaming engine (usually CachedTTS(OpenAITTS)). The deadline
+      is timed against its on_first_byte, which must fire with the first
+      streamed audio: CachedTTS forwards it to OpenAITTS on a miss (streamed,
+      not downloaded first) and fires it at once on a hit.
+    - fallback: local engine, loaded in memory (PiperTTS).
+    """
+
+    def __init__(
+        self,
+        primary: BaseTTS,
+        fallback: BaseTTS,
+        first_byte_timeout_s: float = 1.5,
+        sticky_s: float = 30.0,
+        keep_warm_s: Optional[float] = 300.0,
+    ) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.first_byte_timeout_s = first_byte_timeout_s
+        self.sticky_s = sticky_s
+        self.keep_warm_s = keep_warm_s
+        self.stats = {"primary": 0, "fallback_timeout": 0, "fallback_error": 0, "fallback_sticky": 0}
+        self.last_first_byte_ms: Optional[float] = None
+        self._sticky_until = 0.0
+        self._primary_thread: Optional[threading.Thread] = None
+        self._last_use = time.monotonic()
+        self._closed = threading.Event()
+        self._warm_thread: Optional[threading.Thread] = None
+        if keep_warm_s and hasattr(fallback, "warmup"):
+            self._warm_thread = threading.Thread(target=self._keep_warm, name="tts-keep-warm", daemon=True)
+            self._warm_thread.start()
+
+    @property
+    def sample_rate(self) -> int:  # type: ignore[override]
+        return self.primary.sample_rate
+
+    def warmup(self) -> None:
+        if hasattr(self.fallback, "warmup"):
+            self.fallback.warmup()
+
+    def reproduce(self, text: str) -> None:
+        if not text or not text.strip():
+            logging.warning("Texto vacío, no se reproduce nada")
+            return
+        if self._stopped:
+            return  # stop() llegó antes de empezar la frase
+        self._last_use = time.monotonic()
+        t0 = time.perf_counter()
+
+        busy = self._primary_thread is not None and self._primary_thread.is_alive()
+        if busy or time.monotonic() < self._sticky_until:
+            self._count("fallback_sticky")
+            self._speak_fallback(text, t0)
+            return
+
+        first_byte = threading.Event()
+        done = threading.Event()
+        lock = threading.Lock()
+        state = {"abandoned": False, "error": None}
+
+        def on_first_byte() -> None:
+            with lock:
+                if state["abandoned"]:
+                    raise _Abandoned()
+                first_byte.set()
+            self.last_first_byte_ms = round((time.perf_counter() - t0) * 1000, 1)
+            self._notify_first_byte()
+
+        def run() -> None:
+            try:
+                self.primary.reproduce(text)
+            except _Abandoned:
+                pass
+            except Exception as e:  # noqa: BLE001 - decided below
+                state["error"] = e
+            finally:
+                done.set()
+
+        self.primary.on_first_byte = on_first_byte
+        thread = threading.Thread(target=run, name="tts-primary", daemon=True)
+        self._primary_thread = thread
+        thread.start()
+
+        deadline = time.monotonic() + self.first_byte_timeout_s
+        while not first_byte.is_set() and not done.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopped:
+                break
+            first_byte.wait(min(remaining, 0.02))
+
+        with lock:
+            started = first_byte.is_set()
+            if not started:
+                state["abandoned"] = True
+
+        if started:
+            self._count("primary")
+            thread.join()
+            if state["error"] is not None:
+                raise state["error"]
+            return
+
+        self.primary.stop()
+        if self._stopped:
+            return
+        if done.is_set() and state["error"] is None:
+            return  # terminó sin audio (p. ej. texto vacío tras limpiar)
+        reason = "fallback_error" if state["error"] is not None else "fallback_timeout"
+        if state["error"] is not None:
+            logging.warning(f"TTS principal falló ({state['error']}); usando voz local")
+        else:
+            logging.warning(
+                f"TTS principal sin audio en {self.first_byte_timeout_s * 1000:.0f} ms; usando voz local"
+            )
+        self._count(reason)
+        self._sticky_until = time.monotonic() + self.sticky_s
+        self._speak_fallback(text, t0)
+
+    def preload(self, text: str) -> None:
+        # Mientras dure la voz local la frase no irá a la red
+        busy = self._primary_thread is not None and self._primary_thread.is_alive()
+        if not busy and time.monotonic() >= self._sticky_until:
+            self.primary.preload(text)
+
+    def _speak_fallback(self, text: str, t0: float) -> None:
+        def on_first_byte() -> None:
+            self.last_first_byte_ms = round((time.perf_counter() - t0) * 1000, 1)
+            self._notify_first_byte()
+
+        self.fallback.on_first_byte = on_first_byte
+        self.fallback.reproduce(text)
+
+    def _count(self, name: str) -> None:
+        self.stats[name] += 1
+
+    def snapshot(self) -> dict:
+        snapshot = {**self.stats, "first_byte_ms": self.last_first_byte_ms}
+        if hasattr(self.primary, "snapshot"):
+            # Formato, bytes y tiempo hasta el primer audio de OpenAI
+            snapshot.update({f"remote_{k}": v for k, v in self.primary.snapshot().items()})
+        if hasattr(self.fallback, "snapshot"):
+            # RTF y esperas de la voz local (última frase que dijo)
+            snapshot.update({f"local_{k}": v for k, v in self.fallback.snapshot().items()})
+        return snapshot
+
+    def _keep_warm(self) -> None:
+        while not self._closed.wait(self.keep_warm_s):
+            if time.monotonic() - self._last_use < self.keep_warm_s:
+                continue
+            try:
+                self.fallback.warmup()
+            except Exception as e:  # noqa: BLE001
+                logging.debug(f"Warm-up de la voz local fallido: {e}")
+
+    def stop(self) -> None:
+        self._stopped = True
+        self.primary.stop()
+        self.fallback.stop()
+
+    def start_utterance(self) -> None:
+        super().start_utterance()
+        # Un hilo principal abandonado sigue parado hasta que termine
+        if self._primary_thread is None or not self._primary_thread.is_alive():
+            self.primary.start_utterance()
+        self.fallback.start_utterance()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.primary.close()
+        self.fallback.close()
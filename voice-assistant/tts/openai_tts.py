@@ -3,12 +3,31 @@ from __future__ import annotations
 import json
 import logging
 import os
+import re
 import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
 import requests
 
 from .base import BaseTTS
+from .opus import OPUS_DECODE_RATES, OPUS_SAMPLE_RATE, OggOpusDecoder, opus_available
+from .playback import PlaybackSink, ProcessOutput, SinkOutput
+
+# Raw PCM returned by the API for response_format="pcm"
+PCM_SAMPLE_RATE = 24000
+
+# Demuxer explícito para ffplay: sin él, ffplay analiza el stream antes de sonar
+_FFPLAY_INPUT = {
+    "mp3": ["-f", "mp3"],
+    "opus": ["-f", "ogg"],
+    "pcm": ["-f", "s16le", "-ar", str(PCM_SAMPLE_RATE), "-ac", "1"],
+}
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
 
 
 class OpenAITTS(BaseTTS):
@@ -18,6 +37,22 @@ class OpenAITTS(BaseTTS):
     - Streams compressed audio (mp3 by default) to ffplay for low-latency playback.
     - Requires OPENAI_API_KEY in environment or passed via constructor.
     - sample_rate is not enforced (compressed stream). Kept for interface compatibility.
+    - Multi-sentence text is split into segments; up to `prefetch` upcoming
+      segments are synthesized concurrently while the current one plays, and all
+      of them are fed in order to a single ffplay process (prefetch=0 disables).
+    - Across calls, preload(text) downloads the next sentence while the
+      current one plays (the pipeline passes one sentence per call); the
+      following reproduce(text) plays it without a new round trip. At most
+      `prefetch` sentences are kept; stop() drops them.
+    - Requests go through a keep-alive session; pass the shared HTTPPool session
+      so connections are reused and can be pre-warmed.
+    - With a PlaybackSink, audio is decoded and played in-process instead of
+      spawning ffplay: stream_format="pcm" (raw 24 kHz, no decoding, ~48 KB/s)
+      or "opus" (Ogg/Opus decoded incrementally with opuslib, a fraction of
+      the bytes). Playback starts with the first decoded buffer.
+    - last_stats: per utterance time to first byte and to first decoded audio,
+      bytes on the wire and audio seconds; snapshot() adds running averages
+      per format to compare deployments.
     """
 
     def __init__(
@@ -30,6 +65,11 @@ class OpenAITTS(BaseTTS):
         endpoint: str = "https://api.openai.com/v1/audio/speech",
         chunk_size: int = 8192,
         timeout: int = 60,
+        prefetch: int = 2,
+        min_segment_chars: int = 40,
+        session: Optional[requests.Session] = None,
+        sink: Optional[PlaybackSink] = None,
+        stream_format: str = "pcm",
     ) -> None:
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model
@@ -38,74 +78,311 @@ class OpenAITTS(BaseTTS):
         self.endpoint = endpoint
         self.chunk_size = chunk_size
         self.timeout = timeout
+        self.prefetch = max(0, prefetch)
+        self.min_segment_chars = min_segment_chars
         self.sample_rate = 16000
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._preloaded: "OrderedDict[str, Future]" = OrderedDict()  # texto -> descarga
+        self._preload_lock = threading.Lock()
+        # Keep-alive session (shared HTTPPool session when provided)
+        self.session = session or requests.Session()
+        self.sink = sink
+        if stream_format == "opus" and not opus_available():
+            logging.warning("opuslib no disponible; se usa PCM para el streaming")
+            stream_format = "pcm"
+        self.stream_format = stream_format
+        self.last_stats: dict = {}
+        self.format_stats: dict[str, dict] = {}
 
         if not self.api_key:
             logging.warning(
                 "OPENAI_API_KEY no encontrado; OpenAITTS no podrá reproducir."
             )
 
-    def reproduce(self, text: str) -> None:
-        if not text or not text.strip():
-            logging.warning("Texto vacío, no se reproduce nada")
-            return
+    def _request(self, text: str):
+        """Start a streaming synthesis request for `text`."""
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "model": self.model,
+            "voice": self.voice,
+            "input": text.strip(),
+            "response_format": self._format(),
+        }
+        r = self.session.post(
+            self.endpoint,
+            headers=headers,
+            data=json.dumps(payload),
+            stream=True,
+            timeout=self.timeout,
+        )
+        r.raise_for_status()
+        return r
 
-        if not self.api_key:
-            raise RuntimeError("OPENAI_API_KEY no configurado")
+    def _fetch(self, text: str) -> bytes:
+        """Download the complete audio for `text` (used for prefetching)."""
+        with self._request(text) as r:
+            return r.content
+
+    def _format(self) -> str:
+        # The shared sink plays PCM decoded in-process (raw or from Opus)
+        return self.stream_format if self.sink is not None else self.audio_format
 
+    def _open_output(self) -> "_StreamOutput":
+        fmt = self._format()
+        if self.sink is not None:
+            if fmt == "opus":
+                # Se decodifica ya a la frecuencia del sink, sin remuestrear
+                rate = self.sink.sample_rate if self.sink.sample_rate in OPUS_DECODE_RATES else OPUS_SAMPLE_RATE
+                return _StreamOutput(SinkOutput(self.sink, rate), fmt, rate, OggOpusDecoder(sample_rate=rate))
+            return _StreamOutput(SinkOutput(self.sink, PCM_SAMPLE_RATE), fmt, PCM_SAMPLE_RATE)
         # Prepare playback process (ffplay reads from stdin)
         try:
-            ffplay = subprocess.Popen(
+            return _StreamOutput(ProcessOutput(subprocess.Popen(
                 [
                     "ffplay",
                     "-nodisp",
                     "-autoexit",
                     "-loglevel",
                     "quiet",
+                    "-fflags",
+                    "nobuffer",
+                    *_FFPLAY_INPUT.get(fmt, []),
                     "-",
                 ],
                 stdin=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-            )
+            )), fmt)
         except FileNotFoundError as e:
             raise RuntimeError(
                 "ffplay no encontrado. Instala ffmpeg o ajusta el reproductor."
             ) from e
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "model": self.model,
-            "voice": self.voice,
-            "input": text.strip(),
-            "format": self.audio_format,
-        }
+    def reproduce(self, text: str) -> None:
+        if not text or not text.strip():
+            logging.warning("Texto vacío, no se reproduce nada")
+            return
+
+        if not self.api_key:
+            raise RuntimeError("OPENAI_API_KEY no configurado")
+
+        preloaded = self._take_preloaded(text)
+        segments = _split_segments(text.strip(), self.min_segment_chars)
+        output = self._start_output(self._open_output())
+        output.on_first_audio = self._notify_first_byte
+        output.on_wire = self._emit_audio
+        pending: dict[int, Future] = {}
+
+        try:
+            if preloaded is not None:
+                # Descargada mientras sonaba la frase anterior
+                segments = []
+                if not self._stopped:
+                    output.write(preloaded)
+            # The first segment streams straight to the output; the following ones
+            # are downloaded in the background, at most `prefetch` ahead.
+            for i in range(1, min(len(segments), 1 + self.prefetch)):
+                pending[i] = self._executor().submit(self._fetch, segments[i])
+
+            if segments:
+                with self._request(segments[0]) as r:
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        if self._stopped:
+                            break
+                        if chunk:
+                            output.write(chunk)
+
+            for i in range(1, len(segments)):
+                if self._stopped:
+                    break
+                future = pending.pop(i, None)
+                audio = future.result() if future else self._fetch(segments[i])
+                nxt = i + self.prefetch
+                if nxt < len(segments):
+                    pending[nxt] = self._executor().submit(self._fetch, segments[nxt])
+                output.write(audio)
+
+            if self._stopped:
+                for future in pending.values():
+                    future.cancel()
+                logging.info("Reproducción interrumpida (OpenAI)")
+                return
+            output.finish()
+            self._record(output.stats())
+            logging.info(f"Audio reproducido (OpenAI): '{text[:50]}...' {self.last_stats}")
+        except Exception as e:  # noqa: BLE001
+            for future in pending.values():
+                future.cancel()
+            if self._stopped:
+                # stop() cerró la salida mientras escribíamos
+                return
+            logging.error(f"Error en reproducción OpenAI TTS: {e}")
+            output.abort()
+            raise
+        finally:
+            self._output = None
 
+    def preload(self, text: str) -> None:
+        text = text.strip()
+        if not text or not self.api_key or self.prefetch == 0:
+            return
+        with self._preload_lock:
+            if text in self._preloaded:
+                return
+            self._preloaded[text] = self._executor().submit(self._fetch, text)
+            while len(self._preloaded) > self.prefetch:
+                self._preloaded.popitem(last=False)[1].cancel()
+
+    def _take_preloaded(self, text: str) -> Optional[bytes]:
+        """Audio preloaded for `text`, waiting for it if still downloading."""
+        with self._preload_lock:
+            future = self._preloaded.pop(text.strip(), None)
+        if future is None or future.cancelled():
+            return None
         try:
-            with requests.post(
-                self.endpoint,
-                headers=headers,
-                data=json.dumps(payload),
-                stream=True,
-                timeout=self.timeout,
-            ) as r:
-                r.raise_for_status()
-                for chunk in r.iter_content(chunk_size=self.chunk_size):
-                    if chunk:
-                        # mypy: ignore[union-attr] for stdin Optional
-                        ffplay.stdin.write(chunk)  # type: ignore[union-attr]
-
-            # Close stdin to signal EOF to ffplay and wait for it to finish
-            if ffplay.stdin:
-                ffplay.stdin.close()
-            ffplay.wait()
-            logging.info(f"Audio reproducido (OpenAI): '{text[:50]}...'")
+            return future.result(timeout=self.timeout)
+        except Exception as e:  # noqa: BLE001 - se pide otra vez en streaming
+            logging.warning(f"Precarga de TTS fallida, se repite la petición: {e}")
+            return None
+
+    def stop(self) -> None:
+        with self._preload_lock:
+            for future in self._preloaded.values():
+                future.cancel()
+            self._preloaded.clear()
+        super().stop()
+
+    def synthesize(self, text: str) -> bytes:
+        if not self.api_key:
+            raise RuntimeError("OPENAI_API_KEY no configurado")
+        return self._fetch(text)
+
+    def play(self, audio: bytes) -> None:
+        output = self._start_output(self._open_output())
+        try:
+            if self._stopped:
+                output.abort()  # barge-in mientras se leía el audio
+                return
+            output.write(audio)
+            output.finish()
         except Exception as e:  # noqa: BLE001
+            if self._stopped:
+                return
             logging.error(f"Error en reproducción OpenAI TTS: {e}")
-            ffplay.terminate()
+            output.abort()
             raise
+        finally:
+            self._output = None
+
+    def cache_params(self) -> dict:
+        return {
+            "engine": "openai",
+            "voice": self.voice,
+            "model": self.model,
+            "format": self._format(),
+        }
 
-    def close(self) -> None:  # pragma: no cover - nothing persistent to close
-        pass
+    def _record(self, stats: dict) -> None:
+        self.last_stats = stats
+        totals = self.format_stats.setdefault(
+            stats["format"], {"utterances": 0, "first_audio_ms": 0.0, "wire_bytes": 0, "audio_s": 0.0}
+        )
+        totals["utterances"] += 1
+        totals["first_audio_ms"] += stats["ttfa_ms"] if stats["ttfa_ms"] is not None else stats["ttfb_ms"] or 0.0
+        totals["wire_bytes"] += stats["wire_bytes"]
+        totals["audio_s"] += stats["audio_s"] or 0.0
+
+    def snapshot(self) -> dict:
+        snapshot = {k: v for k, v in self.last_stats.items() if isinstance(v, (int, float))}
+        for fmt, totals in self.format_stats.items():
+            snapshot[f"{fmt}_first_audio_ms_avg"] = round(totals["first_audio_ms"] / totals["utterances"], 1)
+            snapshot[f"{fmt}_wire_bytes_total"] = totals["wire_bytes"]
+            if totals["audio_s"]:
+                snapshot[f"{fmt}_kbps"] = round(totals["wire_bytes"] * 8 / 1000 / totals["audio_s"], 1)
+        return snapshot
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=max(1, self.prefetch), thread_name_prefix="openai-tts"
+            )
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class _StreamOutput:
+    """Output wrapper: optional incremental decoding plus latency/size metrics.
+
+    Network chunks go through the decoder (Opus) or straight through (PCM,
+    or compressed audio for ffplay). on_first_audio fires with the first
+    decoded buffer, which is when the sink can start playing.
+    """
+
+    def __init__(self, output, fmt: str, sample_rate: Optional[int] = None, decoder=None) -> None:
+        self.output = output
+        self.format = fmt
+        self.sample_rate = sample_rate  # None: decodifica ffplay, sin TTFA propio
+        self.decoder = decoder
+        self.on_first_audio = None
+        self.on_wire = None  # recibe los bytes tal como llegan (caché)
+        self.t0 = time.perf_counter()
+        self.first_byte_ms: Optional[float] = None
+        self.first_audio_ms: Optional[float] = None
+        self.wire_bytes = 0
+        self.audio_bytes = 0
+
+    def write(self, data: bytes) -> None:
+        if self.first_byte_ms is None:
+            self.first_byte_ms = round((time.perf_counter() - self.t0) * 1000, 1)
+        self.wire_bytes += len(data)
+        if self.on_wire is not None:
+            self.on_wire(data)
+        pcm = self.decoder.feed(data) if self.decoder is not None else data
+        if not pcm:
+            return
+        self.audio_bytes += len(pcm)
+        if self.first_audio_ms is None:
+            self.first_audio_ms = round((time.perf_counter() - self.t0) * 1000, 1)
+            if self.on_first_audio is not None:
+                self.on_first_audio()
+        self.output.write(pcm)
+
+    def finish(self) -> None:
+        self.output.finish()
+
+    def abort(self) -> None:
+        self.output.abort()
+
+    def stats(self) -> dict:
+        decoded = self.sample_rate is not None
+        return {
+            "format": self.format,
+            "ttfb_ms": self.first_byte_ms,
+            "ttfa_ms": self.first_audio_ms if decoded else None,
+            "wire_bytes": self.wire_bytes,
+            "audio_s": round(self.audio_bytes / 2 / self.sample_rate, 2) if decoded else None,
+        }
+
+
+def _split_segments(text: str, min_chars: int) -> list[str]:
+    """Split text into sentences, merging short ones up to `min_chars`.
+
+    Very short requests cost a full round trip each, so tiny sentences are
+    glued to the next one.
+    """
+    segments: list[str] = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if segments and len(segments[-1]) < min_chars:
+            segments[-1] = f"{segments[-1]} {sentence}"
+        else:
+            segments.append(sentence)
+    return segments or [text]
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import struct
+from typing import Callable, Optional
+
+import numpy as np
+
+# Frecuencia nativa de Opus; el decodificador también entrega estas otras
+OPUS_SAMPLE_RATE = 48000
+OPUS_DECODE_RATES = frozenset({8000, 12000, 16000, 24000, 48000})
+_PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+
+
+def _opuslib_decoder(channels: int, sample_rate: int = OPUS_SAMPLE_RATE):
+    try:
+        import opuslib
+    except ImportError as e:
+        raise RuntimeError("opuslib no instalado: pip install opuslib (y libopus)") from e
+    return opuslib.Decoder(sample_rate, channels)
+
+
+def opus_available() -> bool:
+    try:
+        import opuslib  # noqa: F401
+    except Exception:  # noqa: BLE001 - también falla si falta libopus
+        return False
+    return True
+
+
+class OggOpusDecoder:
+    """Incremental Ogg/Opus -> int16 mono PCM at `sample_rate` (48 kHz by default).
+
+    feed() accepts network chunks of any size and returns the PCM of every
+    Opus packet completed so far, so playback can start with the first audio
+    page instead of waiting for the whole file. Chained streams (one per
+    prefetched segment) are handled: each new stream starts with its own
+    OpusHead and pre-skip. decoder_factory(channels) must return an object
+    with decode(packet, frame_size) -> interleaved int16 bytes (opuslib) at
+    sample_rate. Decoding straight to the playback rate (e.g. 24 kHz) avoids
+    resampling afterwards.
+    """
+
+    def __init__(
+        self,
+        decoder_factory: Optional[Callable[[int], object]] = None,
+        sample_rate: int = OPUS_SAMPLE_RATE,
+    ) -> None:
+        if sample_rate not in OPUS_DECODE_RATES:
+            raise ValueError(f"Opus no decodifica a {sample_rate} Hz")
+        self.sample_rate = sample_rate
+        self.decoder_factory = decoder_factory or (lambda channels: _opuslib_decoder(channels, sample_rate))
+        self._max_frame = sample_rate * 120 // 1000  # el paquete Opus más largo
+        self._buf = bytearray()
+        self._packet = bytearray()
+        self._decoder = None
+        self._header_packets = 0  # paquetes de cabecera pendientes (OpusHead, OpusTags)
+        self._channels = 1
+        self._skip = 0  # muestras de pre-skip aún por descartar
+
+    def feed(self, data: bytes) -> bytes:
+        self._buf += data
+        out = bytearray()
+        while True:
+            page = self._next_page()
+            if page is None:
+                return bytes(out)
+            header_type, lacing, body = page
+            if header_type & 0x02:  # inicio de un stream lógico nuevo
+                self._header_packets = 2
+                self._packet.clear()
+            offset = 0
+            for size in lacing:
+                self._packet += body[offset:offset + size]
+                offset += size
+                if size < 255:
+                    out += self._on_packet(bytes(self._packet))
+                    self._packet.clear()
+
+    def _next_page(self) -> Optional[tuple]:
+        if len(self._buf) < _PAGE_HEADER.size:
+            return None
+        if self._buf[:4] != b"OggS":
+            start = self._buf.find(b"OggS")
+            del self._buf[: start if start >= 0 else len(self._buf) - 3]
+            if len(self._buf) < _PAGE_HEADER.size:
+                return None
+        fields = _PAGE_HEADER.unpack_from(self._buf)
+        header_type, n_segments = fields[2], fields[7]
+        table_end = _PAGE_HEADER.size + n_segments
+        if len(self._buf) < table_end:
+            return None
+        lacing = bytes(self._buf[_PAGE_HEADER.size:table_end])
+        page_end = table_end + sum(lacing)
+        if len(self._buf) < page_end:
+            return None
+        body = bytes(self._buf[table_end:page_end])
+        del self._buf[:page_end]
+        return header_type, lacing, body
+
+    def _on_packet(self, packet: bytes) -> bytes:
+        if self._header_packets == 2:
+            self._header_packets = 1
+            if packet[:8] == b"OpusHead":
+                self._channels = packet[9]
+                # El pre-skip va en muestras de 48 kHz
+                self._skip = struct.unpack_from("<H", packet, 10)[0] * self.sample_rate // OPUS_SAMPLE_RATE
+                self._decoder = self.decoder_factory(self._channels)
+            return b""
+        if self._header_packets == 1:
+            self._header_packets = 0  # OpusTags
+            return b""
+        if self._decoder is None or not packet:
+            return b""
+        samples = np.frombuffer(self._decoder.decode(packet, self._max_frame), dtype=np.int16)
+        if self._channels > 1:
+            samples = samples.reshape(-1, self._channels).mean(axis=1).astype(np.int16)
+        if self._skip:
+            dropped = min(self._skip, len(samples))
+            samples = samples[dropped:]
+            self._skip -= dropped
+        return samples.tobytes()
@@ -2,30 +2,66 @@ from __future__ import annotations
 
 import logging
 import os
+import queue
 import subprocess
+import threading
+import time
 from typing import Optional
 
 from piper.voice import PiperVoice
 
 from .base import BaseTTS
+from .playback import PlaybackSink, ProcessOutput, SinkOutput
+
+
+_DONE = object()  # fin de la síntesis en la cola de lectura anticipada
 
 
 class PiperTTS(BaseTTS):
     """TTS engine using Piper.
 
     Mirrors previous TTSEngine behavior for backward compatibility.
+
+    - reproduce() synthesizes in a producer thread up to `read_ahead` chunks
+      (sentences) ahead of playback, so synthesis of the next sentence
+      overlaps with playback of the current one instead of alternating.
+    - intra_op_threads / inter_op_threads: ONNX Runtime session options; when
+      set, the model session is recreated with them (e.g. 3 threads on a Pi 4
+      leaves one core for capture and wake word).
+    - warmup_on_load: run a short synthesis at load so the first answer does
+      not pay for ONNX initialization.
+    - low_memory: session without ONNX Runtime's memory arena, memory pattern
+      planning and weight prepacking (lower peak and steady RSS for a slightly
+      slower synthesis). With a .ort model the initializers point into the
+      model buffer instead of being copied.
+    - last_stats: per-utterance real-time factor (synthesis time / audio
+      time), time to first chunk and how often playback waited for synthesis.
     """
 
     def __init__(
         self,
         model_path: str = "models/piper/es_ES-mls_10246-low.onnx",
         config_path: str = "models/piper/es_ES-mls_10246-low.onnx.json",
+        sink: Optional[PlaybackSink] = None,
+        read_ahead: int = 4,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        warmup_on_load: bool = True,
+        low_memory: bool = False,
     ) -> None:
         self.model_path = model_path
         self.config_path = config_path
         self.voice: Optional[PiperVoice] = None
         self.sample_rate: int = 16000
+        self.sink = sink  # salida compartida en proceso (None = aplay)
+        self.read_ahead = max(1, read_ahead)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.low_memory = low_memory
+        self.last_stats: dict = {}
         self._load_voice()
+        if warmup_on_load:
+            self.warmup()
 
     def _load_voice(self) -> None:
         try:
@@ -33,12 +69,52 @@ class PiperTTS(BaseTTS):
                 raise FileNotFoundError(f"Modelo no encontrado: {self.model_path}")
 
             self.voice = PiperVoice.load(self.model_path, config_path=self.config_path)
+            if self.intra_op_threads or self.inter_op_threads or self.low_memory:
+                self._configure_session()
             self.sample_rate = getattr(self.voice, "sample_rate", 16000)
             logging.info(f"Modelo TTS cargado: {self.model_path}")
         except Exception as e:  # noqa: BLE001 - propagate as runtime error
             logging.error(f"Error cargando modelo TTS: {e}")
             raise
 
+    def _configure_session(self) -> None:
+        """Recreate the ONNX session with the configured threads and memory options."""
+        import onnxruntime
+
+        session = getattr(self.voice, "session", None)
+        if session is None:
+            logging.warning("Esta versión de Piper no expone la sesión ONNX; opciones ignoradas")
+            return
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            options.inter_op_num_threads = self.inter_op_threads
+        if self.low_memory:
+            options.enable_cpu_mem_arena = False
+            options.enable_mem_pattern = False
+            options.add_session_config_entry("session.disable_prepacking", "1")
+            if self.model_path.endswith(".ort"):
+                options.add_session_config_entry("session.use_ort_model_bytes_directly", "1")
+                options.add_session_config_entry("session.use_ort_model_bytes_for_initializers", "1")
+        # Sin referencias a la sesión original antes de crear la nueva (pico de memoria)
+        providers = session.get_providers()
+        self.voice.session = session = None
+        self.voice.session = onnxruntime.InferenceSession(
+            self.model_path, sess_options=options, providers=providers
+        )
+        logging.info(
+            f"Sesión ONNX de Piper: intra_op={self.intra_op_threads}, inter_op={self.inter_op_threads}, "
+            f"low_memory={self.low_memory}"
+        )
+
+    def warmup(self) -> None:
+        """Synthesize a short phrase so the first answer skips ONNX initialization."""
+        if self.voice is not None:
+            for _ in self.voice.synthesize("Hola."):
+                pass
+
     def reproduce(self, text: str) -> None:
         if not self.voice:
             raise RuntimeError("Modelo TTS no está cargado")
@@ -47,22 +123,122 @@ class PiperTTS(BaseTTS):
             logging.warning("Texto vacío, no se reproduce nada")
             return
 
-        aplay = None
+        output = None
+        chunks: queue.Queue = queue.Queue(maxsize=self.read_ahead)
+        synth = {"s": 0.0, "bytes": 0}
+        cancel = threading.Event()
+        t0 = time.perf_counter()
+        producer = threading.Thread(
+            target=self._read_ahead, args=(text.strip(), chunks, synth, cancel), name="piper-synth", daemon=True
+        )
         try:
-            aplay = subprocess.Popen(
-                ["aplay", "-q", "-f", "S16_LE", "-r", str(self.sample_rate), "-c", "1"],
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
+            output = self._start_output(self._open_output())
+            producer.start()
+            first_chunk_ms = None
+            starved = 0
 
-            for chunk in self.voice.synthesize(text.strip()):
-                aplay.stdin.write(chunk.audio_int16_bytes)  # type: ignore[union-attr]
+            while True:
+                try:
+                    item = chunks.get_nowait()
+                except queue.Empty:
+                    if first_chunk_ms is not None:
+                        starved += 1  # la reproducción espera a la síntesis
+                    item = chunks.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if self._stopped:
+                    logging.info("Reproducción interrumpida")
+                    return
+                if first_chunk_ms is None:
+                    first_chunk_ms = round((time.perf_counter() - t0) * 1000, 1)
+                    self._notify_first_byte()
+                output.write(item)
+                self._emit_audio(item)
 
-            aplay.stdin.close()  # type: ignore[union-attr]
-            aplay.wait()
+            output.finish()
 
-            logging.info(f"Audio reproducido: '{text[:50]}...'")
+            audio_s = synth["bytes"] / 2 / self.sample_rate
+            self.last_stats = {
+                "rtf": round(synth["s"] / audio_s, 3) if audio_s else None,
+                "first_chunk_ms": first_chunk_ms,
+                "audio_s": round(audio_s, 2),
+                "starved": starved,
+            }
+            logging.info(f"Audio reproducido: '{text[:50]}...' (RTF {self.last_stats['rtf']})")
         except Exception as e:  # noqa: BLE001
+            if self._stopped:
+                return
             logging.error(f"Error reproduciendo audio: {e}")
-            if aplay is not None:
-                aplay.terminate()
+            if output is not None:
+                output.abort()
+        finally:
+            self._output = None
+            # Detiene al productor y lo desbloquea si espera hueco en la cola
+            cancel.set()
+            while producer.is_alive():
+                try:
+                    chunks.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+
+    def _read_ahead(self, text: str, chunks: queue.Queue, synth: dict, cancel: threading.Event) -> None:
+        """Producer: synthesize chunks into the bounded queue until done or stopped."""
+        try:
+            t = time.perf_counter()
+            for chunk in self.voice.synthesize(text):
+                synth["s"] += time.perf_counter() - t
+                synth["bytes"] += len(chunk.audio_int16_bytes)
+                if self._stopped or cancel.is_set():
+                    break
+                chunks.put(chunk.audio_int16_bytes)
+                t = time.perf_counter()
+            chunks.put(_DONE)
+        except Exception as e:  # noqa: BLE001 - se relanza en el consumidor
+            chunks.put(e)
+
+    def snapshot(self) -> dict:
+        return {k: v for k, v in self.last_stats.items() if v is not None}
+
+    def _open_output(self):
+        if self.sink is not None:
+            return SinkOutput(self.sink, self.sample_rate)
+        return ProcessOutput(subprocess.Popen(
+            ["aplay", "-q", "-f", "S16_LE", "-r", str(self.sample_rate), "-c", "1"],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        ))
+
+    def synthesize(self, text: str) -> bytes:
+        if not self.voice:
+            raise RuntimeError("Modelo TTS no está cargado")
+        return b"".join(
+            chunk.audio_int16_bytes for chunk in self.voice.synthesize(text.strip())
+        )
+
+    def play(self, audio: bytes) -> None:
+        output = None
+        try:
+            output = self._start_output(self._open_output())
+            if self._stopped:
+                output.abort()
+                return
+            output.write(audio)
+            output.finish()
+        except Exception as e:  # noqa: BLE001
+            if self._stopped:
+                return
+            logging.error(f"Error reproduciendo audio: {e}")
+            if output is not None:
+                output.abort()
+        finally:
+            self._output = None
+
+    def cache_params(self) -> dict:
+        return {
+            "engine": "piper",
+            "voice": os.path.basename(self.model_path),
+            "model": self.model_path,
+            "format": f"s16le-{self.sample_rate}",
+        }
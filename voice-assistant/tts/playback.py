@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import logging
+import subprocess
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import sounddevice as sd
+
+
+class PlaybackSink:
+    """Persistent in-process audio output shared by every TTS engine.
+
+    One sounddevice output stream stays open; engines push int16 mono PCM with
+    write() and the stream callback drains it. Avoids spawning ffplay/aplay per
+    utterance. Audio at a different rate goes through a streaming Resampler
+    whose state lasts the whole utterance (begin() to end()).
+
+    Metrics:
+    - last_ttfs_ms: time from begin() to the first sample handed to the device.
+    - underruns: callbacks that ran out of audio while an utterance was still
+      being produced.
+    - last_interrupt_ms: time from stop() to the first silent device buffer;
+      wait_silent() returns the moment that buffer was handed to the device.
+    """
+
+    def __init__(self, sample_rate: int = 24000, block_ms: int = 20, device=None) -> None:
+        self.sample_rate = sample_rate
+        self.block_samples = sample_rate * block_ms // 1000
+        self.device = device
+
+        self._buf = bytearray()
+        self._cond = threading.Condition()
+        self._stream = None
+        self._producing = False  # an engine is still writing the utterance
+        self._resampler: Optional[Resampler] = None
+        self._t_begin: Optional[float] = None
+
+        self.underruns = 0
+        self.last_ttfs_ms: Optional[float] = None
+        self.last_interrupt_ms: Optional[float] = None
+        self._t_stop: Optional[float] = None
+        self._silent_at: Optional[float] = None
+        # Hook called (from the audio thread) when an utterance starts sounding
+        self.on_first_sample: Optional[Callable[[], None]] = None
+
+    def start(self) -> None:
+        """Open the output stream (idempotent)."""
+        if self._stream is not None:
+            return
+        self._stream = sd.RawOutputStream(
+            samplerate=self.sample_rate,
+            blocksize=self.block_samples,
+            dtype="int16",
+            channels=1,
+            device=self.device,
+            callback=self._callback,
+        )
+        self._stream.start()
+        logging.info(f"Salida de audio abierta ({self.sample_rate} Hz)")
+
+    def close(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+    def begin(self) -> None:
+        """Mark the start of an utterance (for time-to-first-sample)."""
+        with self._cond:
+            self._producing = True
+            self._t_begin = time.perf_counter()
+            self._resampler = None
+
+    def write(self, pcm: bytes, sample_rate: Optional[int] = None) -> None:
+        """Queue int16 mono PCM for playback."""
+        if sample_rate and sample_rate != self.sample_rate:
+            resampler = self._resampler
+            if resampler is None or resampler.src_rate != sample_rate:
+                resampler = self._resampler = Resampler(sample_rate, self.sample_rate)
+            pcm = resampler.process(pcm)
+        with self._cond:
+            self._buf += pcm
+
+    def end(self) -> None:
+        """Mark that the current utterance has been fully written."""
+        resampler, self._resampler = self._resampler, None
+        tail = resampler.flush() if resampler is not None else b""
+        with self._cond:
+            self._buf += tail
+            self._producing = False
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything written has been played."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._buf and not self._producing, timeout
+            )
+
+    def stop(self) -> None:
+        """Drop any queued audio immediately."""
+        with self._cond:
+            now = time.perf_counter()
+            if self._buf:
+                self._t_stop, self._silent_at = now, None
+            elif self._t_stop is None:
+                self._silent_at = now  # no quedaba audio en cola
+            self._buf.clear()
+            self._producing = False
+            self._t_begin = None
+            self._resampler = None
+            self._cond.notify_all()
+
+    def wait_silent(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Block until the device gets silence after stop().
+
+        Returns the perf_counter() time of the first silent buffer, or None on
+        timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._t_stop is None, timeout):
+                return None
+            return self._silent_at
+
+    @property
+    def playing(self) -> bool:
+        with self._cond:
+            return bool(self._buf) or self._producing
+
+    def snapshot(self) -> dict:
+        return {
+            "underruns": self.underruns,
+            "ttfs_ms": self.last_ttfs_ms,
+            "interrupt_ms": self.last_interrupt_ms,
+        }
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        if status:
+            logging.debug(f"Estado de salida de audio: {status}")
+        n = frames * 2
+        first = False
+        with self._cond:
+            chunk = bytes(self._buf[:n])
+            del self._buf[:n]
+            if chunk and self._t_begin is not None:
+                self.last_ttfs_ms = (time.perf_counter() - self._t_begin) * 1000
+                self._t_begin = None
+                first = True
+            if len(chunk) < n and self._producing and self._t_begin is None:
+                self.underruns += 1
+            if self._t_stop is not None:
+                self._silent_at = time.perf_counter()
+                self.last_interrupt_ms = (self._silent_at - self._t_stop) * 1000
+                self._t_stop = None
+            if not self._buf:
+                self._cond.notify_all()
+        outdata[: len(chunk)] = chunk
+        outdata[len(chunk):] = b"\x00" * (n - len(chunk))
+        if first and self.on_first_sample is not None:
+            self.on_first_sample()
+
+
+class Resampler:
+    """Streaming windowed-sinc resampler for int16 mono PCM.
+
+    The input tail and the fractional phase are kept between process() calls,
+    so chunk boundaries leave no clicks, and the kernel low-passes below the
+    lower of both Nyquist frequencies, so decimating (48 -> 24 kHz) does not
+    alias. Each output needs `half` input samples ahead: those are held back
+    until the next chunk or flush().
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, zero_crossings: int = 8) -> None:
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.step = src_rate / dst_rate  # muestras de entrada por muestra de salida
+        self.cutoff = min(1.0, dst_rate / src_rate)
+        self.half = int(np.ceil(zero_crossings / self.cutoff))
+        self._taps = np.arange(-self.half + 1, self.half + 1)
+        self.reset()
+
+    def reset(self) -> None:
+        self._buf = np.zeros(self.half, dtype=np.float32)  # silencio antes del audio
+        self._start = -self.half  # índice de entrada de _buf[0]
+        self._received = 0  # muestras de entrada recibidas
+        self._emitted = 0  # muestras de salida entregadas
+
+    def process(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        self._buf = np.concatenate([self._buf, samples])
+        self._received += len(samples)
+        return self._render(self._received - self.half)
+
+    def flush(self) -> bytes:
+        """Emit the held-back tail (padding with silence) and start over."""
+        self._buf = np.concatenate([self._buf, np.zeros(self.half, dtype=np.float32)])
+        out = self._render(self._received)
+        self.reset()
+        return out
+
+    def _render(self, limit: int) -> bytes:
+        """Outputs for every input instant before `limit`."""
+        # Contando en enteros la fase no acumula error de redondeo entre trozos
+        total = max(0, -(-limit * self.dst_rate // self.src_rate))
+        if total <= self._emitted:
+            return b""
+        t = np.arange(self._emitted, total) * self.step - self._start
+        idx = np.floor(t).astype(np.int64)[:, None] + self._taps[None, :]
+        u = t[:, None] - idx
+        weights = self.cutoff * np.sinc(self.cutoff * u) * (0.5 + 0.5 * np.cos(np.pi * u / self.half))
+        weights /= weights.sum(axis=1, keepdims=True)
+        out = (self._buf[idx] * weights).sum(axis=1)
+        self._emitted = total
+        # Solo se conserva lo que aún necesita el filtro
+        drop = max(0, int(np.floor(total * self.step - self._start)) - self.half + 1)
+        self._buf = self._buf[drop:]
+        self._start += drop
+        return np.clip(np.round(out), -32768, 32767).astype(np.int16).tobytes()
+
+
+class ProcessOutput:
+    """Audio output through an external player reading stdin (ffplay/aplay)."""
+
+    def __init__(self, process: subprocess.Popen) -> None:
+        self.process = process
+
+    def write(self, data: bytes) -> None:
+        self.process.stdin.write(data)  # type: ignore[union-attr]
+
+    def finish(self) -> None:
+        # Close stdin to signal EOF to the player and wait for it to finish
+        if self.process.stdin:
+            self.process.stdin.close()
+        self.process.wait()
+
+    def abort(self) -> None:
+        self.process.terminate()
+
+
+class SinkOutput:
+    """Audio output into a shared PlaybackSink (raw int16 PCM)."""
+
+    def __init__(self, sink: PlaybackSink, sample_rate: int) -> None:
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self._rest = b""  # odd trailing byte from a network chunk
+        sink.begin()
+
+    def write(self, data: bytes) -> None:
+        data = self._rest + data
+        cut = len(data) - len(data) % 2
+        self._rest = data[cut:]
+        if cut:
+            self.sink.write(data[:cut], self.sample_rate)
+
+    def finish(self) -> None:
+        self.sink.end()
+        self.sink.wait()
+
+    def abort(self) -> None:
+        self.sink.stop()
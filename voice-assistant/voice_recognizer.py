@@ -1,17 +1,218 @@
 import collections
+import contextlib
+import copy
 import json
 import logging
 import queue
+import time
+from typing import Optional
 
+import numpy as np
 import sounddevice as sd
 import webrtcvad
 from vosk import Model, KaldiRecognizer, SetLogLevel
 
+import tracing
+
 logger = logging.getLogger(__name__)
 
 # Silenciar los logs de Vosk
 SetLogLevel(-1)
 
+# Palabras tras las que una frase casi nunca termina ("pon música de...")
+_CONTINUATION_WORDS = frozenset(
+    "a al con de del desde el en entre la las lo los me mi o para pero por "
+    "que qué se su sus te tu un una y".split()
+)
+
+
+class Endpointer:
+    """Adaptive end-of-speech decision for one recording session.
+
+    Combines three signals instead of a single fixed silence timeout:
+    - an energy gate over a per-session noise floor (estimated from the
+      non-speech preroll frames), so background noise the VAD flags as speech
+      does not keep the recording open;
+    - the Vosk partial result staying unchanged during the trailing silence;
+    - the partial looking like a complete sentence (not ending in "de", "y"...).
+
+    The required trailing silence goes from max_silence_ms (no signal) down to
+    min_silence_ms (stable and complete). Recordings are cut at max_record_ms.
+    """
+
+    def __init__(
+        self,
+        min_silence_ms: int = 300,
+        max_silence_ms: int = 700,
+        partial_stable_ms: int = 200,
+        max_record_ms: int = 15000,
+        energy_ratio: float = 2.0,
+        min_noise_floor: float = 100.0,
+    ):
+        self.min_silence_ms = min_silence_ms
+        self.max_silence_ms = max_silence_ms
+        self.partial_stable_ms = partial_stable_ms
+        self.max_record_ms = max_record_ms
+        self.energy_ratio = energy_ratio
+        self.min_noise_floor = min_noise_floor
+
+        self.noise_floor = min_noise_floor
+        self._partial = ""
+        self._partial_since = 0
+
+    @staticmethod
+    def rms(frame: bytes) -> float:
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+    def calibrate(self, frames, speech_flags) -> None:
+        """Estimate the noise floor from the preroll frames the VAD marked silent."""
+        levels = [self.rms(f) for f, speech in zip(frames, speech_flags) if not speech]
+        if levels:
+            self.noise_floor = max(self.min_noise_floor, float(np.median(levels)))
+
+    def is_speech(self, frame: bytes, vad_speech: bool) -> bool:
+        return vad_speech and self.rms(frame) >= self.noise_floor * self.energy_ratio
+
+    def check(self, silence_ms: int, listened_ms: int, audio_ms: int, recognizer) -> Optional[str]:
+        """Return the endpoint reason, or None to keep recording."""
+        if listened_ms >= self.max_record_ms:
+            return "max_length"
+        if silence_ms == 0:
+            self._partial_since = audio_ms
+            return None
+
+        # The partial is polled during silence only, while the decoder settles
+        partial = json.loads(recognizer.PartialResult()).get("partial", "").strip()
+        if partial != self._partial:
+            self._partial = partial
+            self._partial_since = audio_ms
+        if silence_ms < self.min_silence_ms:
+            return None
+        stable = bool(partial) and audio_ms - self._partial_since >= self.partial_stable_ms
+
+        if stable and _looks_complete(partial):
+            return "complete"
+        if stable and silence_ms >= (self.min_silence_ms + self.max_silence_ms) // 2:
+            return "stable"
+        if silence_ms >= self.max_silence_ms:
+            return "silence"
+        return None
+
+
+def _looks_complete(text: str) -> bool:
+    words = text.split()
+    return len(words) >= 2 and words[-1] not in _CONTINUATION_WORDS
+
+
+class RecognizerPool:
+    """Pre-built KaldiRecognizers reused across sessions.
+
+    Creating a recognizer allocates the decoder state (and compiles the grammar
+    in command mode), so they are built once up front and Reset() when a
+    session returns them. If every recognizer is busy a new one is created.
+    """
+
+    def __init__(self, model, sample_rate: int, size: int = 2, grammar: Optional[list] = None):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.grammar = json.dumps(list(grammar) + ["[unk]"], ensure_ascii=False) if grammar else None
+        self.created = 0
+        self._free = collections.deque(self._build() for _ in range(size))
+
+    def _build(self):
+        self.created += 1
+        if self.grammar is not None:
+            return KaldiRecognizer(self.model, self.sample_rate, self.grammar)
+        return KaldiRecognizer(self.model, self.sample_rate)
+
+    def acquire(self):
+        try:
+            return self._free.pop()
+        except IndexError:
+            return self._build()
+
+    def release(self, recognizer) -> None:
+        recognizer.Reset()
+        self._free.append(recognizer)
+
+
+class DecodeSession:
+    """Feeds one recording to the full-vocabulary and/or command recognizers.
+
+    With both recognizers the grammar one decodes first and the audio is kept
+    aside: while its partial is still the beginning of a known command the
+    full model gets nothing. As soon as the partial leaves the grammar (or the
+    final result is not a command) the buffered audio is replayed into the
+    full model, which takes over from there. A command therefore never pays
+    for the full decoder, and other speech only pays for the replay.
+    Decoding time (AcceptWaveform + PartialResult + FinalResult) is
+    accumulated per recognizer so both modes can be compared.
+    """
+
+    def __init__(self, full=None, command=None, commands=frozenset()):
+        self.decoders = {name: r for name, r in (("full", full), ("command", command)) if r}
+        self.commands = commands
+        self.decode_s = dict.fromkeys(self.decoders, 0.0)
+        # Audio pendiente para el modelo completo (None = no hay que esperar)
+        self._pending: Optional[list] = [] if len(self.decoders) == 2 else None
+        self._prefixes = {
+            tuple(words[:i]) for words in (c.split() for c in commands) for i in range(len(words) + 1)
+        }
+        self.replayed_frames = 0
+
+    def _accept(self, name: str, frame: bytes) -> None:
+        t0 = time.perf_counter()
+        self.decoders[name].AcceptWaveform(frame)
+        self.decode_s[name] += time.perf_counter() - t0
+
+    def accept(self, frame: bytes) -> None:
+        if self._pending is None:
+            self._accept("full" if "full" in self.decoders else "command", frame)
+            return
+        self._accept("command", frame)
+        self._pending.append(frame)
+        if not self._may_be_command():
+            self._replay()
+
+    def _may_be_command(self) -> bool:
+        t0 = time.perf_counter()
+        partial = json.loads(self.decoders["command"].PartialResult()).get("partial", "")
+        self.decode_s["command"] += time.perf_counter() - t0
+        return tuple(partial.split()) in self._prefixes
+
+    def _replay(self) -> None:
+        """Not a command: the full model decodes the buffered audio and takes over."""
+        pending, self._pending = self._pending, None
+        self.replayed_frames = len(pending)
+        for frame in pending:
+            self._accept("full", frame)
+
+    def partial_source(self):
+        if self._pending is None and "full" in self.decoders:
+            return self.decoders["full"]
+        return self.decoders["command"]
+
+    def _final(self, name: str) -> str:
+        t0 = time.perf_counter()
+        result = json.loads(self.decoders[name].FinalResult())
+        self.decode_s[name] += time.perf_counter() - t0
+        return result.get("text", "").strip()
+
+    def final(self) -> tuple[str, str]:
+        """Return (text, decoder that produced it)."""
+        if "full" not in self.decoders:
+            return self._final("command"), "command"
+        if self._pending is not None:
+            text = self._final("command")
+            if text in self.commands:
+                return text, "command"
+            self._replay()
+        return self._final("full"), "full"
+
+    def decode_ms(self) -> dict:
+        return {name: round(s * 1000, 2) for name, s in self.decode_s.items()}
+
 
 class VoiceRecognizer:
     """Voice recognition class using Vosk STT and WebRTC VAD."""
@@ -25,6 +226,13 @@ class VoiceRecognizer:
         preroll_ms=300,
         speech_threshold_ms=250,
         silence_threshold_ms=700,
+        capture=None,
+        adaptive_endpoint=True,
+        min_silence_ms=300,
+        max_record_ms=15000,
+        pool_size=2,
+        commands=None,
+        command_mode="parallel",
     ):
         """
         Initialize voice recognizer.
@@ -36,91 +244,240 @@ class VoiceRecognizer:
             vad_aggressiveness: WebRTC VAD aggressiveness (0-3)
             preroll_ms: Pre-roll buffer duration (ms)
             speech_threshold_ms: Min speech duration to start listening (ms)
-            silence_threshold_ms: Silence duration to stop recording (ms)
+            silence_threshold_ms: Silence duration to stop recording (ms); with
+                adaptive endpointing this is the upper bound
+            capture: Shared AudioCapture to read from (None = open own stream)
+            adaptive_endpoint: Shorten the trailing silence when the partial
+                transcript is stable and looks complete (see Endpointer)
+            min_silence_ms: Shortest trailing silence with adaptive endpointing
+            max_record_ms: Hard limit on the recording length after speech starts
+            pool_size: Pre-built recognizers kept per vocabulary
+            commands: Command phrases (e.g. home control) for a grammar-restricted
+                recognizer; None disables command mode
+            command_mode: "parallel" decodes with the command grammar first and
+                replays the audio into the full model only when it is not a
+                command (see DecodeSession); "only" skips the full-vocabulary
+                decoder
         """
         self.sample_rate = sample_rate
         self.chunk_ms = chunk_ms
         self.frame_samples = sample_rate * chunk_ms // 1000
         self.speech_threshold_ms = speech_threshold_ms
         self.silence_threshold_ms = silence_threshold_ms
+        self.adaptive_endpoint = adaptive_endpoint
+        self.min_silence_ms = min_silence_ms
+        self.max_record_ms = max_record_ms
+        self.capture = capture
+        # Timing of the last session (audio ms are relative to the session start)
+        self.last_stats: dict = {}
 
         logger.info(f"Loading Vosk model from {model_path}")
 
         self.model = Model(model_path)
+        self.vad_aggressiveness = vad_aggressiveness
         self.vad = webrtcvad.Vad(vad_aggressiveness)
         self.preroll_frames = collections.deque(maxlen=preroll_ms // chunk_ms)
 
+        if commands is None and command_mode == "only":
+            raise ValueError("command_mode='only' requires a command list")
+        self.commands = frozenset(c.strip().lower() for c in commands or ())
+        self.command_mode = command_mode
+        self.pool = None
+        if not (self.commands and command_mode == "only"):
+            self.pool = RecognizerPool(self.model, sample_rate, pool_size)
+        self.command_pool = None
+        if self.commands:
+            self.command_pool = RecognizerPool(
+                self.model, sample_rate, pool_size, grammar=sorted(self.commands)
+            )
+
+    def _session(self) -> DecodeSession:
+        return DecodeSession(
+            full=self.pool.acquire() if self.pool else None,
+            command=self.command_pool.acquire() if self.command_pool else None,
+            commands=self.commands,
+        )
+
+    def _release(self, session: DecodeSession) -> None:
+        for name, recognizer in session.decoders.items():
+            (self.pool if name == "full" else self.command_pool).release(recognizer)
+
+    def for_capture(self, capture) -> "VoiceRecognizer":
+        """Copy that records from another capture (e.g. a satellite stream).
+
+        The Vosk model and recognizer pools are shared; the VAD keeps state
+        between frames, so each copy gets its own.
+        """
+        clone = copy.copy(self)
+        clone.capture = capture
+        clone.vad = webrtcvad.Vad(self.vad_aggressiveness)
+        clone.last_stats = {}
+        return clone
+
+    def warmup(self) -> None:
+        """Decode half a second of silence to page in the model."""
+        session = self._session()
+        try:
+            session.accept(bytes(self.sample_rate))  # 0.5 s de int16 a cero
+            session.final()
+        finally:
+            self._release(session)
+
+    def _endpointer(self) -> Endpointer:
+        if not self.adaptive_endpoint:
+            # Fixed timeout: every signal but the trailing silence is disabled
+            return Endpointer(
+                min_silence_ms=self.silence_threshold_ms,
+                max_silence_ms=self.silence_threshold_ms,
+                partial_stable_ms=10 ** 9,
+                max_record_ms=self.max_record_ms,
+                energy_ratio=0.0,
+            )
+        return Endpointer(
+            min_silence_ms=self.min_silence_ms,
+            max_silence_ms=self.silence_threshold_ms,
+            max_record_ms=self.max_record_ms,
+        )
+
     def _audio_callback(self, indata, frames, time, status):
         """Audio input callback - receives exactly frame_samples (20 ms)."""
         if status:
             logger.warning(f"Audio callback status: {status}")
         self.audio_q.put(bytes(indata))
 
-    def record_and_transcribe(self) -> str:
+    @contextlib.contextmanager
+    def _frames(self, start=None):
+        """Yield an iterator of 20 ms int16 frames from the active audio source."""
+        if self.capture is not None:
+            cursor = self.capture.cursor(start)
+
+            def shared():
+                while True:
+                    samples = cursor.read(self.frame_samples)
+                    if samples is None:
+                        return
+                    yield samples.tobytes()
+
+            yield shared()
+            return
+
+        audio_q = queue.Queue()
+
+        def callback(indata, frames, time, status):
+            """Audio input callback - receives exactly frame_samples (20 ms)."""
+            if status:
+                logger.warning(f"Audio callback status: {status}")
+            audio_q.put(bytes(indata))
+
+        with sd.RawInputStream(
+            samplerate=self.sample_rate,
+            blocksize=self.frame_samples,
+            dtype="int16",
+            channels=1,
+            callback=callback,
+        ):
+            yield iter(audio_q.get, None)
+
+    def record_and_transcribe(self, start=None, start_timeout_ms=None) -> str:
         """
         Record audio until silence and transcribe to text.
 
+        Args:
+            start: Absolute capture position to start from (shared capture only),
+                e.g. the wake word detection point. None = current position.
+            start_timeout_ms: Give up if no speech starts within this time
+                (follow-up window). None = wait indefinitely.
+
         Returns:
             str: Transcribed text or empty string if no speech detected
         """
         # Initialize state for this recording session
         in_speech_ms = 0
         silence_ms = 0
+        listened_ms = 0
         listening = False
         preroll_frames = collections.deque(maxlen=self.preroll_frames.maxlen)
-        recognizer = KaldiRecognizer(self.model, self.sample_rate)
-        audio_q = queue.Queue()
-
-        def callback(indata, frames, time, status):
-            """Audio input callback - receives exactly frame_samples (20 ms)."""
-            if status:
-                logger.warning(f"Audio callback status: {status}")
-            audio_q.put(bytes(indata))
+        preroll_speech = collections.deque(maxlen=self.preroll_frames.maxlen)
+        session = self._session()
+        endpointer = self._endpointer()
+        audio_ms = 0
+        self.last_stats = {
+            "speech_start_ms": None,
+            "endpoint_ms": None,
+            "final_result_ms": None,
+            "endpoint_reason": None,
+            "noise_floor": None,
+            "decoder": None,
+            "decode_ms": None,
+            "replayed_ms": None,
+        }
 
         try:
-            with sd.RawInputStream(
-                samplerate=self.sample_rate,
-                blocksize=self.frame_samples,
-                dtype="int16",
-                channels=1,
-                callback=callback,
-            ):
+            with self._frames(start) as frames:
                 logger.info("Started voice recording")
 
-                while True:
-                    frame = audio_q.get()
+                for frame in frames:
+                    audio_ms += self.chunk_ms
                     speech = self.vad.is_speech(frame, self.sample_rate)
 
                     if not listening:
                         # Pre-listening phase: collect frames and wait for speech
                         preroll_frames.append(frame)
+                        preroll_speech.append(speech)
                         in_speech_ms += self.chunk_ms if speech else 0
 
                         if in_speech_ms >= self.speech_threshold_ms:
                             logger.info("Speech detected, starting transcription")
                             listening = True
+                            self.last_stats["speech_start_ms"] = audio_ms
+                            tracing.mark("speech_start")
+                            endpointer.calibrate(preroll_frames, preroll_speech)
+                            self.last_stats["noise_floor"] = round(endpointer.noise_floor, 1)
                             # Add preroll frames to recognizer
                             for f in preroll_frames:
-                                recognizer.AcceptWaveform(f)
+                                session.accept(f)
+                        elif start_timeout_ms is not None and audio_ms >= start_timeout_ms:
+                            logger.info("No speech within the follow-up window")
+                            return ""
                     else:
                         # Listening phase: transcribe and detect end of speech
-                        recognizer.AcceptWaveform(frame)
+                        session.accept(frame)
+                        listened_ms += self.chunk_ms
 
-                        if speech:
+                        if endpointer.is_speech(frame, speech):
                             silence_ms = 0  # Reset silence counter on speech
                         else:
                             silence_ms += self.chunk_ms  # Increment silence counter
 
-                            if silence_ms >= self.silence_threshold_ms:
-                                # End of speech detected
-                                final = json.loads(recognizer.FinalResult())
-                                text = final.get("text", "").strip()
-                                logger.info(f"Transcription complete: '{text}'")
-                                return text
+                        reason = endpointer.check(
+                            silence_ms, listened_ms, audio_ms, session.partial_source()
+                        )
+                        if reason is not None:
+                            # End of speech detected
+                            tracing.mark("endpoint")
+                            t0 = time.perf_counter()
+                            text, decoder = session.final()
+                            tracing.mark("stt_final")
+                            self.last_stats.update(
+                                endpoint_ms=audio_ms,
+                                final_result_ms=(time.perf_counter() - t0) * 1000,
+                                endpoint_reason=reason,
+                                decoder=decoder,
+                                decode_ms=session.decode_ms(),
+                                replayed_ms=session.replayed_frames * self.chunk_ms,
+                            )
+                            logger.info(f"Transcription complete ({reason}): '{text}'")
+                            return text
+
+            logger.warning("Audio source closed during recording")
+            self.last_stats["endpoint_ms"] = audio_ms
+            return ""
 
         except Exception as e:
             logger.error(f"Error in voice recognition: {e}")
             return ""
+        finally:
+            self._release(session)
 
 
 if __name__ == "__main__":
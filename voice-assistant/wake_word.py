@@ -1,5 +1,10 @@
-from collections import deque
+import collections
+import copy
 import logging
+import queue
+import time
+from typing import Optional
+
 import numpy as np
 import sounddevice as sd
 from openwakeword.model import Model
@@ -16,29 +21,104 @@ class WakeWordModel:
         self,
         wakeword_model_paths: list[str] | None = None,
         threshold: float = 0.5,
+        capture=None,
+        queue_frames: int = 25,
+        max_batch: int = 1,
+        late_ms: int = 2 * FRAME_MS,
+        playback_threshold: float = 0.8,
     ):
+        """
+        Args:
+            wakeword_model_paths: modelos openWakeWord (None = modelos por defecto)
+            threshold: umbral de detección
+            capture: AudioCapture compartido (None = abre su propio stream)
+            queue_frames: capacidad de la cola de frames (~2 s por defecto)
+            max_batch: frames pendientes que se evalúan juntos en una sola
+                predicción cuando el detector va retrasado (1 = sin lotes)
+            late_ms: retraso a partir del cual un frame cuenta como tardío
+            playback_threshold: umbral mientras suena nuestro propio audio, para
+                que el eco del altavoz no active el wake word (barge-in)
+        """
         if wakeword_model_paths:
             self.model = Model(wakeword_model_paths=wakeword_model_paths)
         else:
             self.model = Model()
         self.threshold = threshold
-        self.buf = deque(maxlen=1)  # guarda el último frame capturado
+        self.playback_threshold = playback_threshold
+        # Devuelve True mientras el asistente está hablando (p. ej. sink.playing)
+        self.is_playing = None
+        self.capture = capture  # AudioCapture compartido (opcional)
+        self.detected_at: int | None = None  # posición en el buffer de la detección
+        self.max_batch = max(1, max_batch)
+        self.late_ms = late_ms
+        # Cola acotada: no pierde frames mientras predict() está ocupado
+        self.frames: queue.Queue = queue.Queue(maxsize=queue_frames)
+        self.stats = {"frames": 0, "dropped": 0, "late": 0, "batches": 0}
 
-    def _callback(self, indata, frames, time, status):
+    def _callback(self, indata, frames, time_info, status):
         if status:
             logger.warning(status)
         # Convierte de float32 [-1,1] a int16 PCM
         pcm = np.clip(indata[:, 0], -1.0, 1.0)
         pcm = (pcm * 32767.0).astype(np.int16)
-        self.buf.append(pcm)
+        try:
+            self.frames.put_nowait((time.monotonic(), pcm))
+        except queue.Full:
+            # El callback de audio no puede bloquear: se cuenta la pérdida
+            self.stats["dropped"] += 1
 
     def reset(self):
         """Resetea el estado interno del modelo para evitar falsos positivos."""
         self.model.reset()
-        self.buf.clear()
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+
+    def warmup(self) -> None:
+        """Run one prediction on silence so the first real frame is not slow."""
+        self.model.predict(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+        self.model.reset()
+
+    def snapshot(self) -> dict:
+        return dict(self.stats)
+
+    def _check(self, frame) -> bool:
+        prediction = self.model.predict(frame)
+        if prediction:
+            name, score = next(iter(prediction.items()))
+            logger.debug(f"{name}: {score:.3f}")
+            playing = self.is_playing is not None and self.is_playing()
+            threshold = self.playback_threshold if playing else self.threshold
+            if score >= threshold:
+                logger.info(f"Wake word detected: {name} (score={score:.3f})")
+                return True
+        return False
+
+    def _next_batch(self, timeout: float = 0.5):
+        """Bloquea hasta recibir un frame; agrupa los pendientes si hay retraso."""
+        captured_at, frame = self.frames.get(timeout=timeout)
+        batch = [frame]
+        while len(batch) < self.max_batch:
+            try:
+                captured_at, frame = self.frames.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(frame)
+        return captured_at, batch
 
-    def activate(self) -> bool:
+    def activate(self, start: Optional[int] = None) -> bool:
+        """Block until the wake word is heard.
+
+        With a shared capture, `start` is the buffer position to score from
+        (default: the current one), e.g. 0 or the previous detection when
+        replaying a file that was written all at once.
+        """
         self.reset()
+        if self.capture is not None:
+            return self._activate_shared(start)
+
         with sd.InputStream(
             samplerate=SAMPLE_RATE,
             channels=1,
@@ -47,14 +127,182 @@ class WakeWordModel:
             callback=self._callback,
         ):
             while True:
-                if not self.buf:
-                    sd.sleep(1)
+                try:
+                    captured_at, batch = self._next_batch()
+                except queue.Empty:
                     continue
-                frame = self.buf.popleft()
-                prediction = self.model.predict(frame)
-                if prediction:
-                    name, score = next(iter(prediction.items()))
-                    logger.debug(f"{name}: {score:.3f}")
-                    if score >= self.threshold:
-                        logger.info(f"Wake word detected: {name} (score={score:.3f})")
-                        return True
+                self._count(batch, (time.monotonic() - captured_at) * 1000)
+                if self._check(np.concatenate(batch)):
+                    return True
+
+    def _activate_shared(self, start: Optional[int] = None) -> bool:
+        """Detecta leyendo del AudioCapture compartido, sin abrir otro stream."""
+        cursor = self.capture.cursor(start)
+        dropped = cursor.dropped
+        while True:
+            # Si vamos retrasados se leen varios frames de una vez (hasta max_batch)
+            n = min(self.max_batch, max(1, cursor.lag // FRAME_SAMPLES)) * FRAME_SAMPLES
+            samples = cursor.read(n)
+            if samples is None:
+                return False  # captura cerrada
+            self.stats["dropped"] += (cursor.dropped - dropped) // FRAME_SAMPLES
+            dropped = cursor.dropped
+            lag_ms = cursor.lag * 1000 / SAMPLE_RATE
+            self._count(np.split(samples, n // FRAME_SAMPLES), lag_ms)
+            if self._check(samples):
+                self.detected_at = cursor.position
+                return True
+
+    def poll(self, cursor) -> bool:
+        """Non-blocking check of the frames already buffered for `cursor`.
+
+        Evaluates up to max_batch frames in one prediction and returns at once;
+        used when one thread serves many streams (satellite server).
+        """
+        frames = min(self.max_batch, cursor.lag // FRAME_SAMPLES)
+        if frames <= 0:
+            return False
+        samples = cursor.read(frames * FRAME_SAMPLES, timeout=0)
+        if samples is None:
+            return False
+        self._count(np.split(samples, frames), cursor.lag * 1000 / SAMPLE_RATE)
+        if self._check(samples):
+            self.detected_at = cursor.position
+            return True
+        return False
+
+    def _count(self, batch, lag_ms: float) -> None:
+        self.stats["frames"] += len(batch)
+        if len(batch) > 1:
+            self.stats["batches"] += 1
+        if lag_ms > self.late_ms:
+            self.stats["late"] += len(batch)
+
+
+class SharedWakeWord:
+    """One openWakeWord model serving many audio streams (satellite server).
+
+    The ONNX sessions (melspectrogram, embedding and wake word models) are
+    loaded once; each stream() gets its own copy of the feature buffers and
+    its own warm-up count, so the streams never mix their audio. poll_batch()
+    reads the new frames of every ready stream and scores them with a single
+    inference call per wake word model.
+    """
+
+    # openWakeWord ignora las primeras predicciones tras un reset
+    WARMUP_FRAMES = 5
+
+    def __init__(
+        self,
+        wakeword_model_paths: list[str] | None = None,
+        threshold: float = 0.5,
+        max_batch: int = 1,
+        late_ms: int = 2 * FRAME_MS,
+    ):
+        """
+        Args:
+            wakeword_model_paths: modelos openWakeWord (None = modelos por defecto)
+            threshold: umbral de detección
+            max_batch: frames pendientes de cada stream que se leen en una pasada
+            late_ms: retraso a partir del cual un frame cuenta como tardío
+        """
+        if wakeword_model_paths:
+            self.model = Model(wakeword_model_paths=wakeword_model_paths)
+        else:
+            self.model = Model()
+        self.threshold = threshold
+        self.max_batch = max(1, max_batch)
+        self.late_ms = late_ms
+        self.stats = {"passes": 0, "rows": 0}
+        # Modelos exportados con batch fijo de 1: se evalúan fila a fila
+        self._batched: dict[str, bool] = {}
+
+    def stream(self) -> "WakeWordStream":
+        """Per-stream detector (the SatelliteServer wake_factory)."""
+        return WakeWordStream(self)
+
+    def poll_batch(self, pairs: list) -> list[bool]:
+        """Non-blocking check of the frames buffered for each (detector, cursor).
+
+        Returns one flag per pair; a detection sets the detector's detected_at.
+        """
+        rows: dict[str, list] = {name: [] for name in self.model.model_inputs}
+        owners: dict[str, list] = {name: [] for name in self.model.model_inputs}
+        for i, (detector, cursor) in enumerate(pairs):
+            frames = min(self.max_batch, cursor.lag // FRAME_SAMPLES)
+            if frames <= 0:
+                continue
+            samples = cursor.read(frames * FRAME_SAMPLES, timeout=0)
+            if samples is None:
+                continue
+            detector._count(frames, cursor.lag * 1000 / SAMPLE_RATE)
+            prepared = detector.features(samples) // FRAME_SAMPLES
+            warm = detector.predictions >= self.WARMUP_FRAMES
+            detector.predictions += prepared
+            if not warm:
+                continue
+            # Una ventana de características por frame nuevo, como Model.predict()
+            for name, n_inputs in self.model.model_inputs.items():
+                for k in range(prepared - 1, -1, -1):
+                    rows[name].append(detector.features.get_features(n_inputs, start_ndx=-n_inputs - k))
+                    owners[name].append(i)
+
+        scores = [0.0] * len(pairs)
+        for name, batch in rows.items():
+            if not batch:
+                continue
+            self.stats["passes"] += 1
+            self.stats["rows"] += len(batch)
+            for owner, score in zip(owners[name], self._predict(name, np.concatenate(batch))):
+                scores[owner] = max(scores[owner], float(score))
+
+        detected = [False] * len(pairs)
+        for i, (detector, cursor) in enumerate(pairs):
+            if scores[i] >= self.threshold:
+                logger.info(f"Wake word detected (score={scores[i]:.3f})")
+                detector.detected_at = cursor.position
+                detected[i] = True
+        return detected
+
+    def _predict(self, name: str, batch: np.ndarray):
+        """Scores of every row of `batch` for one wake word model."""
+        predict = self.model.model_prediction_function[name]
+        if self._batched.get(name, True):
+            try:
+                return np.asarray(predict(batch)[0]).reshape(len(batch), -1)[:, 0]
+            except Exception as e:
+                logger.warning(f"{name} no admite lotes, se evalúa fila a fila: {e}")
+                self._batched[name] = False
+        return [np.asarray(predict(row[None])[0]).ravel()[0] for row in batch]
+
+
+class WakeWordStream:
+    """One stream of a SharedWakeWord: its feature buffers, warm-up and stats."""
+
+    def __init__(self, shared: SharedWakeWord):
+        self.shared = shared
+        # Copia superficial: comparte las sesiones ONNX, no los buffers
+        features = copy.copy(shared.model.preprocessor)
+        features.raw_data_buffer = collections.deque(maxlen=features.raw_data_buffer.maxlen)
+        self.features = features
+        self.predictions = 0
+        self.detected_at: int | None = None
+        self.stats = {"frames": 0, "late": 0, "batches": 0}
+        self.reset()
+
+    def reset(self) -> None:
+        self.features.reset()
+        self.predictions = 0
+
+    def poll(self, cursor) -> bool:
+        return self.shared.poll_batch([(self, cursor)])[0]
+
+    def snapshot(self) -> dict:
+        return dict(self.stats)
+
+    def _count(self, frames: int, lag_ms: float) -> None:
+        self.stats["frames"] += frames
+        if frames > 1:
+            self.stats["batches"] += 1
+        if lag_ms > self.shared.late_ms:
+            self.stats["late"] += frames
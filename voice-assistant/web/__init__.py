@@ -0,0 +1,5 @@
+from .base import WebSearchProvider, make_web_search
+from .brave import BraveProvider
+from .cache import WebCache
+
+__all__ = ["BraveProvider", "WebCache", "WebSearchProvider", "make_web_search"]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import logging
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class WebSearchProvider(ABC):
+    """Abstract web search interface.
+
+    Contract:
+    - search(query, max_results) returns at most max_results dicts with
+      "title", "href" and "snippet", plus "full_text" when the page content
+      was extracted in time.
+    - Implementations must return (possibly fewer results) within their own
+      time budget instead of blocking the turn.
+    """
+
+    @abstractmethod
+    def search(self, query: str, max_results: int) -> list:
+        raise NotImplementedError
+
+    def snapshot(self) -> dict:
+        """Numeric metrics (e.g. cache hit ratios) to publish as gauges."""
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+def make_web_search(query: str, max_results: int, provider: WebSearchProvider, max_chars: int = 1000) -> str:
+    """Search and format the results as context for the LLM ("" if none)."""
+    try:
+        results = provider.search(query, max_results)
+    except Exception as e:  # noqa: BLE001 - el contexto web es opcional
+        logger.warning(f"Búsqueda web fallida: {e}")
+        return ""
+    if not results:
+        return ""
+
+    lines = [f"Resultados de búsqueda web para: {query}"]
+    for i, result in enumerate(results, 1):
+        lines.append(f"{i}. {result['title']} - {result['href']}")
+        if result.get("snippet"):
+            lines.append(f"   Resumen: {result['snippet']}")
+        full_text = (result.get("full_text") or "").strip()
+        if full_text:
+            if len(full_text) > max_chars:
+                full_text = full_text[:max_chars].rsplit(" ", 1)[0] + "..."
+            lines.append(f"   Noticia/artículo: {full_text}")
+    return "\n".join(lines)
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import requests
+import trafilatura
+from requests.adapters import HTTPAdapter
+
+from .base import WebSearchProvider
+from .cache import WebCache
+
+logger = logging.getLogger(__name__)
+
+BRAVE_ENDPOINT = "https://api.search.brave.com/res/v1/web/search"
+
+
+class BraveProvider(WebSearchProvider):
+    """Brave Search API with concurrent page retrieval under a time budget.
+
+    search() asks Brave for results, drops duplicate URLs and, with
+    include_full_text, downloads every result page concurrently over the
+    (pooled, keep-alive) session. Each page is handed to the extraction pool
+    (trafilatura) as soon as it arrives, so downloads and extraction overlap.
+    The whole call is bounded by budget_s: results whose page was not
+    extracted in time are returned with their snippet only, and late
+    downloads finish in the background without holding up the turn.
+
+    - session: shared requests.Session (HTTPPool.session) for the Brave API.
+      Result pages go through a separate keep-alive session with one pool per
+      site, so fetching many hosts does not evict the OpenAI connections.
+    - max_page_bytes: pages are read up to this size (enough for the article).
+    - cache: optional WebCache; cached result lists skip the Brave call and
+      cached pages skip download and extraction.
+    - last_stats: timings of the last search (search/fetch/extract, in ms).
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        include_full_text: bool = True,
+        *,
+        endpoint: str = BRAVE_ENDPOINT,
+        session: Optional[requests.Session] = None,
+        budget_s: float = 2.5,
+        fetch_workers: int = 4,
+        extract_workers: int = 2,
+        max_page_bytes: int = 1024 * 1024,
+        country: str = "ES",
+        search_lang: str = "es",
+        cache: Optional[WebCache] = None,
+    ) -> None:
+        self.api_key = api_key or os.getenv("BRAVE_API_KEY")
+        self.include_full_text = include_full_text
+        self.endpoint = endpoint
+        self.session = session or requests.Session()
+        self.budget_s = budget_s
+        self.max_page_bytes = max_page_bytes
+        self.country = country
+        self.search_lang = search_lang
+        self.cache = cache
+        self.last_stats: dict = {}
+        self._pages = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=fetch_workers)
+        self._pages.mount("https://", adapter)
+        self._pages.mount("http://", adapter)
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="web-fetch")
+        self._extract_pool = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix="web-extract")
+
+        if not self.api_key:
+            logger.warning("BRAVE_API_KEY no encontrado; la búsqueda web no devolverá resultados.")
+
+    def _search_web(self, query: str, count: int) -> list:
+        """Raw Brave results as {"title", "href", "snippet"} dicts."""
+        if not self.api_key:
+            return []
+        r = self.session.get(
+            self.endpoint,
+            headers={"Accept": "application/json", "X-Subscription-Token": self.api_key},
+            params={"q": query, "count": count, "country": self.country, "search_lang": self.search_lang},
+            timeout=self.budget_s,
+        )
+        r.raise_for_status()
+        results = (r.json().get("web") or {}).get("results") or []
+        return [
+            {"title": item.get("title", ""), "href": item.get("url", ""), "snippet": item.get("description", "")}
+            for item in results
+        ]
+
+    def search(self, query: str, max_results: int) -> list:
+        t0 = time.monotonic()
+        deadline = t0 + self.budget_s
+        cached = self.cache.get_results(query, max_results) if self.cache is not None else None
+        if cached is not None:
+            results = cached
+            self.last_stats = {"search_ms": 0.0, "results": len(results), "cached": True}
+            self.last_stats["saved_ms"] = self.cache.record_hit("search")
+        else:
+            results = []
+            seen = set()
+            for result in self._search_web(query, max_results):
+                if not result["href"] or result["href"] in seen:
+                    continue
+                seen.add(result["href"])
+                results.append(result)
+                if len(results) >= max_results:
+                    break
+            search_ms = round((time.monotonic() - t0) * 1000, 1)
+            self.last_stats = {"search_ms": search_ms, "results": len(results), "cached": False}
+            if self.cache is not None:
+                self.cache.record_miss("search", search_ms)
+                if results:
+                    self.cache.put_results(query, max_results, results)
+
+        if self.include_full_text and results:
+            self._add_full_texts(results, deadline)
+        self.last_stats["total_ms"] = round((time.monotonic() - t0) * 1000, 1)
+        logger.info(f"Búsqueda web: {self.last_stats}")
+        return results
+
+    def snapshot(self) -> dict:
+        return self.cache.snapshot() if self.cache is not None else {}
+
+    def _add_full_texts(self, results: list, deadline: float) -> None:
+        """Fetch and extract every page concurrently until the deadline."""
+        if self.cache is not None:
+            missing = []
+            for result in results:
+                full_text = self.cache.get_page(result["href"])
+                if full_text:
+                    result["full_text"] = full_text
+                else:
+                    missing.append(result)
+            self.last_stats["cached_pages"] = len(results) - len(missing)
+            if not missing:
+                self.last_stats["saved_ms"] = self.last_stats.get("saved_ms", 0.0) + self.cache.record_hit("pages")
+                return
+            t0 = time.monotonic()
+            self._fetch_and_extract(missing, deadline)
+            self.cache.record_miss("pages", (time.monotonic() - t0) * 1000)
+            for result in missing:
+                if result.get("full_text"):
+                    self.cache.put_page(result["href"], result["full_text"])
+            return
+        self._fetch_and_extract(results, deadline)
+
+    def _fetch_and_extract(self, results: list, deadline: float) -> None:
+        fetches: dict[Future, dict] = {
+            self._fetch_pool.submit(self._fetch, result["href"], deadline): result for result in results
+        }
+        extractions: dict[Future, dict] = {}
+
+        def extract_when_fetched(future: Future) -> None:
+            if future.cancelled() or future.exception() is not None or not future.result():
+                return
+            extractions[self._extract_pool.submit(trafilatura.extract, future.result())] = fetches[future]
+
+        try:
+            for future in concurrent.futures.as_completed(fetches, timeout=max(0.0, deadline - time.monotonic())):
+                if future.exception() is not None:
+                    logger.debug(f"Página no descargada: {fetches[future]['href']}: {future.exception()}")
+                extract_when_fetched(future)
+        except concurrent.futures.TimeoutError:
+            pass
+        for future in fetches:
+            future.cancel()  # las que no empezaron; las que están en curso terminan solas
+        self.last_stats["fetched"] = len(extractions)
+
+        done, _ = concurrent.futures.wait(extractions, timeout=max(0.0, deadline - time.monotonic()))
+        for future in done:
+            if future.exception() is None and future.result():
+                extractions[future]["full_text"] = future.result()
+        self.last_stats["extracted"] = sum(1 for r in results if r.get("full_text"))
+
+    def _fetch(self, url: str, deadline: float) -> str:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return ""
+        with self._pages.get(url, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            if "html" not in r.headers.get("Content-Type", "text/html"):
+                return ""
+            body = bytearray()
+            for chunk in r.iter_content(chunk_size=16384):
+                body += chunk
+                if len(body) >= self.max_page_bytes or time.monotonic() >= deadline:
+                    break
+            return body.decode(r.encoding or "utf-8", errors="replace")
+
+    def close(self) -> None:
+        self._pages.close()
+        self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+        self._extract_pool.shutdown(wait=False, cancel_futures=True)
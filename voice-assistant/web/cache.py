@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Palabras que no cambian lo que se busca ("qué tiempo hace en madrid" ~ "tiempo madrid").
+# Los interrogativos (cuándo, dónde, quién, cómo, cuál) y las palabras de tiempo
+# (hoy, mañana, ayer...) no están: cambian la pregunta y deben quedar en la clave.
+_FILLER = frozenset(
+    "a al de del dime el en es esta hace hay la las lo los me "
+    "oye para por puedes que sabes se sobre un una unos unas y".split()
+)
+
+
+def normalize_query(query: str) -> str:
+    """Lower case, no accents or punctuation, filler words dropped, words sorted.
+
+    Spoken variants of the same question ("¿Qué tiempo hace en Madrid?",
+    "tiempo en madrid") map to the same key; different questions about the
+    same subject ("¿Cuándo juega...?" / "¿Dónde juega...?") do not.
+    """
+    text = unicodedata.normalize("NFKD", query.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = set(re.sub(r"[^\w\s]", " ", text).split()) - _FILLER
+    return " ".join(sorted(words)) or text.strip()
+
+
+class _DiskLevel:
+    """One cache level: JSON files on disk with TTL and an LRU size bound.
+
+    The file mtime is the write time, so entries expire after ttl_s even
+    across restarts; recency is tracked in memory (seeded from the mtimes).
+    """
+
+    def __init__(self, directory: str, ttl_s: float, max_entries: int) -> None:
+        self.directory = directory
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, float]" = OrderedDict()  # key -> written at, LRU first
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                entries.append((entry.stat().st_mtime, entry.name[: -len(".json")]))
+        for written, key in sorted(entries):
+            self._index[key] = written
+        with self._lock:
+            self._evict()
+
+    def get(self, key: str):
+        with self._lock:
+            written = self._index.get(key)
+            if written is None or time.time() - written > self.ttl_s:
+                if written is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._index.pop(key, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value) -> None:
+        path = self._path(key)
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en la caché web: {e}")
+            return
+        with self._lock:
+            self._index.pop(key, None)
+            self._index[key] = time.time()
+            self._evict()
+
+    def _evict(self) -> None:
+        now = time.time()
+        for key in [k for k, written in self._index.items() if now - written > self.ttl_s]:
+            self._remove(key)
+        while len(self._index) > self.max_entries:
+            self._remove(next(iter(self._index)))
+
+    def _remove(self, key: str) -> None:
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return round(self.hits / total, 3) if total else 0.0
+
+
+class WebCache:
+    """Two-level persistent cache for web search.
+
+    - queries: normalized query -> result list (title, href, snippet). Short
+      TTL, since rankings and news change during the day.
+    - pages: URL -> extracted full_text. Longer TTL; shared by every query
+      that returns the same page.
+    Both levels live under cache_dir as one JSON file per entry (SHA-256 of the
+    key), bounded by max entries with LRU eviction. Saved latency is
+    estimated from the average cost of the misses of each level.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "cache/web",
+        query_ttl_s: float = 15 * 60,
+        page_ttl_s: float = 24 * 3600,
+        max_queries: int = 256,
+        max_pages: int = 512,
+    ) -> None:
+        self.queries = _DiskLevel(os.path.join(cache_dir, "queries"), query_ttl_s, max_queries)
+        self.pages = _DiskLevel(os.path.join(cache_dir, "pages"), page_ttl_s, max_pages)
+        self.saved_ms = 0.0
+        self._cost_ms = {"search": None, "pages": None}  # media móvil de los fallos
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_results(self, query: str, max_results: int) -> Optional[list]:
+        entry = self.queries.get(self._key(normalize_query(query)))
+        if entry is None or entry["count"] < max_results:
+            return None
+        return entry["results"][:max_results]
+
+    def put_results(self, query: str, max_results: int, results: list) -> None:
+        results = [{k: v for k, v in r.items() if k != "full_text"} for r in results]
+        self.queries.put(self._key(normalize_query(query)), {"count": max_results, "results": results})
+
+    def get_page(self, url: str) -> Optional[str]:
+        return self.pages.get(self._key(url))
+
+    def put_page(self, url: str, full_text: str) -> None:
+        if full_text:
+            self.pages.put(self._key(url), full_text)
+
+    def record_miss(self, level: str, ms: float) -> None:
+        """Cost of a search/page fetch that missed the cache."""
+        with self._lock:
+            previous = self._cost_ms[level]
+            self._cost_ms[level] = ms if previous is None else 0.8 * previous + 0.2 * ms
+
+    def record_hit(self, level: str) -> float:
+        """Latency saved by a hit (estimated from recent misses)."""
+        with self._lock:
+            saved = self._cost_ms[level] or 0.0
+            self.saved_ms += saved
+        return saved
+
+    def snapshot(self) -> dict:
+        return {
+            "query_hit_ratio": self.queries.hit_ratio,
+            "page_hit_ratio": self.pages.hit_ratio,
+            "query_entries": len(self.queries),
+            "page_entries": len(self.pages),
+            "saved_ms_total": round(self.saved_ms, 1),
+        }